@@ -29,6 +29,7 @@ class ProfileAdmin(admin.ModelAdmin):
         "avatar",
         "phone",
         "seller",
+        "comparison_limit",
     )
     ordering = (
         "pk",
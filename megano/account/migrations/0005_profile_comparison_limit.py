@@ -0,0 +1,22 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("account", "0004_alter_profile_phone"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="comparison_limit",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                help_text="Сколько товаров можно добавить в сравнение, пусто - значение COMPARISON_LIMIT",
+                null=True,
+                verbose_name="Лимит сравнения",
+            ),
+        ),
+    ]
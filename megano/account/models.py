@@ -88,6 +88,15 @@ class Profile(models.Model):
         related_name="profiles",
         verbose_name=_("Продавец"),
     )
+    comparison_limit = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_("Лимит сравнения"),
+        help_text=_(
+            "Сколько товаров можно добавить в сравнение, "
+            "пусто - значение COMPARISON_LIMIT"
+        ),
+    )
 
     def __str__(self):
         return f"Profile(user={self.user})"
@@ -108,9 +108,9 @@ class ProfileOrderHistoryView(View):
 
 class AccountView(View):
     def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
-        browsing_history = BrowsingHistory(request)
         if not request.user.is_authenticated:
             return redirect("/")
+        browsing_history = BrowsingHistory(request)
         last_order = request.user.profile.order_set.last()
         return render(
             request,
@@ -125,9 +125,9 @@ class ProfileBrowsingHistoryView(View):
     """
 
     def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
-        browsing_history = BrowsingHistory(request)
         if not request.user.is_authenticated:
             return redirect("/")
+        browsing_history = BrowsingHistory(request)
         return render(
             request,
             "browsing_history.html",
@@ -1,6 +1,59 @@
-from django.conf import settings
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
 
+from cart.stores import get_cart_store
 from catalog.models import Product, SaleProduct, Stock
+from core import metrics
+
+
+@dataclass
+class CartLine:
+    """
+    Позиция корзины: склад с товаром и продавцом, количество и цены
+    """
+
+    stock: Stock
+    quantity: int
+    price: Decimal
+    old_price: Decimal
+
+    @property
+    def id(self) -> int:
+        return self.stock.pk
+
+    @property
+    def product(self) -> Product:
+        return self.stock.product
+
+    @property
+    def seller(self) -> str:
+        return self.stock.seller.name
+
+    @property
+    def name(self) -> str:
+        return self.product.name
+
+    @property
+    def description(self) -> str:
+        return self.product.description[:150] + "..."
+
+    @property
+    def avatar(self):
+        return self.product.avatar
+
+    @property
+    def images(self) -> list:
+        # изображения загружены заранее через prefetch_related
+        return list(self.product.image.all())
+
+    @property
+    def count(self) -> int:
+        return self.quantity
+
+    @property
+    def total_price(self) -> Decimal:
+        return self.price * self.quantity
 
 
 class Cart(object):
@@ -9,86 +62,92 @@ class Cart(object):
         Инициализируем корзину
         """
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            # save an empty cart in the session
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        self.store = get_cart_store(request)
+        self._items: Optional[dict] = None
+        self._lines: Optional[list[CartLine]] = None
+
+    @property
+    def cart(self) -> dict:
+        """
+        Позиции корзины из хранилища: {id склада: {quantity, price, old_price}}
+        """
+        if self._items is None:
+            self._items = self.store.items()
+        return self._items
+
+    def _changed(self):
+        self._items = None
+        self._lines = None
 
     def add_promocode(self, promocode):
         self.session["promocode"] = str(promocode)
         sale = SaleProduct.objects.get(promocode=promocode)
         stock_ids = sale.stocks.values_list("id", flat=True)
         for stock_id in stock_ids:
-            stock_id = str(stock_id)
-            if stock_id not in self.cart:
+            line = self.cart.get(str(stock_id))
+            if line is None:
                 continue
-            temp = self.cart[stock_id]
-            self.cart[stock_id]["price"] = str(
-                sale.get_price(float(temp.get("old_price")))
+            self.store.set_price(
+                stock_id, str(sale.get_price(float(line.get("old_price"))))
             )
+        self._changed()
 
     def add(self, stock, quantity=1):
         """
         Добавить продукт в корзину или обновить его количество.
         """
-        stock_id = str(stock.id)
-        if stock_id not in self.cart:
-            self.cart[stock_id] = {
-                "quantity": 1,
-                "old_price": str(stock.price),
-                "price": str(stock.price),
-            }
-        else:
-            self.cart[stock_id]["quantity"] += quantity
+        self.store.add(stock.id, quantity, stock.price)
+        self._changed()
+        metrics.cart_adds.inc()
         promocode = self.session.get("promocode")
 
         if promocode:
             self.add_promocode(promocode)
 
-        self.save()
-
-    def save(self):
-        # Обновление сессии cart
-        self.session[settings.CART_SESSION_ID] = self.cart
-        # Отметить сеанс как "измененный", чтобы убедиться, что он сохранен
-        self.session.modified = True
-
     def remove(self, stock):
         """
         Удаление единицы товара из корзины.
         """
-        stock_id = str(stock.id)
-        if self.cart[stock_id]["quantity"] == 1:
-            del self.cart[str(stock_id)]
-            self.save()
-        else:
-            self.cart[stock_id]["quantity"] -= 1
-            self.save()
+        self.store.decrement(stock.id)
+        self._changed()
 
     def remove_all(self, stock_id):
         """
         Удаление товара из корзины.
         """
-        del self.cart[str(stock_id)]
-        self.save()
+        self.store.remove(int(stock_id))
+        self._changed()
 
-    def __iter__(self):
+    def lines(self) -> list[CartLine]:
         """
-        Перебор элементов в корзине и получение продуктов из базы данных.
+        Позиции корзины одним запросом к складам с товарами, аватарами
+        и продавцами и одним запросом за изображениями.
+        Позиции с удаленных складов пропускаются
         """
-        stock_ids = self.cart.keys()
-        # получение объектов product и добавление их в корзину
-        stocks = Stock.objects.filter(id__in=stock_ids)
-        for stock in stocks:
-            self.cart[str(stock.id)]["product_id"] = stock.product.id
-            self.cart[str(stock.id)]["seller"] = stock.seller.name
-
-        for stock_id, item in self.cart.items():
-            item["total_price"] = item["price"] * item["quantity"]
-            item["id"] = stock_id
+        if self._lines is None:
+            stocks = (
+                Stock.objects.filter(id__in=[int(pk) for pk in self.cart])
+                .select_related("product", "product__avatar", "seller")
+                .prefetch_related("product__image")
+                .in_bulk()
+            )
+            self._lines = [
+                CartLine(
+                    stock=stocks[int(stock_id)],
+                    quantity=item["quantity"],
+                    price=Decimal(item["price"]),
+                    old_price=Decimal(item.get("old_price", item["price"])),
+                )
+                for stock_id, item in self.cart.items()
+                if int(stock_id) in stocks
+            ]
+        return self._lines
 
-            yield item
+    def __iter__(self):
+        """
+        Перебор позиций корзины
+        """
+        return iter(self.lines())
 
     def __len__(self):
         """
@@ -107,7 +166,7 @@ class Cart(object):
 
     def clear(self):
         """
-        Удаление корзины из сессии
+        Очистка корзины
         """
-        del self.session[settings.CART_SESSION_ID]
-        self.session.modified = True
+        self.store.clear()
+        self._changed()
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("catalog", "0014_product_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CartItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("owner", models.CharField(max_length=64, verbose_name="Владелец")),
+                (
+                    "quantity",
+                    models.PositiveIntegerField(default=0, verbose_name="Количество"),
+                ),
+                (
+                    "price",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=16, verbose_name="Цена"
+                    ),
+                ),
+                (
+                    "old_price",
+                    models.DecimalField(
+                        decimal_places=2, max_digits=16, verbose_name="Цена без скидки"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Обновлено"),
+                ),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="catalog.stock",
+                        verbose_name="Склад",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Позиция корзины",
+                "verbose_name_plural": "Позиции корзины",
+                "indexes": [
+                    models.Index(
+                        fields=["updated_at"], name="cart_cartit_updated_339dfa_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "stock"), name="cart_item_owner_stock_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from catalog.models import Stock
+
+
+class CartItem(models.Model):
+    """
+    Позиция корзины для хранилища DBCartStore.
+    Владелец - "user:<id>" для пользователя или "anon:<token>" для гостя
+    """
+
+    owner = models.CharField(max_length=64, verbose_name=_("Владелец"))
+    stock = models.ForeignKey(
+        Stock,
+        related_name="+",
+        on_delete=models.CASCADE,
+        verbose_name=_("Склад"),
+    )
+    quantity = models.PositiveIntegerField(default=0, verbose_name=_("Количество"))
+    price = models.DecimalField(max_digits=16, decimal_places=2, verbose_name=_("Цена"))
+    old_price = models.DecimalField(
+        max_digits=16, decimal_places=2, verbose_name=_("Цена без скидки")
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Обновлено"))
+
+    class Meta:
+        verbose_name = _("Позиция корзины")
+        verbose_name_plural = _("Позиции корзины")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "stock"], name="cart_item_owner_stock_unique"
+            )
+        ]
+        indexes = [models.Index(fields=["updated_at"])]
@@ -0,0 +1,317 @@
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import Optional
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from cart.models import CartItem
+
+CART_OWNER_SESSION_ID = "cart_owner"
+
+# Атомарное уменьшение количества с удалением позиции при нуле
+DECREMENT_SCRIPT = """
+local quantity = redis.call('HINCRBY', KEYS[1], 'q:' .. ARGV[1], -1)
+if quantity <= 0 then
+    redis.call('HDEL', KEYS[1], 'q:' .. ARGV[1], 'p:' .. ARGV[1], 'o:' .. ARGV[1])
+end
+return quantity
+"""
+
+
+class CartStore(ABC):
+    """
+    Хранилище позиций корзины. Позиция - словарь
+    {"quantity": int, "price": str, "old_price": str} по id склада
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.session = request.session
+
+    def owner(self, create: bool = False) -> Optional[str]:
+        """
+        Владелец корзины: пользователь, а для гостя - случайный токен в сессии.
+        Токен переживает смену ключа сессии при входе
+        """
+        user = getattr(self.request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        token = self.session.get(CART_OWNER_SESSION_ID)
+        if token is None and create:
+            token = self.session[CART_OWNER_SESSION_ID] = uuid4().hex
+        return f"anon:{token}" if token else None
+
+    @abstractmethod
+    def items(self) -> dict[str, dict]:
+        ...
+
+    @abstractmethod
+    def add(self, stock_id: int, quantity: int, price: Decimal) -> None:
+        ...
+
+    @abstractmethod
+    def decrement(self, stock_id: int) -> None:
+        ...
+
+    @abstractmethod
+    def remove(self, stock_id: int) -> None:
+        ...
+
+    @abstractmethod
+    def set_price(self, stock_id: int, price: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def merge(self, source: str, target: str) -> None:
+        ...
+
+    def merge_anonymous(self) -> None:
+        """
+        Перенос гостевой корзины в корзину вошедшего пользователя
+        """
+        token = self.session.pop(CART_OWNER_SESSION_ID, None)
+        target = self.owner()
+        if token and target and target.startswith("user:"):
+            self.merge(f"anon:{token}", target)
+
+
+class SessionCartStore(CartStore):
+    """
+    Корзина в сессии (каждое изменение перезаписывает всю сессию)
+    """
+
+    def items(self) -> dict[str, dict]:
+        return self.session.get(settings.CART_SESSION_ID) or {}
+
+    def _save(self, cart: dict) -> None:
+        self.session[settings.CART_SESSION_ID] = cart
+        self.session.modified = True
+
+    def add(self, stock_id: int, quantity: int, price: Decimal) -> None:
+        cart = self.items()
+        line = cart.setdefault(
+            str(stock_id),
+            {"quantity": 0, "old_price": str(price), "price": str(price)},
+        )
+        line["quantity"] += quantity
+        self._save(cart)
+
+    def decrement(self, stock_id: int) -> None:
+        cart = self.items()
+        line = cart.get(str(stock_id))
+        if line is None:
+            return
+        line["quantity"] -= 1
+        if line["quantity"] <= 0:
+            del cart[str(stock_id)]
+        self._save(cart)
+
+    def remove(self, stock_id: int) -> None:
+        cart = self.items()
+        cart.pop(str(stock_id), None)
+        self._save(cart)
+
+    def set_price(self, stock_id: int, price: str) -> None:
+        cart = self.items()
+        if str(stock_id) in cart:
+            cart[str(stock_id)]["price"] = price
+            self._save(cart)
+
+    def clear(self) -> None:
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.session.modified = True
+
+    def merge(self, source: str, target: str) -> None:
+        # данные сессии сохраняются при входе, переносить нечего
+        pass
+
+
+class RedisCartStore(CartStore):
+    """
+    Корзина в хэше Redis: поля q:<id> (количество, HINCRBY),
+    p:<id> (цена) и o:<id> (цена без скидки). Изменения из разных вкладок
+    применяются атомарно и не затирают друг друга
+    """
+
+    _client = None
+    _decrement = None
+
+    @classmethod
+    def client(cls):
+        if cls._client is None:
+            import redis
+
+            cls._client = redis.Redis.from_url(
+                settings.CART_REDIS_URL, decode_responses=True
+            )
+            cls._decrement = cls._client.register_script(DECREMENT_SCRIPT)
+        return cls._client
+
+    @staticmethod
+    def key(owner: str) -> str:
+        return f"cart:{owner}"
+
+    def ttl(self, owner: str) -> int:
+        if owner.startswith("user:"):
+            return settings.CART_USER_TTL
+        return settings.SESSION_COOKIE_AGE
+
+    @staticmethod
+    def _parse(raw: dict) -> dict[str, dict]:
+        items = {}
+        for field, value in raw.items():
+            kind, _, stock_id = field.partition(":")
+            if kind == "q":
+                items[stock_id] = {
+                    "quantity": int(value),
+                    "price": raw.get(f"p:{stock_id}", "0"),
+                    "old_price": raw.get(
+                        f"o:{stock_id}", raw.get(f"p:{stock_id}", "0")
+                    ),
+                }
+        return items
+
+    def items(self) -> dict[str, dict]:
+        owner = self.owner()
+        if owner is None:
+            return {}
+        return self._parse(self.client().hgetall(self.key(owner)))
+
+    def add(self, stock_id: int, quantity: int, price: Decimal) -> None:
+        owner = self.owner(create=True)
+        key = self.key(owner)
+        pipe = self.client().pipeline()
+        pipe.hincrby(key, f"q:{stock_id}", quantity)
+        pipe.hsetnx(key, f"p:{stock_id}", str(price))
+        pipe.hsetnx(key, f"o:{stock_id}", str(price))
+        pipe.expire(key, self.ttl(owner))
+        pipe.execute()
+
+    def decrement(self, stock_id: int) -> None:
+        owner = self.owner()
+        if owner:
+            self.client()
+            self._decrement(keys=[self.key(owner)], args=[stock_id])
+
+    def remove(self, stock_id: int) -> None:
+        owner = self.owner()
+        if owner:
+            self.client().hdel(
+                self.key(owner), f"q:{stock_id}", f"p:{stock_id}", f"o:{stock_id}"
+            )
+
+    def set_price(self, stock_id: int, price: str) -> None:
+        owner = self.owner()
+        if owner and self.client().hexists(self.key(owner), f"q:{stock_id}"):
+            self.client().hset(self.key(owner), f"p:{stock_id}", price)
+
+    def clear(self) -> None:
+        owner = self.owner()
+        if owner:
+            self.client().delete(self.key(owner))
+
+    def merge(self, source: str, target: str) -> None:
+        client = self.client()
+        raw = client.hgetall(self.key(source))
+        pipe = client.pipeline()
+        for stock_id, line in self._parse(raw).items():
+            key = self.key(target)
+            pipe.hincrby(key, f"q:{stock_id}", line["quantity"])
+            pipe.hsetnx(key, f"p:{stock_id}", line["price"])
+            pipe.hsetnx(key, f"o:{stock_id}", line["old_price"])
+        pipe.expire(self.key(target), self.ttl(target))
+        pipe.delete(self.key(source))
+        pipe.execute()
+
+
+class DBCartStore(CartStore):
+    """
+    Корзина в таблице CartItem: изменение количества - точечный UPDATE
+    одной строки через F(), без перезаписи сессии
+    """
+
+    @staticmethod
+    def _items(owner: str):
+        return CartItem.objects.filter(owner=owner)
+
+    def items(self) -> dict[str, dict]:
+        owner = self.owner()
+        if owner is None:
+            return {}
+        rows = self._items(owner).order_by("pk")
+        return {
+            str(stock_id): {
+                "quantity": quantity,
+                "price": str(price),
+                "old_price": str(old_price),
+            }
+            for stock_id, quantity, price, old_price in rows.values_list(
+                "stock_id", "quantity", "price", "old_price"
+            )
+        }
+
+    def _add(self, owner: str, stock_id, quantity: int, price, old_price) -> None:
+        lines = self._items(owner).filter(stock_id=stock_id)
+        if lines.update(quantity=F("quantity") + quantity):
+            return
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(
+                    owner=owner,
+                    stock_id=stock_id,
+                    quantity=quantity,
+                    price=price,
+                    old_price=old_price,
+                )
+        except IntegrityError:
+            # позицию успела создать соседняя вкладка
+            lines.update(quantity=F("quantity") + quantity)
+
+    def add(self, stock_id: int, quantity: int, price: Decimal) -> None:
+        self._add(self.owner(create=True), stock_id, quantity, price, price)
+
+    def decrement(self, stock_id: int) -> None:
+        owner = self.owner()
+        if owner is None:
+            return
+        lines = self._items(owner).filter(stock_id=stock_id)
+        if not lines.filter(quantity__gt=1).update(quantity=F("quantity") - 1):
+            lines.delete()
+
+    def remove(self, stock_id: int) -> None:
+        owner = self.owner()
+        if owner:
+            self._items(owner).filter(stock_id=stock_id).delete()
+
+    def set_price(self, stock_id: int, price: str) -> None:
+        owner = self.owner()
+        if owner:
+            self._items(owner).filter(stock_id=stock_id).update(price=price)
+
+    def clear(self) -> None:
+        owner = self.owner()
+        if owner:
+            self._items(owner).delete()
+
+    def merge(self, source: str, target: str) -> None:
+        with transaction.atomic():
+            for line in self._items(source):
+                self._add(
+                    target, line.stock_id, line.quantity, line.price, line.old_price
+                )
+            self._items(source).delete()
+
+
+def get_cart_store(request) -> CartStore:
+    """
+    Хранилище корзины, выбранное в настройке CART_STORE
+    """
+    return import_string(settings.CART_STORE)(request)
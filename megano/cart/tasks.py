@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from cart.models import CartItem
+
+
+@shared_task
+def clear_stale_carts() -> int:
+    """
+    Удаление гостевых корзин DBCartStore, переживших срок сессии
+    """
+    expired = timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    deleted, _ = CartItem.objects.filter(
+        owner__startswith="anon:", updated_at__lt=expired
+    ).delete()
+    return deleted
@@ -1,3 +1,107 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from catalog.models import Category, Product, ProductImage, Seller, Stock
+
+from .cart import Cart
+from .models import CartItem
+from .signals import merge_cart_on_login
+
+
+class CartLinesTest(TestCase):
+    def setUp(self) -> None:
+        category = Category.objects.create(title="Электроника")
+        seller = Seller.objects.create(
+            name="Продавец", phone="123", address="Адрес", email="s@s.ru"
+        )
+        self.stocks = []
+        for index in range(5):
+            product = Product.objects.create(
+                category=category,
+                name=f"Товар {index}",
+                description="Описание",
+                avatar=ProductImage.objects.create(image="a.png"),
+            )
+            product.image.add(ProductImage.objects.create(image="b.png"))
+            self.stocks.append(
+                Stock.objects.create(seller=seller, product=product, price=100 + index)
+            )
+        self.request = RequestFactory().get("/")
+        self.request.session = SessionStore()
+
+    def test_lines_use_two_queries(self) -> None:
+        cart = Cart(self.request)
+        for stock in self.stocks:
+            cart.add(stock)
+        cart.add(self.stocks[0], 2)
+        with self.assertNumQueries(2):
+            lines = list(cart)
+            for line in lines:
+                line.name, line.seller, line.avatar, line.images
+        self.assertEqual([line.id for line in lines], [s.pk for s in self.stocks])
+        self.assertEqual(lines[0].quantity, 3)
+        self.assertEqual(lines[0].total_price, Decimal("300"))
+        self.assertEqual(lines[0].seller, "Продавец")
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_cart_page_within_query_budget(self) -> None:
+        for stock in self.stocks:
+            self.client.post(
+                reverse("cart:add_to_cart"), {"stock_id": stock.pk}, HTTP_REFERER="/"
+            )
+        response = self.client.get(reverse("cart:cart_details"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleted_stock_is_skipped(self) -> None:
+        cart = Cart(self.request)
+        cart.add(self.stocks[0])
+        cart.add(self.stocks[1])
+        self.stocks[1].delete()
+        self.assertEqual([line.id for line in cart], [self.stocks[0].pk])
+
+
+@override_settings(CART_STORE="cart.stores.DBCartStore")
+class DBCartStoreTest(TestCase):
+    def setUp(self) -> None:
+        category = Category.objects.create(title="Электроника")
+        seller = Seller.objects.create(
+            name="Продавец", phone="123", address="Адрес", email="s@s.ru"
+        )
+        product = Product.objects.create(category=category, name="Товар")
+        self.stock = Stock.objects.create(seller=seller, product=product, price=100)
+        self.session = SessionStore()
+        self.user = get_user_model().objects.create_user(
+            username="buyer", email="b@b.ru", password="secret"
+        )
+
+    def request(self, user=None):
+        request = RequestFactory().get("/")
+        request.session = self.session
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_tabs_do_not_clobber(self) -> None:
+        first, second = Cart(self.request()), Cart(self.request())
+        first.add(self.stock)
+        second.add(self.stock)
+        first.add(self.stock)
+        self.assertEqual(len(Cart(self.request())), 3)
+        second.remove(self.stock)
+        self.assertEqual(len(Cart(self.request())), 2)
+
+    def test_user_cart_survives_session_and_merges_guest_cart(self) -> None:
+        Cart(self.request(self.user)).add(self.stock)
+        Cart(self.request()).add(self.stock, 2)
+        merge_cart_on_login(None, self.request(self.user), self.user)
+
+        self.session = SessionStore()
+        cart = Cart(self.request(self.user))
+        self.assertEqual(cart.cart[str(self.stock.pk)]["quantity"], 3)
+        self.assertEqual(CartItem.objects.count(), 1)
+        cart.clear()
+        self.assertEqual(len(Cart(self.request(self.user))), 0)
@@ -3,7 +3,7 @@ from django.shortcuts import redirect, render
 from django.views import View
 from django.views.decorators.http import require_POST
 
-from catalog.models import Product, SaleProduct, Stock
+from catalog.models import SaleProduct, Stock
 
 from .cart import Cart
 
@@ -12,29 +12,7 @@ class CartDetailView(View):
     """View для корзины, реализация методов get, post и delete"""
 
     def get_cart_items(self, cart):
-        cart_items = []
-        for item in cart:
-            product_id = item.get("product_id")
-            if not product_id:
-                continue
-            product = Product.objects.get(id=product_id)
-
-            cart_items.append(
-                {
-                    "id": item.get("id"),
-                    "name": product.name,
-                    "price": float(item["price"]),
-                    "count": item["quantity"],
-                    "seller": item["seller"],
-                    "description": str(product.description[:150] + "..."),
-                    "images": [
-                        {"src": image, "alt": image.alt}
-                        for image in product.image.all()
-                    ],
-                    "avatar": product.avatar,
-                }
-            )
-        return cart_items
+        return cart.lines()
 
     def get(self, request, **kwargs):
         cart = Cart(request)
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.utils.translation import gettext_lazy as _
 
 from account.models import Profile
+from catalog.reviews import approve_reviews
 
 from .models import (
     Banner,
@@ -8,6 +10,7 @@ from .models import (
     Product,
     ProductImage,
     Review,
+    ReviewModeration,
     SaleProduct,
     Seller,
     Stock,
@@ -114,6 +117,31 @@ class ReviewAdmin(admin.ModelAdmin):
         "product",
     )
     search_fields = "text", "rating"
+    list_filter = ("is_valid",)
+    list_select_related = ("product", "profile__user")
+
+
+@admin.register(ReviewModeration)
+class ReviewModerationAdmin(admin.ModelAdmin):
+    """
+    Очередь непроверенных отзывов от старых к новым.
+    Выборка идет по частичному индексу review_moderation_idx,
+    точное число строк в таблице не считается
+    """
+
+    list_display = ("pk", "product", "text", "rating", "created_at", "profile")
+    list_select_related = ("product", "profile__user")
+    ordering = ("created_at", "id")
+    show_full_result_count = False
+    actions = ("approve",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(is_valid=False)
+
+    @admin.action(description=_("Одобрить выбранные отзывы"))
+    def approve(self, request, queryset):
+        count = approve_reviews(queryset)
+        self.message_user(request, _("Одобрено отзывов: %d") % count)
 
 
 @admin.register(Stock)
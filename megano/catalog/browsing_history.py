@@ -1,42 +1,110 @@
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from django.http import HttpRequest
+from django.utils import timezone
+
+from catalog.models import Product, ViewEvent
+
+
+def record_views(profile_id: int, product_ids: Iterable, viewed_at=None) -> None:
+    """
+    Запись просмотров профиля одним upsert. product_ids идут от старых
+    к новым, время просмотров сдвигается на микросекунды, чтобы сохранить
+    порядок. После записи история обрезается до BROWSING_HISTORY_LIMIT
+    """
+    # из повторов остается последний просмотр
+    product_ids = list(dict.fromkeys(int(pk) for pk in reversed(list(product_ids))))
+    product_ids.reverse()
+    if not product_ids:
+        return
+    viewed_at = viewed_at or timezone.now()
+    count = len(product_ids)
+    ViewEvent.objects.bulk_create(
+        [
+            ViewEvent(
+                profile_id=profile_id,
+                product_id=product_id,
+                viewed_at=viewed_at - timedelta(microseconds=count - number),
+            )
+            for number, product_id in enumerate(product_ids, start=1)
+        ],
+        update_conflicts=True,
+        unique_fields=["profile", "product"],
+        update_fields=["viewed_at"],
+    )
+    trim_history(profile_id)
+
 
-from catalog.models import Product
-from megano import settings
+def trim_history(profile_id: int) -> None:
+    stale = ViewEvent.objects.filter(profile_id=profile_id).order_by(
+        "-viewed_at", "-pk"
+    )[settings.BROWSING_HISTORY_LIMIT :]
+    stale_ids = list(stale.values_list("pk", flat=True))
+    if stale_ids:
+        ViewEvent.objects.filter(pk__in=stale_ids).delete()
 
 
 class BrowsingHistory(object):
     """
-    Класс истории просмотренных товаров с использованием сессий
+    Класс истории просмотренных товаров
 
-    history: list[Product]
+    history: list[str] последние просмотры в сессии, от старых к новым
 
-    При итерации возвращает объекты Product
+    У авторизованного пользователя история хранится в ViewEvent и
+    переживает выход из аккаунта. ViewEvent пополняется сбросом буфера
+    событий просмотра; просмотры, сделанные до входа, берутся из сессии.
+    При итерации возвращает объекты Product от новых к старым
     """
 
-    def __init__(self, request: HttpRequest):
+    def __init__(self, request: HttpRequest, user=None):
         """
-        Инициализируем историю
+        Инициализируем историю. user передается явно, когда request.user
+        еще не выставлен, например в обработчике входа
         """
         self.session = request.session
-        history = self.session.get(settings.BROWSING_HISTORY_SESSION_ID)
-        if not history:
-            history = self.session[settings.BROWSING_HISTORY_SESSION_ID] = list()
-        self.history = history
+        self.user = user or request.user
+        self.history = self.session.get(settings.BROWSING_HISTORY_SESSION_ID) or []
+
+    @property
+    def profile_id(self) -> Optional[int]:
+        if not self.user.is_authenticated:
+            return None
+        try:
+            return self.user.profile.pk
+        except ObjectDoesNotExist:
+            return None
 
     def add(self, product_id: int):
         """
-        Добавление продукта в список просмотренных
+        Добавление продукта в список просмотренных гостя.
+        Просмотры авторизованного пользователя попадают в ViewEvent
+        из буфера событий, поэтому сессия не меняется и запрос
+        не пишет в базу
         """
+        if self.user.is_authenticated:
+            return
         product_id = str(product_id)
+        if self.history and self.history[-1] == product_id:
+            # повторный просмотр не меняет сессию и не выставляет cookie
+            return
 
-        if product_id not in self.history:
-            if len(self.history) >= 20:
-                self.history.pop(0)
-                self.history.append(product_id)
-            else:
-                self.history.append(product_id)
+        if product_id in self.history:
+            self.history.remove(product_id)
+        self.history.append(product_id)
+        del self.history[: -settings.BROWSING_HISTORY_LIMIT]
         self.save()
 
+    def merge_anonymous(self):
+        """
+        Перенос просмотров из сессии в историю профиля после входа
+        """
+        profile_id = self.profile_id
+        if profile_id and self.history:
+            record_views(profile_id, self.history)
+
     def save(self):
         """
         Обновление сессии
@@ -44,18 +112,46 @@ class BrowsingHistory(object):
         self.session[settings.BROWSING_HISTORY_SESSION_ID] = self.history
         self.session.modified = True
 
+    def product_ids(self) -> list[int]:
+        """
+        id просмотренных товаров от новых к старым
+        """
+        product_ids = [int(pk) for pk in reversed(self.history)]
+        profile_id = self.profile_id
+        if profile_id:
+            # гостевые просмотры из сессии еще могут быть не сброшены в ViewEvent
+            product_ids = list(
+                dict.fromkeys(
+                    product_ids
+                    + list(
+                        ViewEvent.objects.filter(profile_id=profile_id)
+                        .order_by("-viewed_at", "-pk")
+                        .values_list("product_id", flat=True)[
+                            : settings.BROWSING_HISTORY_LIMIT
+                        ]
+                    )
+                )
+            )
+        return product_ids[: settings.BROWSING_HISTORY_LIMIT]
+
     def __iter__(self):
         """
-        Перебор продуктов в истории просмотров
+        Перебор продуктов в истории просмотров: все товары загружаются
+        одним in_bulk, порядок берется из списка id
         """
-        product_ids = self.history
+        product_ids = self.product_ids()
+        products = Product.objects.select_related("avatar").in_bulk(product_ids)
         for product_id in product_ids:
-            product = Product.objects.get(id=product_id)
-            yield product
+            if product_id in products:
+                yield products[product_id]
 
     def clear(self):
         """
-        Удаление истории просмотров из сессии
+        Удаление истории просмотров
         """
-        del self.session[settings.BROWSING_HISTORY_SESSION_ID]
+        self.session.pop(settings.BROWSING_HISTORY_SESSION_ID, None)
         self.session.modified = True
+        self.history = []
+        profile_id = self.profile_id
+        if profile_id:
+            ViewEvent.objects.filter(profile_id=profile_id).delete()
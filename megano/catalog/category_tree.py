@@ -0,0 +1,191 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional
+
+from django.db.models import Q
+
+from catalog.models import Category
+from core.snapshot import SettingsSnapshot
+
+
+@dataclass(frozen=True)
+class CategoryNode:
+    id: int
+    title: str
+    parent_id: Optional[int]
+    sorted_index: int
+    image_url: str
+    path: str = ""
+    children: tuple = ()
+
+    @property
+    def image(self) -> str:
+        return self.image_url
+
+    def __str__(self):
+        return self.title
+
+
+class CategoryTree(object):
+    """
+    Неизменяемое дерево категорий, загружаемое из БД одним запросом
+    """
+
+    def __init__(self, categories: list[dict]):
+        categories = sorted(
+            categories, key=lambda row: (-row["sorted_index"], row["id"])
+        )
+        rows = {row["id"]: row for row in categories}
+        child_ids = {row["id"]: [] for row in categories}
+        for row in categories:
+            if row["parent_id"] in child_ids:
+                child_ids[row["parent_id"]].append(row["id"])
+
+        nodes = {}
+
+        def build(node_id: int) -> CategoryNode:
+            # узлы собираются от листьев, чтобы хранить детей внутри родителя
+            if node_id not in nodes:
+                nodes[node_id] = None
+                row = rows[node_id]
+                nodes[node_id] = CategoryNode(
+                    id=node_id,
+                    title=row["title"],
+                    parent_id=row["parent_id"],
+                    sorted_index=row["sorted_index"],
+                    image_url=row["image_url"],
+                    path=row.get("path", ""),
+                    children=tuple(
+                        build(child)
+                        for child in child_ids[node_id]
+                        if nodes.get(child, True) is not None
+                    ),
+                )
+            return nodes[node_id]
+
+        for node_id in rows:
+            build(node_id)
+        self._nodes = MappingProxyType(nodes)
+        self.roots = tuple(
+            nodes[row["id"]] for row in categories if row["parent_id"] not in rows
+        )
+        self._descendants = MappingProxyType(
+            {node_id: self._collect(node) for node_id, node in nodes.items()}
+        )
+
+    @staticmethod
+    def _collect(node: CategoryNode) -> frozenset:
+        result, stack = set(), [node]
+        while stack:
+            current = stack.pop()
+            if current.id in result:
+                continue
+            result.add(current.id)
+            stack.extend(current.children)
+        return frozenset(result)
+
+    @classmethod
+    def load(cls) -> "CategoryTree":
+        rows = []
+        for category in Category.objects.only(
+            "id", "title", "parent_id", "sorted_index", "image", "path"
+        ):
+            rows.append(
+                {
+                    "id": category.id,
+                    "title": category.title,
+                    "parent_id": category.parent_id,
+                    "sorted_index": category.sorted_index,
+                    "image_url": category.image.url if category.image else "",
+                    "path": category.path,
+                }
+            )
+        return cls(rows)
+
+    def __contains__(self, category_id) -> bool:
+        return category_id in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def get(self, category_id) -> Optional[CategoryNode]:
+        return self._nodes.get(category_id)
+
+    def children(self, category_id) -> tuple:
+        node = self._nodes.get(category_id)
+        return node.children if node else ()
+
+    def parent(self, category_id) -> Optional[CategoryNode]:
+        node = self._nodes.get(category_id)
+        return self._nodes.get(node.parent_id) if node else None
+
+    def ancestors(self, category_id) -> list[CategoryNode]:
+        """
+        Предки категории от корня до непосредственного родителя
+        """
+        result, seen = [], set()
+        node = self.parent(category_id)
+        while node is not None and node.id not in seen:
+            seen.add(node.id)
+            result.append(node)
+            node = self.parent(node.id)
+        return result[::-1]
+
+    def breadcrumbs(self, category_id) -> list[CategoryNode]:
+        """
+        Путь от корня до самой категории без запросов к БД
+        """
+        node = self._nodes.get(category_id)
+        return self.ancestors(category_id) + [node] if node else []
+
+    def descendant_ids(self, category_id) -> frozenset:
+        """
+        Идентификаторы категории и всех ее подкатегорий
+        """
+        return self._descendants.get(category_id, frozenset([category_id]))
+
+    def subtree_q(self, category_id, prefix: str = "") -> Q:
+        """
+        Условие на товары (или сводки) поддерева категории без соединения
+        с категориями: равенство для листа, список подкатегорий из дерева
+        для остальных. Так ORDER BY списков читается из индексов сводки
+        (category, столбец, product) и (столбец, product), а соединение
+        по category__path заставляло SQLite сортировать все товары поддерева.
+        prefix - путь до модели с полем category, например "summary__"
+        """
+        node = self._nodes.get(category_id)
+        if node is not None and not node.children:
+            return Q(**{f"{prefix}category_id": category_id})
+        return Q(**{f"{prefix}category_id__in": self.descendant_ids(category_id)})
+
+
+def rebuild_category_paths() -> int:
+    """
+    Пересчет путей всех категорий по ссылкам на родителя.
+    Возвращает количество категорий
+    """
+    categories = {
+        category.pk: category
+        for category in Category.objects.only("pk", "parent_id", "path")
+    }
+
+    def build(category, seen=()) -> str:
+        if category.pk in seen:
+            raise ValueError(f"Category {category.pk} is its own ancestor")
+        parent = categories.get(category.parent_id)
+        parent_path = build(parent, seen + (category.pk,)) if parent else "/"
+        return f"{parent_path}{category.pk}/"
+
+    for category in categories.values():
+        category.path = build(category)
+    Category.objects.bulk_update(categories.values(), ["path"], batch_size=1000)
+    return len(categories)
+
+
+category_tree_snapshot = SettingsSnapshot(
+    CategoryTree, "category_tree", stats_name="category_tree"
+)
+
+
+def get_category_tree() -> CategoryTree:
+    return category_tree_snapshot.get()
@@ -0,0 +1,87 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Iterable
+
+from django.db.models import Min
+
+from catalog.models import Product
+
+# цена, которую сравнение показывало для товаров без складов
+DEFAULT_COMPARISON_PRICE = 100
+
+
+def load_compared_products(product_ids: Iterable) -> list[tuple[Product, Decimal]]:
+    """
+    Сравниваемые товары с лучшей ценой одним запросом.
+    Порядок совпадает с порядком добавления в сравнение,
+    удаленные из каталога товары пропускаются
+    """
+    product_ids = [int(pk) for pk in product_ids]
+    if not product_ids:
+        return []
+    products = (
+        Product.objects.select_related("avatar")
+        .annotate(best_price=Min("stocks__price"))
+        .in_bulk(product_ids)
+    )
+    return [
+        (
+            products[pk],
+            (
+                products[pk].best_price
+                if products[pk].best_price is not None
+                else DEFAULT_COMPARISON_PRICE
+            ),
+        )
+        for pk in product_ids
+        if pk in products
+    ]
+
+
+@dataclass
+class CharacteristicMatrix:
+    """
+    Матрица характеристики x товары, собранная за один проход.
+
+    values: dict[характеристика, list[значение по товарам]],
+    отсутствующая у товара характеристика хранится как None
+    shared: характеристики, одинаковые у всех товаров
+    differing: характеристики, значения которых у товаров расходятся
+    unique: характеристики, которые есть только у одного товара
+    """
+
+    keys: list[str] = field(default_factory=list)
+    values: dict[str, list] = field(default_factory=dict)
+    shared: set[str] = field(default_factory=set)
+    differing: set[str] = field(default_factory=set)
+    unique: set[str] = field(default_factory=set)
+    not_comparable: bool = False
+
+    @classmethod
+    def build(cls, characteristics: list[dict]) -> "CharacteristicMatrix":
+        characteristics = [item or {} for item in characteristics]
+        key_sets = [set(item) for item in characteristics]
+        keys = list(dict.fromkeys(key for item in characteristics for key in item))
+        values = {key: [item.get(key) for item in characteristics] for key in keys}
+
+        owners: dict[str, int] = dict.fromkeys(keys, 0)
+        for item_keys in key_sets:
+            for key in item_keys:
+                owners[key] += 1
+        common = set.intersection(*key_sets) if key_sets else set()
+        unique = {key for key, count in owners.items() if count == 1}
+        # одинаковым считается значение, совпадающее у всех товаров, поэтому
+        # сравнение идет по хэшируемому представлению (json бывает со списками)
+        shared = {key for key in common if len({repr(v) for v in values[key]}) == 1}
+
+        return cls(
+            keys=keys,
+            values=values,
+            shared=shared,
+            differing=set(keys) - shared,
+            unique=unique,
+            # у какого-то товара нет ни одной общей с остальными характеристики
+            not_comparable=any(
+                item_keys and item_keys <= unique for item_keys in key_sets
+            ),
+        )
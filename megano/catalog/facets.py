@@ -0,0 +1,230 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from decimal import Decimal, InvalidOperation
+from threading import Lock
+from typing import Optional
+
+from django.core.cache import cache
+
+from catalog.category_tree import get_category_tree
+from catalog.listing_cache import get_category_version
+from catalog.models import Product, ProductSummary, Seller, Stock, Tag
+from core.cache import CacheStats
+
+PRICE_BUCKETS = (0, 1000, 5000, 10000, 50000, 100000)
+FACET_CACHE_TIMEOUT = 60 * 60
+LOCAL_INDEX_LIMIT = 64
+
+# Фасеты с множественным выбором: значения внутри фасета объединяются (ИЛИ),
+# а разные фасеты пересекаются (И)
+MULTI_FACETS = ("seller", "price_bucket", "tag", "char")
+FLAG_FACETS = ("havecheck", "freecheck")
+
+stats = CacheStats.get("catalog_facets")
+
+
+def price_bucket(price) -> Optional[str]:
+    if price is None:
+        return None
+    lower = PRICE_BUCKETS[0]
+    for bound in PRICE_BUCKETS[1:]:
+        if price < bound:
+            return f"{lower}-{bound}"
+        lower = bound
+    return f"{lower}-"
+
+
+def _ids(values) -> array:
+    return array("q", sorted(set(values)))
+
+
+class FacetIndex(object):
+    """
+    Инвертированный индекс категории: фасет -> значение -> отсортированный
+    массив идентификаторов товаров. Комбинации фильтров вычисляются
+    пересечением массивов без обращения к БД
+    """
+
+    def __init__(self, category_id: int):
+        self.category_id = category_id
+        self.product_ids = array("q")
+        self.facets: dict[str, dict[str, array]] = {}
+        self.labels: dict[str, dict[str, str]] = {}
+        self.price_ids = array("q")
+        self.price_values: list[Decimal] = []
+
+    @classmethod
+    def build(cls, category_id: int) -> "FacetIndex":
+        index = cls(category_id)
+        facets = {name: defaultdict(list) for name in MULTI_FACETS + FLAG_FACETS}
+        in_subtree = get_category_tree().subtree_q(category_id)
+        summaries = list(
+            ProductSummary.objects.filter(in_subtree, active=True).values_list(
+                "product_id", "min_price", "total_quantity", "free_shipping"
+            )
+        )
+        prices = []
+        for product_id, min_price, total_quantity, free_shipping in summaries:
+            bucket = price_bucket(min_price)
+            if bucket:
+                facets["price_bucket"][bucket].append(product_id)
+                prices.append((min_price, product_id))
+            if total_quantity:
+                facets["havecheck"]["on"].append(product_id)
+            if free_shipping:
+                facets["freecheck"]["on"].append(product_id)
+        product_ids = [product_id for product_id, *_ in summaries]
+        index.product_ids = _ids(product_ids)
+        prices.sort()
+        index.price_values = [price for price, _ in prices]
+        index.price_ids = array("q", [product_id for _, product_id in prices])
+
+        members = ProductSummary.objects.filter(in_subtree, active=True).values(
+            "product_id"
+        )
+        stocks = Stock.objects.filter(product_id__in=members)
+        for product_id, seller_id in stocks.values_list("product_id", "seller_id"):
+            facets["seller"][str(seller_id)].append(product_id)
+        tags = Product.tag.through.objects.filter(product_id__in=members)
+        for product_id, tag_id in tags.values_list("product_id", "tag_id"):
+            facets["tag"][str(tag_id)].append(product_id)
+        characteristics = Product.objects.filter(id__in=members).values_list(
+            "id", "characteristics"
+        )
+        for product_id, values in characteristics:
+            for key, value in (values or {}).items():
+                if value not in (None, ""):
+                    facets["char"][f"{key}={value}"].append(product_id)
+
+        index.facets = {
+            name: {value: _ids(ids) for value, ids in values.items()}
+            for name, values in facets.items()
+        }
+        index.labels = {
+            "seller": {
+                str(pk): name
+                for pk, name in Seller.objects.filter(
+                    pk__in=[int(pk) for pk in index.facets["seller"]]
+                ).values_list("pk", "name")
+            },
+            "tag": {
+                str(pk): name
+                for pk, name in Tag.objects.filter(
+                    pk__in=[int(pk) for pk in index.facets["tag"]]
+                ).values_list("pk", "name")
+            },
+            "char": {value: value.replace("=", ": ", 1) for value in facets["char"]},
+            "price_bucket": {value: value for value in facets["price_bucket"]},
+        }
+        return index
+
+    def _price_range(self, price: str) -> Optional[set]:
+        try:
+            price_min, price_max = (Decimal(value) for value in price.split(";"))
+        except (ValueError, InvalidOperation):
+            return None
+        start = bisect_left(self.price_values, price_min)
+        end = bisect_right(self.price_values, price_max)
+        return set(self.price_ids[start:end])
+
+    def _facet_sets(self, selection: dict) -> dict[str, set]:
+        """
+        Множество подходящих товаров по каждому выбранному фасету
+        """
+        sets = {}
+        for name in MULTI_FACETS + FLAG_FACETS:
+            values = selection.get(name)
+            if not values:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            matched = set()
+            for value in values:
+                matched.update(self.facets.get(name, {}).get(value, ()))
+            sets[name] = matched
+        if selection.get("price"):
+            matched = self._price_range(selection["price"])
+            if matched is not None:
+                sets["price"] = matched
+        return sets
+
+    @staticmethod
+    def _intersect(sets) -> Optional[set]:
+        sets = sorted(sets, key=len)
+        if not sets:
+            return None
+        result = set(sets[0])
+        for other in sets[1:]:
+            result.intersection_update(other)
+        return result
+
+    def match(self, selection: dict) -> Optional[set]:
+        """
+        Товары, подходящие под все выбранные фасеты,
+        или None, если ни один фасет не выбран
+        """
+        return self._intersect(self._facet_sets(selection).values())
+
+    def counts(self, selection: dict) -> dict[str, list[dict]]:
+        """
+        Количество товаров для каждого значения фасета с учетом остальных
+        выбранных фасетов (выбор внутри самого фасета не сужает его счетчики)
+        """
+        sets = self._facet_sets(selection)
+        result = {}
+        for name, values in self.facets.items():
+            base = self._intersect(
+                matched for other, matched in sets.items() if other != name
+            )
+            selected = selection.get(name) or []
+            if isinstance(selected, str):
+                selected = [selected]
+            items = []
+            for value, ids in values.items():
+                count = len(ids) if base is None else len(base.intersection(ids))
+                items.append(
+                    {
+                        "value": value,
+                        "label": self.labels.get(name, {}).get(value, value),
+                        "count": count,
+                        "selected": value in selected,
+                    }
+                )
+            items.sort(key=lambda item: (-item["count"], item["label"]))
+            result[name] = items
+        return result
+
+
+_local_indexes: "OrderedDict[tuple, FacetIndex]" = OrderedDict()
+_local_lock = Lock()
+
+
+def get_facet_index(category_id: int) -> FacetIndex:
+    """
+    Индекс категории из памяти процесса, затем из общего кэша (Redis),
+    и только при промахе обоих - построение из БД
+    """
+    version = get_category_version(category_id)
+    local_key = (category_id, version)
+    with _local_lock:
+        index = _local_indexes.get(local_key)
+        if index is not None:
+            _local_indexes.move_to_end(local_key)
+            stats.hit()
+            return index
+
+    shared_key = f"catalog_facets:{category_id}:v{version}"
+    index = cache.get(shared_key)
+    if index is None:
+        stats.miss()
+        index = FacetIndex.build(category_id)
+        cache.set(shared_key, index, FACET_CACHE_TIMEOUT)
+    else:
+        stats.hit()
+
+    with _local_lock:
+        _local_indexes[local_key] = index
+        while len(_local_indexes) > LOCAL_INDEX_LIMIT:
+            _local_indexes.popitem(last=False)
+    return index
@@ -0,0 +1,420 @@
+import datetime
+import random
+import time
+import uuid
+from array import array
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Callable, Iterator, Optional
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from account.models import Profile
+from catalog.category_tree import category_tree_snapshot, rebuild_category_paths
+from catalog.listing_cache import bump_category_versions
+from catalog.models import (
+    Category,
+    Product,
+    ProductImage,
+    Review,
+    SaleProduct,
+    Seller,
+    Stock,
+    Tag,
+)
+from catalog.review_stats import recompute_review_stats
+from catalog.search import rebuild_search_index
+from catalog.summary import rebuild_product_summaries
+from order.models import Order, OrderItemModel
+
+GENERATOR_BATCH_SIZE = 5000
+
+ADJECTIVES = (
+    "Новый",
+    "Компактный",
+    "Мощный",
+    "Легкий",
+    "Умный",
+    "Беспроводной",
+    "Профессиональный",
+    "Классический",
+)
+NOUNS = (
+    "смартфон",
+    "ноутбук",
+    "планшет",
+    "монитор",
+    "наушники",
+    "фотоаппарат",
+    "телевизор",
+    "пылесос",
+    "чайник",
+    "холодильник",
+)
+MANUFACTURERS = ("Acme", "Globex", "Initech", "Umbrella", "Hooli", "Soylent", "Tyrell")
+COLORS = ("черный", "белый", "серый", "синий", "красный")
+TAG_NAMES = ("Новинка", "Хит", "Скидка", "Подарок", "Эксклюзив", "Эко", "Премиум")
+
+
+@dataclass
+class CatalogSize:
+    """
+    Целевые объемы генерируемого каталога
+    """
+
+    categories: int = 50
+    depth: int = 3
+    products: int = 10000
+    sellers: int = 50
+    stocks_per_product: int = 3
+    images_per_product: int = 2
+    reviews: int = 20000
+    users: int = 1000
+    sales: int = 20
+    orders: int = 5000
+
+
+def batches(total: int, size: int) -> Iterator[tuple[int, int]]:
+    for start in range(0, total, size):
+        yield start, min(start + size, total)
+
+
+class CatalogGenerator(object):
+    """
+    Генерация синтетического каталога пачками через bulk_create.
+    Одинаковые seed и размеры дают одинаковые данные
+    """
+
+    def __init__(
+        self,
+        size: CatalogSize,
+        seed: int = 0,
+        batch_size: int = GENERATOR_BATCH_SIZE,
+        report: Optional[Callable[[str], None]] = None,
+    ):
+        self.size = size
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.report = report or (lambda message: None)
+        self.today = datetime.date(2024, 1, 1) + datetime.timedelta(days=seed % 365)
+        self.category_ids: list[int] = []
+        self.leaf_ids: list[int] = []
+        self.tag_ids: list[int] = []
+        self.seller_ids: list[int] = []
+        self.profile_ids: list[int] = []
+        self.product_ids = array("q")
+        self.stock_ids = array("q")
+
+    def _progress(self, name: str, done: int, total: int, started: float) -> None:
+        self.report(f"{name}: {done}/{total} ({time.monotonic() - started:.1f}s)")
+
+    def _bulk(self, name: str, total: int, build: Callable[[int, int], None]) -> None:
+        """
+        Создание total объектов пачками: build(start, end) создает объекты
+        с номерами [start, end) в отдельной транзакции
+        """
+        started = time.monotonic()
+        for start, end in batches(total, self.batch_size):
+            with transaction.atomic():
+                build(start, end)
+            self._progress(name, end, total, started)
+
+    def generate(self) -> None:
+        started = time.monotonic()
+        self.create_categories()
+        self.create_tags()
+        self.create_sellers()
+        self.create_users()
+        self.create_products()
+        self.create_reviews()
+        self.create_sales()
+        self.create_orders()
+        self.rebuild_derived_data()
+        self.report(f"Done in {time.monotonic() - started:.1f}s")
+
+    def create_categories(self) -> None:
+        total = max(self.size.categories, 1)
+        depth = max(self.size.depth, 1)
+        branching = max(2, round(total ** (1 / depth)))
+        level = [None]
+        parents = set()
+        index = 0
+        for _ in range(depth):
+            if index >= total:
+                break
+            categories = []
+            for parent_id in level:
+                for _ in range(branching):
+                    if index >= total:
+                        break
+                    index += 1
+                    parents.add(parent_id)
+                    categories.append(
+                        Category(
+                            title=f"Категория {index}",
+                            parent_id=parent_id,
+                            sorted_index=index,
+                        )
+                    )
+            Category.objects.bulk_create(categories, batch_size=self.batch_size)
+            level = [category.pk for category in categories]
+            self.category_ids.extend(level)
+        self.leaf_ids = [pk for pk in self.category_ids if pk not in parents]
+        rebuild_category_paths()
+        self.report(f"categories: {len(self.category_ids)} (depth {depth})")
+
+    def create_tags(self) -> None:
+        tags = Tag.objects.bulk_create([Tag(name=name) for name in TAG_NAMES])
+        self.tag_ids = [tag.pk for tag in tags]
+
+    def create_sellers(self) -> None:
+        def build(start, end):
+            sellers = Seller.objects.bulk_create(
+                [
+                    Seller(
+                        name=f"Продавец {index + 1}",
+                        description="Сгенерированный продавец",
+                        phone=f"+7900{index:07d}"[:15],
+                        address=f"Улица {index + 1}",
+                        email=f"seller{index + 1}@example.com",
+                        image="images/sellers/generated.png",
+                    )
+                    for index in range(start, end)
+                ]
+            )
+            self.seller_ids.extend(seller.pk for seller in sellers)
+
+        self._bulk("sellers", max(self.size.sellers, 1), build)
+
+    def create_users(self) -> None:
+        User = get_user_model()
+        password = make_password(None)
+
+        def build(start, end):
+            users = User.objects.bulk_create(
+                [
+                    User(
+                        username=f"user{index}",
+                        email=f"user{index}@example.com",
+                        password=password,
+                    )
+                    for index in range(start, end)
+                ]
+            )
+            profiles = Profile.objects.bulk_create(
+                [Profile(user_id=user.pk) for user in users]
+            )
+            self.profile_ids.extend(profile.pk for profile in profiles)
+
+        self._bulk("users", self.size.users, build)
+
+    def _product(self, index: int, category_id: int, avatar_id) -> Product:
+        rng = self.random
+        noun = rng.choice(NOUNS)
+        return Product(
+            category_id=category_id,
+            avatar_id=avatar_id,
+            name=f"{rng.choice(ADJECTIVES)} {noun} {index + 1}",
+            description=f"Описание товара {index + 1}: {noun}",
+            manufacturer=rng.choice(MANUFACTURERS),
+            active=rng.random() < 0.95,
+            limited_edition=rng.random() < 0.02,
+            characteristics={
+                "color": rng.choice(COLORS),
+                "weight": rng.randint(1, 50) * 100,
+                "warranty": rng.choice((12, 24, 36)),
+            },
+        )
+
+    def create_products(self) -> None:
+        """
+        Товары вместе с изображениями, тэгами и складами:
+        каждая пачка товаров сразу получает все связанные строки
+        """
+        rng = self.random
+        images_per_product = max(self.size.images_per_product, 1)
+        stocks_per_product = min(self.size.stocks_per_product, len(self.seller_ids))
+        image_through = Product.image.through
+        tag_through = Product.tag.through
+
+        def build(start, end):
+            images = ProductImage.objects.bulk_create(
+                [
+                    ProductImage(
+                        image=f"images/products/generated/{index % 100}.jpg",
+                        alt=f"Товар {index + 1}",
+                    )
+                    for index in range(start, end)
+                    for _ in range(images_per_product)
+                ]
+            )
+            products = Product.objects.bulk_create(
+                [
+                    self._product(
+                        index,
+                        rng.choice(self.leaf_ids),
+                        images[(index - start) * images_per_product].pk,
+                    )
+                    for index in range(start, end)
+                ]
+            )
+            self.product_ids.extend(product.pk for product in products)
+            image_through.objects.bulk_create(
+                [
+                    image_through(
+                        product_id=product.pk,
+                        productimage_id=images[offset * images_per_product + number].pk,
+                    )
+                    for offset, product in enumerate(products)
+                    for number in range(images_per_product)
+                ]
+            )
+            tag_through.objects.bulk_create(
+                [
+                    tag_through(product_id=product.pk, tag_id=tag_id)
+                    for product in products
+                    for tag_id in rng.sample(self.tag_ids, rng.randint(0, 2))
+                ]
+            )
+            stocks = Stock.objects.bulk_create(
+                [
+                    Stock(
+                        seller_id=seller_id,
+                        product_id=product.pk,
+                        quantity=rng.randint(0, 200),
+                        quantity_sold=rng.randint(0, 1000),
+                        price=Decimal(rng.randint(100, 200000)),
+                        create_date=self.today
+                        - datetime.timedelta(days=rng.randint(0, 365)),
+                        free_shipping=rng.random() < 0.2,
+                    )
+                    for product in products
+                    for seller_id in rng.sample(self.seller_ids, stocks_per_product)
+                ]
+            )
+            self.stock_ids.extend(stock.pk for stock in stocks)
+
+        self._bulk("products", self.size.products, build)
+
+    def create_reviews(self) -> None:
+        if not self.profile_ids or not self.product_ids:
+            return
+        rng = self.random
+
+        def build(start, end):
+            Review.objects.bulk_create(
+                [
+                    Review(
+                        text=f"Отзыв {index + 1}",
+                        rating=Decimal(rng.randint(1, 5)),
+                        profile_id=rng.choice(self.profile_ids),
+                        product_id=rng.choice(self.product_ids),
+                        is_valid=rng.random() < 0.9,
+                    )
+                    for index in range(start, end)
+                ]
+            )
+
+        self._bulk("reviews", self.size.reviews, build)
+
+    def create_sales(self) -> None:
+        if not self.stock_ids:
+            return
+        rng = self.random
+        through = SaleProduct.stocks.through
+
+        def build(start, end):
+            sales = SaleProduct.objects.bulk_create(
+                [
+                    SaleProduct(
+                        title=f"Скидка {index + 1}",
+                        description="Сгенерированная акция",
+                        promocode=uuid.UUID(int=rng.getrandbits(128)),
+                        image="images/sales/generated.png",
+                        date_start=self.today - datetime.timedelta(days=7),
+                        date_end=self.today
+                        + datetime.timedelta(days=rng.randint(1, 60)),
+                        sale_type=rng.choice(("percent", "ruble")),
+                        sale_count=rng.randint(5, 30),
+                    )
+                    for index in range(start, end)
+                ]
+            )
+            through.objects.bulk_create(
+                [
+                    through(saleproduct_id=sale.pk, stock_id=stock_id)
+                    for sale in sales
+                    for stock_id in set(
+                        rng.choice(self.stock_ids) for _ in range(rng.randint(1, 20))
+                    )
+                ]
+            )
+
+        self._bulk("sales", self.size.sales, build)
+
+    def create_orders(self) -> None:
+        if not self.profile_ids or not self.stock_ids:
+            return
+        rng = self.random
+
+        def build(start, end):
+            lines = [
+                {rng.choice(self.stock_ids): rng.randint(1, 3) for _ in range(3)}
+                for _ in range(start, end)
+            ]
+            prices = dict(
+                Stock.objects.filter(
+                    pk__in={
+                        stock_id for order_lines in lines for stock_id in order_lines
+                    }
+                ).values_list("pk", "price")
+            )
+            orders = []
+            for order_lines in lines:
+                paid = rng.random() < 0.7
+                orders.append(
+                    Order(
+                        profile_id=rng.choice(self.profile_ids),
+                        delivery_address="Сгенерированный адрес",
+                        price=sum(
+                            prices[stock_id] * count
+                            for stock_id, count in order_lines.items()
+                        ),
+                        pay_result=paid,
+                        order_status="PAID" if paid else "NOT_PAID",
+                    )
+                )
+            orders = Order.objects.bulk_create(orders)
+            OrderItemModel.objects.bulk_create(
+                [
+                    OrderItemModel(
+                        order_id=order.pk,
+                        stock_id=stock_id,
+                        count=count,
+                        full_price=prices[stock_id] * count,
+                    )
+                    for order, order_lines in zip(orders, lines)
+                    for stock_id, count in order_lines.items()
+                ]
+            )
+
+        self._bulk("orders", self.size.orders, build)
+
+    def rebuild_derived_data(self) -> None:
+        """
+        bulk_create не вызывает сигналы, поэтому агрегаты отзывов, сводки,
+        поисковый индекс и кэши каталога пересчитываются один раз в конце
+        """
+        started = time.monotonic()
+        recompute_review_stats(self.product_ids)
+        self.report(f"review stats ({time.monotonic() - started:.1f}s)")
+        started = time.monotonic()
+        rebuild_product_summaries()
+        self.report(f"summaries ({time.monotonic() - started:.1f}s)")
+        started = time.monotonic()
+        rebuild_search_index()
+        self.report(f"search index ({time.monotonic() - started:.1f}s)")
+        category_tree_snapshot.invalidate()
+        bump_category_versions(self.category_ids)
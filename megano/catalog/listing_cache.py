@@ -0,0 +1,186 @@
+import json
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from hashlib import md5
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from catalog.category_tree import get_category_tree
+from core.cache import CacheStats
+from core.models import SiteSettings
+
+stats = CacheStats.get("catalog_listing")
+
+
+@dataclass
+class ProductCard:
+    """
+    Материализованная карточка товара для списка каталога
+    """
+
+    id: int
+    name: str
+    price: Optional[Decimal]
+    category: str
+    avatar_url: str = ""
+    best_stock_id: Optional[int] = None
+
+    @classmethod
+    def from_product(cls, product) -> "ProductCard":
+        summary = getattr(product, "summary", None)
+        avatar = product.avatar
+        return cls(
+            id=product.pk,
+            name=product.name,
+            price=getattr(product, "price", None),
+            category=str(product.category),
+            avatar_url=avatar.image.url if avatar and avatar.image else "",
+            best_stock_id=summary.best_stock_id if summary else None,
+        )
+
+
+@dataclass
+class OffsetPageSnapshot:
+    """
+    Снимок страницы обычной пагинации, заменяющий Paginator и Page в контексте
+    """
+
+    object_list: list
+    number: int = 1
+    num_pages: int = 1
+    count: int = 0
+    page_range: list = field(default_factory=list)
+    has_next: bool = False
+    has_previous: bool = False
+    next_page_number: Optional[int] = None
+    previous_page_number: Optional[int] = None
+
+    @classmethod
+    def from_page(cls, paginator, page, object_list) -> "OffsetPageSnapshot":
+        return cls(
+            object_list=object_list,
+            number=page.number,
+            num_pages=paginator.num_pages,
+            count=paginator.count,
+            page_range=list(paginator.page_range),
+            has_next=page.has_next(),
+            has_previous=page.has_previous(),
+            next_page_number=page.number + 1 if page.has_next() else None,
+            previous_page_number=page.number - 1 if page.has_previous() else None,
+        )
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _version_key(category_id) -> str:
+    return settings.PRODUCT_CACHE_KEY.format(category_id=category_id) + ":version"
+
+
+def get_version(key: str) -> int:
+    """
+    Текущее значение счетчика версии. Начальное значение берется из времени,
+    чтобы после вытеснения ключа версии не поднять старые страницы
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(keys: Iterable[str]) -> None:
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
+
+
+def get_category_version(category_id) -> int:
+    """
+    Текущая версия кэша категории
+    """
+    return get_version(_version_key(category_id))
+
+
+def bump_category_versions(category_ids: Iterable) -> None:
+    """
+    Инвалидация кэша списков только для затронутых категорий и их предков,
+    в списки которых попадают товары подкатегорий
+    """
+    tree = get_category_tree()
+    category_ids = set(category_ids)
+    for category_id in list(category_ids):
+        category_ids.update(node.id for node in tree.ancestors(category_id))
+    bump_versions(_version_key(category_id) for category_id in category_ids)
+
+
+def _seller_version_key(seller_id) -> str:
+    return f"seller:{seller_id}:version"
+
+
+SALES_VERSION_KEY = "sales:version"
+
+
+def get_seller_version(seller_id) -> int:
+    """
+    Версия страницы продавца: его данные, склады и товары на них
+    """
+    return get_version(_seller_version_key(seller_id))
+
+
+def bump_seller_versions(seller_ids: Iterable) -> None:
+    bump_versions(_seller_version_key(seller_id) for seller_id in set(seller_ids))
+
+
+def get_sales_version() -> int:
+    """
+    Версия списка акций
+    """
+    return get_version(SALES_VERSION_KEY)
+
+
+def bump_sales_version() -> None:
+    bump_versions([SALES_VERSION_KEY])
+
+
+def make_listing_key(category_id, sort: str, filters: dict, page: str) -> str:
+    """
+    Ключ страницы списка: категория, версия, сортировка, фильтры и страница
+    """
+    params = json.dumps([sort, sorted(filters.items()), page], ensure_ascii=False)
+    digest = md5(params.encode()).hexdigest()
+    return "{prefix}:v{version}:{digest}".format(
+        prefix=settings.PRODUCT_CACHE_KEY.format(category_id=category_id),
+        version=get_category_version(category_id),
+        digest=digest,
+    )
+
+
+def get_or_build_listing(
+    category_id, sort: str, filters: dict, page: str, builder: Callable
+):
+    """
+    Чтение страницы списка из кэша или ее построение через builder
+    с учетом настроек кэширования сайта
+    """
+    site_settings = SiteSettings.get_cached()
+    if not site_settings.cache_active or not site_settings.cache_products_time:
+        return builder()
+
+    key = make_listing_key(category_id, sort, filters, page)
+    payload = cache.get(key)
+    if payload is not None:
+        stats.hit()
+        return payload
+    stats.miss()
+    payload = builder()
+    cache.set(key, payload, site_settings.cache_products_time)
+    return payload
@@ -0,0 +1,39 @@
+from dataclasses import fields
+
+from django.core.management import BaseCommand
+
+from catalog.generator import GENERATOR_BATCH_SIZE, CatalogGenerator, CatalogSize
+
+
+class Command(BaseCommand):
+    """
+    Команда для генерации синтетического каталога заданного объема,
+    например: generate_catalog --products 1000000 --categories 500 --depth 3
+    """
+
+    help = "Generate a reproducible synthetic catalog with bulk inserts"
+
+    def add_arguments(self, parser):
+        for field in fields(CatalogSize):
+            parser.add_argument(
+                f"--{field.name.replace('_', '-')}",
+                type=int,
+                default=field.default,
+                dest=field.name,
+            )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=GENERATOR_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        size = CatalogSize(
+            **{field.name: options[field.name] for field in fields(CatalogSize)}
+        )
+        self.stdout.write(f"Generate catalog: {size}")
+        generator = CatalogGenerator(
+            size,
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            report=self.stdout.write,
+        )
+        generator.generate()
+        self.stdout.write(self.style.SUCCESS("Catalog generated"))
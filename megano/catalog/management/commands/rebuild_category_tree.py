@@ -0,0 +1,15 @@
+from django.core.management import BaseCommand
+
+from catalog.category_tree import category_tree_snapshot, rebuild_category_paths
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчета материализованных путей категорий
+    """
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuild category tree")
+        count = rebuild_category_paths()
+        category_tree_snapshot.invalidate()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} categories"))
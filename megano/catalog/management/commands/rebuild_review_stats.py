@@ -0,0 +1,29 @@
+from django.core.management import BaseCommand
+
+from catalog.listing_cache import bump_category_versions
+from catalog.models import Product
+from catalog.product_page import invalidate_product_pages
+from catalog.review_stats import recompute_review_stats
+from catalog.summary import update_product_summaries
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчета агрегатов отзывов товаров по базе
+    вместе со сводками и кэшами зависящих от них страниц
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "product_ids", nargs="*", type=int, help="Товары (по умолчанию все)"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuild review stats")
+        product_ids = options["product_ids"] or list(
+            Product.objects.values_list("pk", flat=True)
+        )
+        count = recompute_review_stats(product_ids)
+        bump_category_versions(update_product_summaries(product_ids))
+        invalidate_product_pages(product_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} products"))
@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+
+from catalog.search import SEARCH_BATCH_SIZE, rebuild_search_index
+
+
+class Command(BaseCommand):
+    """
+    Команда для полной переиндексации поиска по товарам
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=SEARCH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuild search index")
+        count = rebuild_search_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products"))
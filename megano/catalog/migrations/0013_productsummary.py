@@ -0,0 +1,164 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_product_summaries(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    ProductSummary = apps.get_model("catalog", "ProductSummary")
+    products = Product.objects.annotate(
+        min_price=models.Min("stocks__price"),
+        max_quantity=models.Max("stocks__quantity"),
+        total_quantity=models.Sum("stocks__quantity"),
+        quantity_sold=models.Sum("stocks__quantity_sold"),
+        last_stock_date=models.Max("stocks__create_date"),
+        free_shipping_count=models.Count(
+            "stocks", filter=models.Q(stocks__free_shipping=True)
+        ),
+    )
+    summaries = []
+    for product in products.iterator():
+        best_stock = product.stocks.order_by("price", "id").first()
+        rating = product.reviews.aggregate(rating=models.Max("rating"))["rating"]
+        summaries.append(
+            ProductSummary(
+                product_id=product.pk,
+                category_id=product.category_id,
+                active=product.active,
+                best_stock_id=best_stock.pk if best_stock else None,
+                min_price=product.min_price,
+                max_quantity=product.max_quantity or 0,
+                total_quantity=product.total_quantity or 0,
+                quantity_sold=product.quantity_sold or 0,
+                rating=rating,
+                last_stock_date=product.last_stock_date,
+                free_shipping=product.free_shipping_count > 0,
+            )
+        )
+    ProductSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0012_alter_saleproduct_promocode"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSummary",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="catalog.product",
+                        verbose_name="Товар",
+                    ),
+                ),
+                ("active", models.BooleanField(default=False, verbose_name="Активен")),
+                (
+                    "min_price",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=16,
+                        null=True,
+                        verbose_name="Минимальная цена",
+                    ),
+                ),
+                (
+                    "max_quantity",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Максимальное количество"
+                    ),
+                ),
+                (
+                    "total_quantity",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Всего на складах"
+                    ),
+                ),
+                (
+                    "quantity_sold",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Число проданных"
+                    ),
+                ),
+                (
+                    "rating",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        max_digits=3,
+                        null=True,
+                        verbose_name="Оценка",
+                    ),
+                ),
+                (
+                    "last_stock_date",
+                    models.DateField(
+                        blank=True,
+                        null=True,
+                        verbose_name="Дата последнего поступления",
+                    ),
+                ),
+                (
+                    "free_shipping",
+                    models.BooleanField(
+                        default=False, verbose_name="Бесплатная доставка"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+                ),
+                (
+                    "best_stock",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="catalog.stock",
+                        verbose_name="Лучшее предложение",
+                    ),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="catalog.category",
+                        verbose_name="Категория",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сводка по товару",
+                "verbose_name_plural": "Сводки по товарам",
+                "indexes": [
+                    models.Index(
+                        fields=["category", "active", "min_price"],
+                        name="catalog_pro_categor_1e5e1b_idx",
+                    ),
+                    models.Index(
+                        fields=["category", "active", "rating"],
+                        name="catalog_pro_categor_acc775_idx",
+                    ),
+                    models.Index(
+                        fields=["category", "active", "last_stock_date"],
+                        name="catalog_pro_categor_0db5fc_idx",
+                    ),
+                    models.Index(
+                        fields=["category", "active", "max_quantity"],
+                        name="catalog_pro_categor_6bfa64_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_product_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_product_fts USING fts5("
+    "category_id UNINDEXED, name, manufacturer, tags, characteristics, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_product_fts_vocab "
+    "USING fts5vocab(catalog_product_fts, 'row')",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS catalog_product_fts_vocab",
+    "DROP TABLE IF EXISTS catalog_product_fts",
+]
+POSTGRES_FORWARD = [
+    "CREATE TABLE IF NOT EXISTS catalog_product_search ("
+    "product_id bigint PRIMARY KEY REFERENCES catalog_product (id) "
+    "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "category_id bigint NOT NULL, document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS catalog_product_search_document_idx "
+    "ON catalog_product_search USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS catalog_product_search_category_idx "
+    "ON catalog_product_search (category_id)",
+]
+POSTGRES_BACKWARD = ["DROP TABLE IF EXISTS catalog_product_search"]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+def fill_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in ("sqlite", "postgresql"):
+        return
+    Product = apps.get_model("catalog", "Product")
+    rows = []
+    for product in Product.objects.filter(active=True).prefetch_related("tag"):
+        characteristics = product.characteristics or {}
+        rows.append(
+            (
+                product.pk,
+                product.category_id,
+                product.name,
+                product.manufacturer,
+                " ".join(tag.name for tag in product.tag.all()),
+                " ".join(str(value) for value in characteristics.values() if value),
+            )
+        )
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.executemany(
+                "INSERT INTO catalog_product_fts "
+                "(rowid, category_id, name, manufacturer, tags, characteristics) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                rows,
+            )
+        else:
+            cursor.executemany(
+                "INSERT INTO catalog_product_search "
+                "(product_id, category_id, document) VALUES (%s, %s, "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C') || "
+                "setweight(to_tsvector('simple', %s), 'D'))",
+                rows,
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0013_productsummary"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            run_for_vendor(
+                {"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}
+            ),
+        ),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+from catalog.ranking import popularity_score
+
+
+def fill_scores(apps, schema_editor):
+    ProductSummary = apps.get_model("catalog", "ProductSummary")
+    Review = apps.get_model("catalog", "Review")
+    review_counts = dict(
+        Review.objects.filter(is_valid=True)
+        .values("product_id")
+        .annotate(count=models.Count("pk"))
+        .values_list("product_id", "count")
+    )
+    summaries = list(ProductSummary.objects.all())
+    for summary in summaries:
+        summary.review_count = review_counts.get(summary.product_id, 0)
+        summary.score = popularity_score(
+            summary.quantity_sold,
+            summary.review_count,
+            summary.rating,
+            summary.last_stock_date,
+        )
+    ProductSummary.objects.bulk_update(
+        summaries, ["review_count", "score"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0014_product_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productsummary",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Число отзывов"),
+        ),
+        migrations.AddField(
+            model_name="productsummary",
+            name="score",
+            field=models.FloatField(default=0, verbose_name="Популярность"),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                fields=["active", "-score"], name="catalog_pro_active_d8322a_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                fields=["category", "active", "-score"],
+                name="catalog_pro_categor_3c701e_idx",
+            ),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
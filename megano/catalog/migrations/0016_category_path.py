@@ -0,0 +1,39 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+
+def fill_category_paths(apps, schema_editor):
+    Category = apps.get_model("catalog", "Category")
+    categories = {category.pk: category for category in Category.objects.all()}
+
+    def build(category, seen=()):
+        parent = categories.get(category.parent_id)
+        if parent is None or parent.pk in seen:
+            return f"/{category.pk}/"
+        return f"{build(parent, seen + (category.pk,))}{category.pk}/"
+
+    for category in categories.values():
+        category.path = build(category)
+    Category.objects.bulk_update(categories.values(), ["path"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0015_productsummary_score"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(
+                db_index=True,
+                default="",
+                editable=False,
+                max_length=255,
+                verbose_name="Путь",
+            ),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("account", "0004_alter_profile_phone"),
+        ("catalog", "0016_category_path"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ViewEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("viewed_at", models.DateTimeField(verbose_name="Время просмотра")),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="view_events",
+                        to="catalog.product",
+                        verbose_name="Товар",
+                    ),
+                ),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="view_events",
+                        to="account.profile",
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Просмотр товара",
+                "verbose_name_plural": "Просмотры товаров",
+                "indexes": [
+                    models.Index(
+                        fields=["profile", "-viewed_at"],
+                        name="catalog_vie_profile_79597e_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="viewevent",
+            constraint=models.UniqueConstraint(
+                fields=("profile", "product"), name="unique_view_event"
+            ),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0017_viewevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productsummary",
+            name="views",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Просмотры за период"
+            ),
+        ),
+        migrations.CreateModel(
+            name="ProductDailyViews",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="День")),
+                (
+                    "views",
+                    models.PositiveIntegerField(default=0, verbose_name="Просмотры"),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_views",
+                        to="catalog.product",
+                        verbose_name="Товар",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Просмотры товара за день",
+                "verbose_name_plural": "Просмотры товаров по дням",
+                "indexes": [
+                    models.Index(fields=["day"], name="catalog_pro_day_de5573_idx")
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="productdailyviews",
+            constraint=models.UniqueConstraint(
+                fields=("product", "day"), name="unique_product_daily_views"
+            ),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:17
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def fill_review_stats(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    Review = apps.get_model("catalog", "Review")
+    stats = (
+        Review.objects.filter(is_valid=True, product__isnull=False)
+        .values("product_id")
+        .annotate(
+            review_count=models.Count("pk"),
+            rating_count=models.Count("rating"),
+            rating_sum=models.Sum("rating"),
+        )
+    )
+    products = []
+    for row in stats:
+        rating_sum = row["rating_sum"] or Decimal(0)
+        products.append(
+            Product(
+                pk=row["product_id"],
+                review_count=row["review_count"],
+                rating_count=row["rating_count"],
+                rating_sum=rating_sum,
+                rating_avg=(
+                    (rating_sum / row["rating_count"]).quantize(Decimal("0.01"))
+                    if row["rating_count"]
+                    else None
+                ),
+            )
+        )
+    Product.objects.bulk_update(
+        products,
+        ["review_count", "rating_count", "rating_sum", "rating_avg"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0018_product_daily_views"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_avg",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                max_digits=3,
+                null=True,
+                verbose_name="Средняя оценка",
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Число оценок"),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.DecimalField(
+                decimal_places=2, default=0, max_digits=12, verbose_name="Сумма оценок"
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Число отзывов"),
+        ),
+        migrations.RunPython(fill_review_stats, migrations.RunPython.noop),
+    ]
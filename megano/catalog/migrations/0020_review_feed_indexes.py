@@ -0,0 +1,44 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0019_product_review_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReviewModeration",
+            fields=[],
+            options={
+                "verbose_name": "Отзыв на модерации",
+                "verbose_name_plural": "Очередь модерации отзывов",
+                "proxy": True,
+                "indexes": [],
+                "constraints": [],
+            },
+            bases=("catalog.review",),
+        ),
+        migrations.AlterField(
+            model_name="review",
+            name="created_at",
+            field=models.DateField(auto_now_add=True, verbose_name="Дата создания"),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["product", "is_valid", "created_at", "id"],
+                name="catalog_rev_product_e6db35_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                condition=models.Q(("is_valid", False)),
+                fields=["created_at", "id"],
+                name="review_moderation_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0020_review_feed_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="review",
+            name="catalog_rev_product_e6db35_idx",
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                condition=models.Q(("is_valid", True)),
+                fields=["product", "-created_at", "-id"],
+                name="review_feed_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("catalog", "0021_review_feed_partial_index"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="productsummary",
+            name="catalog_pro_categor_1e5e1b_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="productsummary",
+            name="catalog_pro_categor_acc775_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="productsummary",
+            name="catalog_pro_categor_0db5fc_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="productsummary",
+            name="catalog_pro_categor_6bfa64_idx",
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["category", "product"],
+                name="summary_cat_pk_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["product"],
+                name="summary_pk_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["category", "min_price", "product"],
+                name="summary_cat_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["min_price", "product"],
+                name="summary_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["category", "rating", "product"],
+                name="summary_cat_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["rating", "product"],
+                name="summary_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["category", "last_stock_date", "product"],
+                name="summary_cat_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["last_stock_date", "product"],
+                name="summary_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["category", "max_quantity", "product"],
+                name="summary_cat_qty_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productsummary",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["max_quantity", "product"],
+                name="summary_qty_idx",
+            ),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import (
     CASCADE,
@@ -5,16 +6,23 @@ from django.db.models import (
     BooleanField,
     CharField,
     DateField,
+    DateTimeField,
     DecimalField,
     FileField,
+    FloatField,
     ForeignKey,
     ImageField,
+    Index,
     JSONField,
     ManyToManyField,
     Model,
+    OneToOneField,
     PositiveIntegerField,
+    Q,
     TextField,
+    Value,
 )
+from django.db.models.functions import Concat, Substr
 from django.utils.translation import gettext_lazy as _
 
 
@@ -108,6 +116,14 @@ class Category(Model):
         blank=True,
     )
     sorted_index = PositiveIntegerField(default=0, verbose_name=_("Индекс сортировки"))
+    # Материализованный путь вида "/1/5/12/": поддерево - один диапазон по индексу
+    path = CharField(
+        max_length=255,
+        db_index=True,
+        default="",
+        editable=False,
+        verbose_name=_("Путь"),
+    )
 
     def __str__(self):
         return f"{self.title}"
@@ -116,6 +132,50 @@ class Category(Model):
         verbose_name = _("Категория")
         verbose_name_plural = _("Категории")
 
+    @staticmethod
+    def subtree_range(path: str) -> tuple[str, str]:
+        """
+        Границы [from, to) путей поддерева: "/" < "0" в ASCII,
+        поэтому "/1/" <= "/1/5/" < "/10", а "/10/" уже за границей
+        """
+        return path, path[:-1] + "0"
+
+    @classmethod
+    def subtree_q(cls, path: str, prefix: str = "") -> Q:
+        """
+        Условие на поддерево категории с путем path (включая ее саму):
+        один диапазон по индексу path. prefix - путь до категории,
+        например "category__"
+        """
+        lower, upper = cls.subtree_range(path)
+        return Q(**{f"{prefix}path__gte": lower, f"{prefix}path__lt": upper})
+
+    def build_path(self) -> str:
+        parent_path = self.parent.path if self.parent_id else "/"
+        return f"{parent_path or '/'}{self.pk}/"
+
+    def clean(self):
+        if self.pk and self.parent_id and self.path:
+            if self.parent_id == self.pk or self.parent.path.startswith(self.path):
+                raise ValidationError(
+                    _("Категорию нельзя вложить в саму себя или в ее подкатегорию")
+                )
+
+    def save(self, *args, **kwargs):
+        old_path = self.path
+        super().save(*args, **kwargs)
+        path = self.build_path()
+        if path == old_path:
+            return
+        Category.objects.filter(pk=self.pk).update(path=path)
+        if old_path:
+            # перенос поддерева: замена префикса пути у всех потомков
+            lower, upper = self.subtree_range(old_path)
+            Category.objects.filter(path__gt=lower, path__lt=upper).update(
+                path=Concat(Value(path), Substr("path", len(old_path) + 1))
+            )
+        self.path = path
+
 
 class Tag(Model):
     name = CharField(max_length=128, verbose_name=_("Название"))
@@ -195,6 +255,19 @@ class Product(Model):
         null=True,
         default=get_default_value_for_characteristics,
     )
+    # агрегаты проверенных отзывов, ведутся сигналами Review
+    review_count = PositiveIntegerField(default=0, verbose_name=_("Число отзывов"))
+    rating_count = PositiveIntegerField(default=0, verbose_name=_("Число оценок"))
+    rating_sum = DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name=_("Сумма оценок")
+    )
+    rating_avg = DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name=_("Средняя оценка"),
+    )
 
     def description_short(self):
         return f"{self.description[:120]} ..."
@@ -226,6 +299,149 @@ class Stock(Model):
         verbose_name_plural = _("Склады")
 
 
+class ProductSummary(Model):
+    """
+    Денормализованная сводка по товару (цена, остатки, рейтинг) для списков каталога.
+    Обновляется сигналами Stock/Review/OrderItemModel и периодической задачей Celery
+    """
+
+    class Meta:
+        verbose_name = _("Сводка по товару")
+        verbose_name_plural = _("Сводки по товарам")
+        indexes = [
+            # сортировки каталога по столбцам сводки с product_id в конце:
+            # в категории-листе ORDER BY читается после равенства category_id,
+            # в поддереве - обходом индекса по столбцу сортировки
+            Index(
+                fields=["category", "product"],
+                condition=Q(active=True),
+                name="summary_cat_pk_idx",
+            ),
+            Index(
+                fields=["product"],
+                condition=Q(active=True),
+                name="summary_pk_idx",
+            ),
+            Index(
+                fields=["category", "min_price", "product"],
+                condition=Q(active=True),
+                name="summary_cat_price_idx",
+            ),
+            Index(
+                fields=["min_price", "product"],
+                condition=Q(active=True),
+                name="summary_price_idx",
+            ),
+            Index(
+                fields=["category", "rating", "product"],
+                condition=Q(active=True),
+                name="summary_cat_rating_idx",
+            ),
+            Index(
+                fields=["rating", "product"],
+                condition=Q(active=True),
+                name="summary_rating_idx",
+            ),
+            Index(
+                fields=["category", "last_stock_date", "product"],
+                condition=Q(active=True),
+                name="summary_cat_date_idx",
+            ),
+            Index(
+                fields=["last_stock_date", "product"],
+                condition=Q(active=True),
+                name="summary_date_idx",
+            ),
+            Index(
+                fields=["category", "max_quantity", "product"],
+                condition=Q(active=True),
+                name="summary_cat_qty_idx",
+            ),
+            Index(
+                fields=["max_quantity", "product"],
+                condition=Q(active=True),
+                name="summary_qty_idx",
+            ),
+            Index(fields=["active", "-score"]),
+            Index(fields=["category", "active", "-score"]),
+        ]
+
+    product = OneToOneField(
+        Product,
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name="summary",
+        verbose_name=_("Товар"),
+    )
+    category = ForeignKey(
+        Category, on_delete=CASCADE, related_name="+", verbose_name=_("Категория")
+    )
+    active = BooleanField(default=False, verbose_name=_("Активен"))
+    best_stock = ForeignKey(
+        Stock,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name=_("Лучшее предложение"),
+    )
+    min_price = DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name=_("Минимальная цена"),
+    )
+    max_quantity = PositiveIntegerField(
+        default=0, verbose_name=_("Максимальное количество")
+    )
+    total_quantity = PositiveIntegerField(default=0, verbose_name=_("Всего на складах"))
+    quantity_sold = PositiveIntegerField(default=0, verbose_name=_("Число проданных"))
+    rating = DecimalField(
+        max_digits=3, decimal_places=2, null=True, blank=True, verbose_name=_("Оценка")
+    )
+    last_stock_date = DateField(
+        null=True, blank=True, verbose_name=_("Дата последнего поступления")
+    )
+    free_shipping = BooleanField(default=False, verbose_name=_("Бесплатная доставка"))
+    review_count = PositiveIntegerField(default=0, verbose_name=_("Число отзывов"))
+    views = PositiveIntegerField(default=0, verbose_name=_("Просмотры за период"))
+    score = FloatField(default=0, verbose_name=_("Популярность"))
+    updated_at = DateTimeField(auto_now=True, verbose_name=_("Дата обновления"))
+
+    def __str__(self):
+        return f"ProductSummary(product_id={self.product_id})"
+
+
+class ProductDailyViews(Model):
+    """
+    Счетчик просмотров товара за день. Пополняется пачками
+    из буфера событий просмотра задачей Celery
+    """
+
+    class Meta:
+        verbose_name = _("Просмотры товара за день")
+        verbose_name_plural = _("Просмотры товаров по дням")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "day"], name="unique_product_daily_views"
+            ),
+        ]
+        indexes = [Index(fields=["day"])]
+
+    product = ForeignKey(
+        Product,
+        on_delete=CASCADE,
+        related_name="daily_views",
+        verbose_name=_("Товар"),
+    )
+    day = DateField(verbose_name=_("День"))
+    views = PositiveIntegerField(default=0, verbose_name=_("Просмотры"))
+
+    def __str__(self):
+        return f"ProductDailyViews(product={self.product_id}, day={self.day})"
+
+
 class TypeAmount(models.TextChoices):
     PERCENT = "PER", "Процентная скидка"
     ABSOLUTE = "ABS", "Абсолютная скидка"
@@ -235,9 +451,25 @@ class Review(Model):
     class Meta:
         verbose_name = _("Отзыв")
         verbose_name_plural = _("Отзывы")
+        indexes = [
+            # лента отзывов товара: курсор по (created_at, pk) только
+            # среди проверенных отзывов, порядок индекса совпадает с сортировкой
+            Index(
+                fields=["product", "-created_at", "-id"],
+                condition=Q(is_valid=True),
+                name="review_feed_idx",
+            ),
+            # очередь модерации: индекс только по непроверенным отзывам
+            Index(
+                fields=["created_at", "id"],
+                condition=Q(is_valid=False),
+                name="review_moderation_idx",
+            ),
+        ]
 
     text = TextField(null=False, blank=True, db_index=True, verbose_name=_("Текст"))
-    created_at = DateField(auto_now=True, verbose_name="Дата создания")
+    # дата создания не меняется при модерации
+    created_at = DateField(auto_now_add=True, verbose_name="Дата создания")
     rating = DecimalField(
         null=True, blank=True, max_digits=3, decimal_places=2, verbose_name=_("Оценка")
     )
@@ -261,6 +493,52 @@ class Review(Model):
         return f"Rating={self.rating}"
 
 
+class ReviewModeration(Review):
+    """
+    Отзывы, ожидающие проверки, для отдельного раздела админки
+    """
+
+    class Meta:
+        proxy = True
+        verbose_name = _("Отзыв на модерации")
+        verbose_name_plural = _("Очередь модерации отзывов")
+
+
+class ViewEvent(Model):
+    """
+    Просмотр товара пользователем: одна строка на пару профиль-товар,
+    повторный просмотр только обновляет время. Старые просмотры сверх
+    BROWSING_HISTORY_LIMIT удаляются
+    """
+
+    class Meta:
+        verbose_name = _("Просмотр товара")
+        verbose_name_plural = _("Просмотры товаров")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "product"], name="unique_view_event"
+            ),
+        ]
+        indexes = [Index(fields=["profile", "-viewed_at"])]
+
+    profile = ForeignKey(
+        "account.Profile",
+        on_delete=CASCADE,
+        related_name="view_events",
+        verbose_name=_("Пользователь"),
+    )
+    product = ForeignKey(
+        Product,
+        on_delete=CASCADE,
+        related_name="view_events",
+        verbose_name=_("Товар"),
+    )
+    viewed_at = DateTimeField(verbose_name=_("Время просмотра"))
+
+    def __str__(self):
+        return f"ViewEvent(profile={self.profile_id}, product={self.product_id})"
+
+
 def sale_product_directory_path(instance: "SaleProduct", filename: str) -> str:
     dir_name = f"images/sales/{filename}"
     return dir_name
@@ -0,0 +1,253 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q, QuerySet
+from django.db.models.constants import LOOKUP_SEP
+
+CURSOR_PARAM = "cursor"
+
+
+def encode_cursor(ordering: str, value, pk: int, direction: str) -> str:
+    """
+    Упаковка позиции в непрозрачную строку для URL
+    """
+    if isinstance(value, (Decimal, date, datetime)):
+        value = str(value)
+    payload = json.dumps([ordering, value, pk, direction], separators=(",", ":"))
+    return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """
+    Распаковка курсора: (ordering, value, pk, direction) или None,
+    если курсор поврежден
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ordering, value, pk, direction = json.loads(urlsafe_b64decode(padded))
+    except (BinasciiError, ValueError, TypeError):
+        return None
+    if direction not in ("next", "prev") or not isinstance(pk, int):
+        return None
+    return ordering, value, pk, direction
+
+
+def keyset_after(
+    name: str,
+    value,
+    pk: int,
+    descending: bool,
+    nullable: bool = True,
+    tiebreaker: str = "pk",
+) -> Q:
+    """
+    Условие "строго после позиции (value, pk)" для сортировки
+    (name NULLS FIRST, tiebreaker) по возрастанию или ее точного обращения
+    по убыванию. tiebreaker - уникальный столбец со значением pk записи.
+    Для поля без NULL ветки с IS NULL не добавляются
+    """
+    lookup = "lt" if descending else "gt"
+    if name == tiebreaker:
+        return Q(**{f"{tiebreaker}__{lookup}": pk})
+    after = Q(**{f"{name}__{lookup}": value}) | Q(
+        **{name: value, f"{tiebreaker}__{lookup}": pk}
+    )
+    if not nullable:
+        return after
+    if not descending:
+        if value is None:
+            return Q(**{f"{name}__isnull": True, f"{tiebreaker}__gt": pk}) | Q(
+                **{f"{name}__isnull": False}
+            )
+        return after
+    if value is None:
+        return Q(**{f"{name}__isnull": True, f"{tiebreaker}__lt": pk})
+    return after | Q(**{f"{name}__isnull": True})
+
+
+def keyset_order_by(
+    name: str, descending: bool, nullable: bool = True, tiebreaker: str = "pk"
+) -> list:
+    """
+    Сортировка для keyset_after. Для поля без NULL - обычный ORDER BY,
+    который может читаться прямо из индекса
+    """
+    if not nullable:
+        if descending:
+            return [f"-{name}", f"-{tiebreaker}"]
+        return [name, tiebreaker]
+    if descending:
+        return [F(name).desc(nulls_last=True), f"-{tiebreaker}"]
+    return [F(name).asc(nulls_first=True), tiebreaker]
+
+
+@dataclass
+class KeysetPage:
+    """
+    Страница курсорной пагинации: вместо COUNT(*) знает только,
+    есть ли записи до и после нее
+    """
+
+    object_list: list
+    has_next: bool = False
+    has_previous: bool = False
+    next_cursor: str = ""
+    previous_cursor: str = ""
+    keyset: bool = field(default=True, init=False)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator(object):
+    """
+    Пагинация по ключу (seek): WHERE (key, pk) > (value, pk) LIMIT n + 1
+    вместо OFFSET n и подсчета общего количества записей
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        per_page: int,
+        ordering: str = "pk",
+        tiebreaker: str = "pk",
+    ):
+        """
+        ordering - поле сортировки (можно через связь: "summary__min_price"),
+        tiebreaker - уникальный столбец, равный pk записи, например
+        "summary__product_id", чтобы весь ORDER BY читался из одного индекса
+        """
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.tiebreaker = tiebreaker
+        self.descending = ordering.startswith("-")
+        self.name = ordering.lstrip("-")
+
+    def _value(self, obj):
+        if self.name == "pk":
+            return obj.pk
+        if self.name in self.queryset.query.annotations:
+            return getattr(obj, self.name)
+        for attname in self.name.split(LOOKUP_SEP):
+            obj = getattr(obj, attname)
+        return obj
+
+    def _field(self):
+        """
+        Поле сортировки: аннотация запроса, первичный ключ или поле модели,
+        в том числе через связи
+        """
+        query = self.queryset.query
+        if self.name in query.annotations:
+            return query.annotations[self.name].output_field
+        if self.name == "pk":
+            return self.queryset.model._meta.pk
+        model, field = self.queryset.model, None
+        for name in self.name.split(LOOKUP_SEP):
+            field = model._meta.get_field(name)
+            model = field.related_model
+        return field
+
+    def _coerce(self, value):
+        """
+        Приведение значения из курсора к типу поля сортировки.
+        Поддельный курсор с неподходящим значением дает ValueError
+        """
+        try:
+            return self._field().to_python(value)
+        except (ValidationError, TypeError, ValueError) as error:
+            raise ValueError(f"Bad cursor value: {value!r}") from error
+
+    def _cursor(self, obj, direction: str) -> str:
+        return encode_cursor(self.ordering, self._value(obj), obj.pk, direction)
+
+    def page(self, cursor: str = None) -> KeysetPage:
+        position = decode_cursor(cursor) if cursor else None
+        if position and position[0] != self.ordering:
+            position = None
+        if position:
+            # неверное значение в курсоре - первая страница, а не ошибка
+            try:
+                position = (position[0], self._coerce(position[1]), *position[2:])
+            except ValueError:
+                position = None
+
+        queryset = self.queryset
+        backwards = False
+        nullable = self._field().null
+        if position:
+            _, value, pk, direction = position
+            backwards = direction == "prev"
+            queryset = queryset.filter(
+                keyset_after(
+                    self.name,
+                    value,
+                    pk,
+                    self.descending != backwards,
+                    nullable,
+                    self.tiebreaker,
+                )
+            )
+        queryset = queryset.order_by(
+            *keyset_order_by(
+                self.name, self.descending != backwards, nullable, self.tiebreaker
+            )
+        )
+
+        rows = list(queryset[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            rows.reverse()
+
+        page = KeysetPage(object_list=rows)
+        if backwards:
+            page.has_previous = has_more
+            page.has_next = True
+        else:
+            page.has_next = has_more
+            page.has_previous = position is not None
+        if rows:
+            if page.has_next:
+                page.next_cursor = self._cursor(rows[-1], "next")
+            if page.has_previous:
+                page.previous_cursor = self._cursor(rows[0], "prev")
+        return page
+
+
+class KeysetPaginationMixin(object):
+    """
+    Примесь к ListView, включающая курсорную пагинацию.
+    Включается настройкой KEYSET_PAGINATION или параметром ?cursor= в запросе
+    """
+
+    keyset_pagination = getattr(settings, "KEYSET_PAGINATION", False)
+    keyset_tiebreaker = "pk"
+
+    def get_keyset_ordering(self) -> str:
+        return "pk"
+
+    def use_keyset_pagination(self) -> bool:
+        return self.keyset_pagination or CURSOR_PARAM in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(
+            queryset, page_size, self.get_keyset_ordering(), self.keyset_tiebreaker
+        )
+        page = paginator.page(self.request.GET.get(CURSOR_PARAM))
+        return None, page, page.object_list, page.has_other_pages()
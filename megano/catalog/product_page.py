@@ -0,0 +1,100 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from catalog.models import Product, ProductImage, Review, Stock, Tag
+from catalog.reviews import review_feed
+from core.cache import CacheStats
+
+stats = CacheStats.get("product_page")
+
+
+@dataclass
+class ProductPage:
+    """
+    Материализованная страница товара: товар со всеми связанными данными,
+    собранными за один проход, и посчитанные по ним показатели.
+    Данные конкретного пользователя сюда не попадают
+    """
+
+    product: Product
+    images: list[ProductImage] = field(default_factory=list)
+    tags: list[Tag] = field(default_factory=list)
+    stocks: list[Stock] = field(default_factory=list)
+    reviews: list[Review] = field(default_factory=list)
+    reviews_next_cursor: str = ""
+    best_offer: Optional[Stock] = None
+    review_count: int = 0
+    rating_avg: Optional[Decimal] = None
+    built_at: Optional[object] = None
+
+    @property
+    def price(self) -> Optional[Decimal]:
+        return self.best_offer.price if self.best_offer else None
+
+    @classmethod
+    def build(cls, product_id: int) -> Optional["ProductPage"]:
+        product = (
+            Product.objects.select_related("category", "avatar")
+            .prefetch_related(
+                "image",
+                "tag",
+                Prefetch(
+                    "stocks",
+                    queryset=Stock.objects.select_related("seller").order_by(
+                        "price", "pk"
+                    ),
+                ),
+            )
+            .filter(pk=product_id)
+            .first()
+        )
+        if product is None:
+            return None
+
+        stocks = list(product.stocks.all())
+        # в страницу попадает только первая страница отзывов,
+        # остальные подгружаются через ленту отзывов по курсору
+        reviews = review_feed(product.pk)
+        return cls(
+            product=product,
+            images=list(product.image.all()),
+            tags=list(product.tag.all()),
+            stocks=stocks,
+            reviews=reviews.object_list,
+            reviews_next_cursor=reviews.next_cursor,
+            # склады уже отсортированы по цене, первый - лучшее предложение
+            best_offer=stocks[0] if stocks else None,
+            review_count=product.review_count,
+            rating_avg=product.rating_avg,
+            built_at=timezone.now(),
+        )
+
+
+def _page_key(product_id) -> str:
+    return f"product_page:{product_id}"
+
+
+def get_product_page(product_id: int) -> Optional[ProductPage]:
+    """
+    Страница товара из кэша или ее сборка при промахе
+    """
+    key = _page_key(product_id)
+    page = cache.get(key)
+    if page is not None:
+        stats.hit()
+        return page
+    stats.miss()
+    page = ProductPage.build(product_id)
+    if page is not None:
+        cache.set(key, page, settings.PRODUCT_PAGE_CACHE_TIMEOUT)
+    return page
+
+
+def invalidate_product_pages(product_ids: Iterable) -> None:
+    cache.delete_many([_page_key(pk) for pk in product_ids if pk])
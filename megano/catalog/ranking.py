@@ -0,0 +1,91 @@
+import math
+from datetime import date
+from typing import Optional
+
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from catalog.category_tree import get_category_tree
+from catalog.listing_cache import get_category_version
+from catalog.models import Product, ProductSummary
+
+REVIEW_WEIGHT = 3.0
+# Просмотр весит как сотая доля продажи
+VIEW_WEIGHT = 0.01
+# За сколько последних дней просмотры учитываются в популярности
+VIEWS_WINDOW_DAYS = 30
+# Свежесть: новый товар получает прибавку RECENCY_WEIGHT (как рост
+# популярности примерно в 3 раза), которая линейно убывает до нуля
+# за RECENCY_WINDOW_DAYS дней. Прибавка ограничена, поэтому давний хит
+# продаж не уступает новинке без продаж. Оценка зависит от текущей даты
+# и обновляется ежечасным пересчетом сводок, как и окно просмотров
+RECENCY_WEIGHT = 0.5
+RECENCY_WINDOW_DAYS = 30
+RANKING_CACHE_TIMEOUT = 60 * 5
+RANKING_CACHE_SIZE = 24
+
+
+def popularity_score(
+    quantity_sold: int,
+    review_count: int,
+    rating,
+    last_date: Optional[date],
+    views: int = 0,
+    today: Optional[date] = None,
+) -> float:
+    """
+    Популярность товара по продажам, отзывам с учетом оценки,
+    недавним просмотрам и свежести на дату today (по умолчанию сегодня)
+    """
+    rating = float(rating) if rating is not None else 3.0
+    popularity = (
+        quantity_sold + REVIEW_WEIGHT * review_count * rating / 5 + VIEW_WEIGHT * views
+    )
+    recency = 0.0
+    if last_date:
+        age = ((today or timezone.localdate()) - last_date).days
+        recency = RECENCY_WEIGHT * min(1.0, max(0.0, 1 - age / RECENCY_WINDOW_DAYS))
+    return round(math.log10(1 + popularity) + recency, 6)
+
+
+def _ranking_key(category_id: Optional[int]) -> str:
+    if category_id is None:
+        return "ranking:all"
+    return f"ranking:{category_id}:v{get_category_version(category_id)}"
+
+
+def top_product_ids(limit: int, category_id: Optional[int] = None) -> list[int]:
+    """
+    Идентификаторы самых популярных товаров: чтение по индексу
+    (active, -score) без агрегации
+    """
+    summaries = ProductSummary.objects.filter(active=True)
+    if category_id is not None:
+        summaries = summaries.filter(get_category_tree().subtree_q(category_id))
+    return list(
+        summaries.order_by("-score", "product_id").values_list("product_id", flat=True)[
+            :limit
+        ]
+    )
+
+
+def top_products(limit: int, category_id: Optional[int] = None) -> list[Product]:
+    """
+    Самые популярные товары с аватаром, категорией и минимальной ценой.
+    Список категории кэшируется до смены версии категории,
+    общий список - на RANKING_CACHE_TIMEOUT
+    """
+    key = _ranking_key(category_id)
+    products = cache.get(key)
+    if products is None or limit > RANKING_CACHE_SIZE:
+        product_ids = top_product_ids(max(limit, RANKING_CACHE_SIZE), category_id)
+        in_bulk = (
+            Product.objects.select_related("avatar", "category")
+            .annotate(price=F("summary__min_price"))
+            .in_bulk(product_ids)
+        )
+        products = [in_bulk[pk] for pk in product_ids if pk in in_bulk]
+        timeout = RANKING_CACHE_TIMEOUT if category_id is None else None
+        cache.set(key, products, timeout)
+    return products[:limit]
@@ -0,0 +1,130 @@
+from decimal import Decimal
+from typing import Iterable, NamedTuple, Optional
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from catalog.models import Product, Review
+
+REVIEW_STATS_BATCH_SIZE = 1000
+REVIEW_STATS_FIELDS = ["review_count", "rating_count", "rating_sum", "rating_avg"]
+
+
+class ReviewStats(NamedTuple):
+    """
+    Вклад отзывов в агрегаты товара: учитываются только проверенные отзывы,
+    оценка - только если она поставлена
+    """
+
+    review_count: int = 0
+    rating_count: int = 0
+    rating_sum: Decimal = Decimal(0)
+
+    @classmethod
+    def of(cls, is_valid: bool, rating) -> "ReviewStats":
+        if not is_valid:
+            return cls()
+        if rating is None:
+            return cls(1, 0, Decimal(0))
+        return cls(1, 1, Decimal(rating))
+
+    def __sub__(self, other: "ReviewStats") -> "ReviewStats":
+        return ReviewStats(*(mine - theirs for mine, theirs in zip(self, other)))
+
+    def __bool__(self) -> bool:
+        return any(self)
+
+
+def rating_average(rating_sum, rating_count: int) -> Optional[Decimal]:
+    if not rating_count:
+        return None
+    return (Decimal(rating_sum) / rating_count).quantize(Decimal("0.01"))
+
+
+def apply_review_delta(product_id: int, delta: ReviewStats) -> None:
+    """
+    Изменение агрегатов товара на delta. Строка товара блокируется,
+    чтобы одновременные отзывы не потеряли обновления
+    """
+    if not product_id or not delta:
+        return
+    with transaction.atomic():
+        product = (
+            Product.objects.select_for_update()
+            .only(*REVIEW_STATS_FIELDS)
+            .filter(pk=product_id)
+            .first()
+        )
+        if product is None:
+            return
+        product.review_count += delta.review_count
+        product.rating_count += delta.rating_count
+        product.rating_sum += delta.rating_sum
+        product.rating_avg = rating_average(product.rating_sum, product.rating_count)
+        Product.objects.filter(pk=product_id).update(
+            **{field: getattr(product, field) for field in REVIEW_STATS_FIELDS}
+        )
+
+
+def review_saved(review: Review, previous: Optional[dict]) -> None:
+    """
+    Учет созданного или измененного отзыва. previous - значения product_id,
+    is_valid и rating до сохранения, None для нового отзыва
+    """
+    current = ReviewStats.of(review.is_valid, review.rating)
+    if previous is None:
+        apply_review_delta(review.product_id, current)
+        return
+    before = ReviewStats.of(previous["is_valid"], previous["rating"])
+    if previous["product_id"] == review.product_id:
+        apply_review_delta(review.product_id, current - before)
+    else:
+        apply_review_delta(previous["product_id"], ReviewStats() - before)
+        apply_review_delta(review.product_id, current)
+
+
+def review_deleted(review: Review) -> None:
+    apply_review_delta(
+        review.product_id,
+        ReviewStats() - ReviewStats.of(review.is_valid, review.rating),
+    )
+
+
+def recompute_review_stats(product_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Пересчет агрегатов отзывов по базе для указанных товаров или всех.
+    Нужен после bulk_create и update мимо сигналов.
+    Возвращает количество обработанных товаров
+    """
+    if product_ids is None:
+        product_ids = Product.objects.order_by("pk").values_list("pk", flat=True)
+    product_ids = sorted(set(product_ids))
+    for start in range(0, len(product_ids), REVIEW_STATS_BATCH_SIZE):
+        batch = product_ids[start : start + REVIEW_STATS_BATCH_SIZE]
+        stats = {
+            row["product_id"]: row
+            for row in Review.objects.filter(product_id__in=batch, is_valid=True)
+            .values("product_id")
+            .annotate(
+                review_count=Count("pk"),
+                rating_count=Count("rating"),
+                rating_sum=Sum("rating"),
+            )
+        }
+        products = []
+        for product_id in batch:
+            row = stats.get(product_id, {})
+            rating_count = row.get("rating_count", 0)
+            rating_sum = row.get("rating_sum") or Decimal(0)
+            products.append(
+                Product(
+                    pk=product_id,
+                    review_count=row.get("review_count", 0),
+                    rating_count=rating_count,
+                    rating_sum=rating_sum,
+                    rating_avg=rating_average(rating_sum, rating_count),
+                )
+            )
+        with transaction.atomic():
+            Product.objects.bulk_update(products, REVIEW_STATS_FIELDS)
+    return len(product_ids)
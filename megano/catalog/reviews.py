@@ -0,0 +1,65 @@
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+
+from catalog.models import Review
+from catalog.pagination import KeysetPage, KeysetPaginator
+from catalog.review_stats import recompute_review_stats
+
+REVIEW_FEED_ORDERING = "-created_at"
+
+
+def review_feed(product_id: int, cursor: Optional[str] = None) -> KeysetPage:
+    """
+    Страница проверенных отзывов товара от новых к старым.
+    Курсор по (created_at, pk) читает индекс (product, is_valid, created_at, id)
+    без OFFSET и подсчета всех отзывов
+    """
+    reviews = Review.objects.filter(
+        product_id=product_id, is_valid=True
+    ).select_related("profile__user")
+    paginator = KeysetPaginator(
+        reviews, settings.REVIEWS_PAGE_SIZE, REVIEW_FEED_ORDERING
+    )
+    return paginator.page(cursor)
+
+
+def serialize_review(review: Review) -> dict:
+    user = review.profile.user
+    return {
+        "id": review.pk,
+        "author": f"{user.first_name} {user.last_name}".strip(),
+        "text": review.text,
+        "rating": str(review.rating) if review.rating is not None else None,
+        "created_at": review.created_at.isoformat(),
+    }
+
+
+def review_throttled(profile_id: int) -> bool:
+    """
+    Не чаще одного отзыва от профиля за REVIEW_THROTTLE_SECONDS.
+    Возвращает True, если отзыв оставлять пока нельзя
+    """
+    return not cache.add(
+        f"review_throttle:{profile_id}", 1, settings.REVIEW_THROTTLE_SECONDS
+    )
+
+
+def approve_reviews(reviews: QuerySet) -> int:
+    """
+    Одобрение пачки отзывов одним UPDATE. Сигналы при этом не вызываются,
+    поэтому агрегаты и сводки затронутых товаров пересчитываются явно
+    """
+    # signals импортирует страницу товара, которая использует ленту отзывов
+    from catalog.signals import refresh_product_summaries
+
+    reviews = reviews.filter(is_valid=False)
+    product_ids = set(reviews.values_list("product_id", flat=True))
+    with transaction.atomic():
+        count = reviews.update(is_valid=True)
+        recompute_review_stats(pk for pk in product_ids if pk)
+        refresh_product_summaries(product_ids)
+    return count
@@ -0,0 +1,314 @@
+import re
+from typing import Iterable, Optional
+
+from django.db import connection as default_connection
+from django.db import transaction
+from django.db.models import Q
+
+from catalog.category_tree import get_category_tree
+from catalog.models import Category, Product
+
+SEARCH_TABLE = "catalog_product_fts"
+VOCAB_TABLE = "catalog_product_fts_vocab"
+SEARCH_BATCH_SIZE = 1000
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query: str) -> list[str]:
+    return TOKEN_RE.findall(query.lower())[:8]
+
+
+def levenshtein(first: str, second: str, limit: int) -> int:
+    """
+    Расстояние Левенштейна с ранним выходом, если оно заведомо больше limit
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for i, char_first in enumerate(first, 1):
+        current = [i]
+        for j, char_second in enumerate(second, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_first != char_second),
+                )
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def product_documents(product_ids: Iterable[int]) -> list[tuple]:
+    """
+    Документы для индекса: (id, category_id, название, производитель,
+    тэги, значения характеристик). Неактивные товары не индексируются
+    """
+    products = (
+        Product.objects.filter(id__in=product_ids, active=True)
+        .only("id", "category_id", "name", "manufacturer", "characteristics")
+        .prefetch_related("tag")
+    )
+    documents = []
+    for product in products:
+        characteristics = product.characteristics or {}
+        documents.append(
+            (
+                product.pk,
+                product.category_id,
+                product.name,
+                product.manufacturer,
+                " ".join(tag.name for tag in product.tag.all()),
+                " ".join(str(value) for value in characteristics.values() if value),
+            )
+        )
+    return documents
+
+
+class SearchBackend(object):
+    """
+    Базовый поиск без полнотекстового индекса (icontains по названию)
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index(self, documents: list[tuple]) -> None:
+        pass
+
+    def delete(self, product_ids: list[int]) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    @staticmethod
+    def _subtree_sql(category_path: Optional[str]) -> tuple[str, list]:
+        """
+        Условие на поддерево категории по материализованному пути:
+        диапазон по индексу path без соединения в основном запросе
+        """
+        if not category_path:
+            return "", []
+        return (
+            f" AND category_id IN (SELECT id FROM {Category._meta.db_table} "
+            "WHERE path >= %s AND path < %s)",
+            list(Category.subtree_range(category_path)),
+        )
+
+    def search(
+        self, tokens: list[str], category_path: Optional[str], limit: int, offset: int
+    ) -> list[int]:
+        condition = Q(active=True)
+        for token in tokens:
+            condition &= Q(name__icontains=token) | Q(manufacturer__icontains=token)
+        if category_path:
+            condition &= Category.subtree_q(category_path, "category__")
+        queryset = Product.objects.filter(condition).order_by("name", "pk")
+        return list(queryset.values_list("pk", flat=True)[offset : offset + limit])
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    Поиск по виртуальной таблице FTS5 с ранжированием BM25,
+    префиксным совпадением и исправлением опечаток по словарю fts5vocab
+    """
+
+    weights = (10.0, 5.0, 3.0, 1.0)
+
+    def index(self, documents: list[tuple]) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+                [(document[0],) for document in documents],
+            )
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} "
+                "(rowid, category_id, name, manufacturer, tags, characteristics) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                documents,
+            )
+
+    def delete(self, product_ids: list[int]) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+                [(pk,) for pk in product_ids],
+            )
+
+    def clear(self) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    def _match(
+        self, match: str, category_path: Optional[str], limit: int, offset: int
+    ) -> list[int]:
+        subtree, subtree_params = self._subtree_sql(category_path)
+        sql = (
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s"
+            + subtree
+            + " ORDER BY bm25({table}, 0, {weights}), rowid LIMIT %s OFFSET %s".format(
+                table=SEARCH_TABLE,
+                weights=", ".join(str(weight) for weight in self.weights),
+            )
+        )
+        params = [match] + subtree_params + [limit, offset]
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def _corrections(self, token: str) -> list[str]:
+        """
+        Близкие по написанию термины словаря с тем же началом слова
+        """
+        limit = 1 if len(token) <= 5 else 2
+        start = token[:2]
+        end = start[:-1] + chr(ord(start[-1]) + 1)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT term FROM {VOCAB_TABLE} WHERE term >= %s AND term < %s",
+                [start, end],
+            )
+            terms = [row[0] for row in cursor.fetchall()]
+        return [
+            term
+            for term in terms
+            if levenshtein(token, term[: len(token) + limit], limit) <= limit
+        ][:5]
+
+    @staticmethod
+    def _expression(variants: list[str]) -> str:
+        return "(" + " OR ".join(f'"{variant}"*' for variant in variants) + ")"
+
+    def search(
+        self, tokens: list[str], category_path: Optional[str], limit: int, offset: int
+    ) -> list[int]:
+        match = " AND ".join(self._expression([token]) for token in tokens)
+        result = self._match(match, category_path, limit, offset)
+        if result or offset:
+            return result
+
+        expressions = []
+        for token in tokens:
+            variants = [token]
+            if len(token) >= 4:
+                variants.extend(self._corrections(token))
+            expressions.append(self._expression(variants))
+        return self._match(" AND ".join(expressions), category_path, limit, offset)
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Поиск по колонке tsvector с GIN-индексом и ранжированием ts_rank_cd
+    """
+
+    table = "catalog_product_search"
+
+    def index(self, documents: list[tuple]) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (product_id, category_id, document) "
+                "VALUES (%s, %s, "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C') || "
+                "setweight(to_tsvector('simple', %s), 'D')) "
+                "ON CONFLICT (product_id) DO UPDATE SET "
+                "category_id = EXCLUDED.category_id, document = EXCLUDED.document",
+                documents,
+            )
+
+    def delete(self, product_ids: list[int]) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE product_id = ANY(%s)",
+                [list(product_ids)],
+            )
+
+    def clear(self) -> None:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+
+    def search(
+        self, tokens: list[str], category_path: Optional[str], limit: int, offset: int
+    ) -> list[int]:
+        query = " & ".join(f"{token}:*" for token in tokens)
+        subtree, subtree_params = self._subtree_sql(category_path)
+        sql = (
+            f"SELECT product_id FROM {self.table}, "
+            "to_tsquery('simple', %s) query WHERE document @@ query"
+            + subtree
+            + " ORDER BY ts_rank_cd(document, query) DESC, product_id "
+            "LIMIT %s OFFSET %s"
+        )
+        params = [query] + subtree_params + [limit, offset]
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+def get_backend(connection=None) -> SearchBackend:
+    connection = connection or default_connection
+    if connection.vendor == "sqlite":
+        return SQLiteSearchBackend(connection)
+    if connection.vendor == "postgresql":
+        return PostgresSearchBackend(connection)
+    return SearchBackend(connection)
+
+
+def index_products(product_ids: Iterable[int]) -> None:
+    """
+    Обновление документов индекса для указанных товаров
+    """
+    product_ids = sorted(set(product_ids))
+    backend = get_backend()
+    for start in range(0, len(product_ids), SEARCH_BATCH_SIZE):
+        batch = product_ids[start : start + SEARCH_BATCH_SIZE]
+        documents = product_documents(batch)
+        indexed = {document[0] for document in documents}
+        with transaction.atomic():
+            backend.delete([pk for pk in batch if pk not in indexed])
+            backend.index(documents)
+
+
+def remove_products(product_ids: Iterable[int]) -> None:
+    get_backend().delete(list(product_ids))
+
+
+def rebuild_search_index(batch_size: int = SEARCH_BATCH_SIZE) -> int:
+    """
+    Полная переиндексация активных товаров пачками, каждая пачка
+    в своей транзакции (иначе SQLite фиксирует каждую строку отдельно).
+    Возвращает количество проиндексированных товаров
+    """
+    backend = get_backend()
+    backend.clear()
+    product_ids = Product.objects.filter(active=True).order_by("pk")
+    product_ids = list(product_ids.values_list("pk", flat=True))
+    for start in range(0, len(product_ids), batch_size):
+        documents = product_documents(product_ids[start : start + batch_size])
+        with transaction.atomic():
+            backend.index(documents)
+    return len(product_ids)
+
+
+def search_products(
+    query: str, category_id: Optional[int] = None, limit: int = 12, offset: int = 0
+) -> list[int]:
+    """
+    Идентификаторы товаров, отсортированные по релевантности.
+    category_id ограничивает поиск категорией вместе с подкатегориями
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    category_path = None
+    if category_id is not None:
+        category = get_category_tree().get(category_id)
+        if category is None or not category.path:
+            return []
+        category_path = category.path
+    return get_backend().search(tokens, category_path, limit, offset)
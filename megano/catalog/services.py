@@ -1,7 +1,7 @@
 from django.conf import settings
-from django.db.models import Min
+from django.core.exceptions import ObjectDoesNotExist
 
-from catalog.models import Product
+from catalog.comparison import load_compared_products
 
 
 class ComparedProducts(object):
@@ -10,7 +10,8 @@ class ComparedProducts(object):
 
     comparison: list[Product]
 
-    При итерации возвращает объекты Product
+    При итерации возвращает пары (Product, лучшая цена), загруженные
+    одним запросом при первом обходе
     """
 
     def __init__(self, request):
@@ -18,22 +19,31 @@ class ComparedProducts(object):
         Инициализируем объекты сравнения
         """
         self.session = request.session
-        comparison = self.session.get(settings.COMPARISON_SESSION_ID)
-        if not comparison:
-            comparison = self.session[settings.COMPARISON_SESSION_ID] = list()
-        self.comparison = comparison
+        self.user = request.user
+        # пустой список не пишется в сессию, чтобы просмотр не сохранял ее
+        self.comparison = self.session.get(settings.COMPARISON_SESSION_ID) or []
+        self._products = None
 
     def __iter__(self):
         """
         Перебор продуктов в сессии сравнения.
         """
-        product_ids = self.comparison
-        for product_id in product_ids:
-            product = Product.objects.get(id=product_id)
-            price = product.stocks.aggregate(Min("price"))["price__min"]
-            if price is None:
-                price = 100
-            yield product, price
+        if self._products is None:
+            self._products = load_compared_products(self.comparison)
+        return iter(self._products)
+
+    @property
+    def limit(self) -> int:
+        """
+        Лимит сравнения из профиля пользователя, по умолчанию COMPARISON_LIMIT
+        """
+        limit = None
+        if self.user.is_authenticated:
+            try:
+                limit = self.user.profile.comparison_limit
+            except ObjectDoesNotExist:
+                pass
+        return limit or settings.COMPARISON_LIMIT
 
     def add(self, product_id: int):
         """
@@ -41,7 +51,7 @@ class ComparedProducts(object):
         """
         product_id = str(product_id)
         if product_id not in self.comparison:
-            if len(self.comparison) < 4:
+            if len(self.comparison) < self.limit:
                 self.comparison.append(product_id)
         self.save()
 
@@ -51,6 +61,7 @@ class ComparedProducts(object):
         """
         self.session[settings.COMPARISON_SESSION_ID] = self.comparison
         self.session.modified = True
+        self._products = None
 
     def remove(self, product_id: int):
         """
@@ -64,8 +75,10 @@ class ComparedProducts(object):
         """
         Удаление элементов сессии сравнения
         """
-        del self.session[settings.COMPARISON_SESSION_ID]
+        self.session.pop(settings.COMPARISON_SESSION_ID, None)
         self.session.modified = True
+        self.comparison = []
+        self._products = None
 
     def is_product_in_list(
         self,
@@ -0,0 +1,211 @@
+from functools import partial
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from catalog import review_stats
+from catalog.browsing_history import BrowsingHistory
+from catalog.category_tree import category_tree_snapshot
+from catalog.listing_cache import (
+    bump_category_versions,
+    bump_sales_version,
+    bump_seller_versions,
+)
+from catalog.models import (
+    Category,
+    Product,
+    ProductImage,
+    Review,
+    SaleProduct,
+    Seller,
+    Stock,
+    Tag,
+)
+from catalog.product_page import invalidate_product_pages
+from catalog.search import index_products, remove_products
+from catalog.summary import update_product_summaries
+
+
+def _refresh_products(product_ids, category_ids=()):
+    categories = update_product_summaries(product_ids)
+    bump_category_versions(categories | set(category_ids))
+    invalidate_product_pages(product_ids)
+    bump_seller_versions(
+        Stock.objects.filter(product_id__in=product_ids).values_list(
+            "seller_id", flat=True
+        )
+    )
+
+
+def _invalidate_pages_on_commit(product_ids):
+    transaction.on_commit(partial(invalidate_product_pages, list(product_ids)))
+
+
+def _bump_product_categories(product_ids):
+    """
+    Инвалидация кэша списков и фасетов категорий указанных товаров
+    """
+    bump_category_versions(
+        Product.objects.filter(pk__in=product_ids)
+        .values_list("category_id", flat=True)
+        .distinct()
+    )
+
+
+def refresh_product_summaries(product_ids, category_ids=()):
+    """
+    Пересчет сводок по товарам и инвалидация кэша их категорий после фиксации
+    транзакции, чтобы каскадное удаление товара не создавало сводку заново
+    """
+    product_ids = [pk for pk in product_ids if pk]
+    if product_ids:
+        transaction.on_commit(partial(_refresh_products, product_ids, category_ids))
+
+
+def refresh_product_summary(product_id, category_ids=()):
+    refresh_product_summaries([product_id], category_ids)
+
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance: Product, **kwargs):
+    if instance.pk and not kwargs.get("raw"):
+        instance._previous_category_id = (
+            Product.objects.filter(pk=instance.pk)
+            .values_list("category_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance: Product, **kwargs):
+    previous_category_id = getattr(instance, "_previous_category_id", None)
+    refresh_product_summary(instance.pk, [previous_category_id or instance.category_id])
+    transaction.on_commit(partial(index_products, [instance.pk]))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance: Product, **kwargs):
+    transaction.on_commit(partial(bump_category_versions, [instance.category_id]))
+    transaction.on_commit(partial(remove_products, [instance.pk]))
+    _invalidate_pages_on_commit([instance.pk])
+
+
+@receiver(m2m_changed, sender=Product.tag.through)
+def product_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        instance._cleared_product_ids = list(
+            instance.products.values_list("pk", flat=True)
+        )
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        product_ids = list(pk_set or getattr(instance, "_cleared_product_ids", []))
+    else:
+        product_ids = [instance.pk]
+    transaction.on_commit(partial(index_products, product_ids))
+    transaction.on_commit(partial(_bump_product_categories, product_ids))
+    _invalidate_pages_on_commit(product_ids)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance: Tag, created, **kwargs):
+    if not created:
+        product_ids = list(instance.products.values_list("pk", flat=True))
+        transaction.on_commit(partial(index_products, product_ids))
+        transaction.on_commit(partial(_bump_product_categories, product_ids))
+        _invalidate_pages_on_commit(product_ids)
+
+
+@receiver(m2m_changed, sender=Product.image.through)
+def product_images_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        product_ids = pk_set or instance.products.values_list("pk", flat=True)
+    else:
+        product_ids = [instance.pk]
+    _invalidate_pages_on_commit(product_ids)
+
+
+@receiver(post_save, sender=ProductImage)
+def product_image_saved(sender, instance: ProductImage, created, **kwargs):
+    if not created:
+        _invalidate_pages_on_commit(
+            Product.objects.filter(Q(avatar=instance) | Q(image=instance))
+            .values_list("pk", flat=True)
+            .distinct()
+        )
+
+
+@receiver(post_save, sender=Seller)
+def seller_saved(sender, instance: Seller, created, **kwargs):
+    if not created:
+        _invalidate_pages_on_commit(
+            instance.stocks.values_list("product_id", flat=True).distinct()
+        )
+        transaction.on_commit(partial(bump_seller_versions, [instance.pk]))
+
+
+@receiver(pre_save, sender=Review)
+def review_saving(sender, instance: Review, **kwargs):
+    instance._previous_stats = None
+    if instance.pk and not kwargs.get("raw"):
+        instance._previous_stats = (
+            Review.objects.filter(pk=instance.pk)
+            .values("product_id", "is_valid", "rating")
+            .first()
+        )
+
+
+# агрегаты товара обновляются до пересчета сводки, который их читает.
+# Непроверенный отзыв не виден на странице и не влияет на сводку,
+# поэтому новый отзыв до модерации не пересчитывает товар
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance: Review, raw=False, **kwargs):
+    previous = getattr(instance, "_previous_stats", None)
+    if not raw:
+        review_stats.review_saved(instance, previous)
+    if instance.is_valid:
+        refresh_product_summary(instance.product_id)
+    if previous and previous["is_valid"]:
+        refresh_product_summary(previous["product_id"])
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance: Review, **kwargs):
+    review_stats.review_deleted(instance)
+    if instance.is_valid:
+        refresh_product_summary(instance.product_id)
+
+
+@receiver([post_save, post_delete], sender=Stock)
+def product_related_changed(sender, instance, **kwargs):
+    refresh_product_summary(instance.product_id)
+    if sender is Stock:
+        # удаленный склад уже не найти по товару, поэтому продавец отдельно
+        transaction.on_commit(partial(bump_seller_versions, [instance.seller_id]))
+
+
+@receiver([post_save, post_delete], sender=SaleProduct)
+def sale_changed(sender, instance, **kwargs):
+    transaction.on_commit(bump_sales_version)
+
+
+def _bump_all_categories():
+    bump_category_versions(Category.objects.values_list("pk", flat=True))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance: Category, **kwargs):
+    # перемещение категории меняет состав списков всех ее предков
+    category_tree_snapshot.invalidate()
+    transaction.on_commit(_bump_all_categories)
+
+
+@receiver(user_logged_in)
+def merge_history_on_login(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, "session"):
+        BrowsingHistory(request, user=user).merge_anonymous()
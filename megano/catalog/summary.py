@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from catalog.models import Product, ProductDailyViews, ProductSummary, Review, Stock
+from catalog.ranking import RECENCY_WINDOW_DAYS, VIEWS_WINDOW_DAYS, popularity_score
+
+SUMMARY_BATCH_SIZE = 1000
+# Время прошлого пересчета измененных сводок
+SUMMARY_REFRESH_KEY = "summary_refresh:last_run"
+
+SUMMARY_UPDATE_FIELDS = [
+    "category",
+    "active",
+    "best_stock",
+    "min_price",
+    "max_quantity",
+    "total_quantity",
+    "quantity_sold",
+    "rating",
+    "last_stock_date",
+    "free_shipping",
+    "review_count",
+    "views",
+    "score",
+    "updated_at",
+]
+
+
+def _build_summaries(product_ids: list[int]) -> list[ProductSummary]:
+    """
+    Сборка сводок по товарам за три запроса: товары с агрегатами отзывов,
+    склады и просмотры за VIEWS_WINDOW_DAYS дней.
+    Оценка популярности считается здесь же из собранных значений
+    """
+    summaries = {
+        product["id"]: ProductSummary(
+            product_id=product["id"],
+            category_id=product["category_id"],
+            active=product["active"],
+            rating=product["rating_avg"],
+            review_count=product["review_count"],
+        )
+        for product in Product.objects.filter(id__in=product_ids).values(
+            "id", "category_id", "active", "rating_avg", "review_count"
+        )
+    }
+
+    stocks = Stock.objects.filter(product_id__in=summaries.keys()).values(
+        "id",
+        "product_id",
+        "price",
+        "quantity",
+        "quantity_sold",
+        "create_date",
+        "free_shipping",
+    )
+    for stock in stocks.order_by("product_id", "price", "id"):
+        summary = summaries[stock["product_id"]]
+        if summary.best_stock_id is None:
+            summary.best_stock_id = stock["id"]
+            summary.min_price = stock["price"]
+        summary.max_quantity = max(summary.max_quantity, stock["quantity"])
+        summary.total_quantity += stock["quantity"]
+        summary.quantity_sold += stock["quantity_sold"]
+        if stock["create_date"] and (
+            summary.last_stock_date is None
+            or stock["create_date"] > summary.last_stock_date
+        ):
+            summary.last_stock_date = stock["create_date"]
+        summary.free_shipping = summary.free_shipping or stock["free_shipping"]
+
+    since = timezone.localdate() - timedelta(days=VIEWS_WINDOW_DAYS - 1)
+    views = (
+        ProductDailyViews.objects.filter(
+            product_id__in=summaries.keys(), day__gte=since
+        )
+        .values("product_id")
+        .annotate(views=Sum("views"))
+    )
+    for row in views:
+        summaries[row["product_id"]].views = row["views"]
+
+    for summary in summaries.values():
+        summary.score = popularity_score(
+            summary.quantity_sold,
+            summary.review_count,
+            summary.rating,
+            summary.last_stock_date,
+            summary.views,
+        )
+    return list(summaries.values())
+
+
+def update_product_summaries(product_ids: Iterable[int]) -> set[int]:
+    """
+    Пересчет сводок для указанных товаров.
+    Возвращает идентификаторы категорий затронутых товаров
+    """
+    product_ids = sorted({pk for pk in product_ids if pk is not None})
+    category_ids = set()
+    for start in range(0, len(product_ids), SUMMARY_BATCH_SIZE):
+        summaries = _build_summaries(product_ids[start : start + SUMMARY_BATCH_SIZE])
+        ProductSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=SUMMARY_UPDATE_FIELDS,
+        )
+        category_ids.update(summary.category_id for summary in summaries)
+    return category_ids
+
+
+def rebuild_product_summaries() -> int:
+    """
+    Полный пересчет сводок по всем товарам.
+    Возвращает количество обработанных товаров
+    """
+    product_ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+    update_product_summaries(product_ids)
+    return len(product_ids)
+
+
+def changed_product_ids(since: datetime) -> set[int]:
+    """
+    Товары, чья оценка могла измениться после since: с просмотрами,
+    отзывами и заказами с этого момента (просмотры и отзывы хранятся
+    по дням, поэтому берется весь день since). После смены дня к ним
+    добавляются товары, зависящие от даты: с просмотрами, выпавшими
+    из окна VIEWS_WINDOW_DAYS, и с поставкой внутри окна свежести
+    """
+    today = timezone.localdate()
+    last_day = timezone.localdate(since)
+    product_ids = set(
+        ProductDailyViews.objects.filter(day__gte=last_day).values_list(
+            "product_id", flat=True
+        )
+    )
+    product_ids.update(
+        Review.objects.filter(created_at__gte=last_day).values_list(
+            "product_id", flat=True
+        )
+    )
+    product_ids.update(
+        Stock.objects.filter(
+            Q(order_items__order__created_date__gte=since)
+            | Q(order_items__order__payment_started_at__gte=since)
+        ).values_list("product_id", flat=True)
+    )
+    if last_day < today:
+        product_ids.update(
+            ProductDailyViews.objects.filter(
+                day__gte=last_day - timedelta(days=VIEWS_WINDOW_DAYS - 1),
+                day__lt=today - timedelta(days=VIEWS_WINDOW_DAYS - 1),
+            ).values_list("product_id", flat=True)
+        )
+        product_ids.update(
+            ProductSummary.objects.filter(
+                last_stock_date__gte=last_day - timedelta(days=RECENCY_WINDOW_DAYS)
+            ).values_list("product_id", flat=True)
+        )
+    return product_ids
+
+
+def refresh_changed_summaries() -> int:
+    """
+    Пересчет сводок только для товаров, измененных после прошлого запуска.
+    Без отметки прошлого запуска сводки пересчитываются полностью.
+    Возвращает количество пересчитанных товаров
+    """
+    started = timezone.now()
+    since = cache.get(SUMMARY_REFRESH_KEY)
+    if since is None:
+        count = rebuild_product_summaries()
+    else:
+        product_ids = changed_product_ids(since)
+        update_product_summaries(product_ids)
+        count = len(product_ids)
+    cache.set(SUMMARY_REFRESH_KEY, started, None)
+    return count
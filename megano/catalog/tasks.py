@@ -0,0 +1,19 @@
+from celery import shared_task
+
+from catalog.summary import rebuild_product_summaries, refresh_changed_summaries
+from catalog.view_events import flush_view_events
+
+
+@shared_task
+def rebuild_product_summaries_task() -> int:
+    return rebuild_product_summaries()
+
+
+@shared_task
+def refresh_changed_summaries_task() -> int:
+    return refresh_changed_summaries()
+
+
+@shared_task
+def flush_view_events_task() -> int:
+    return flush_view_events()
@@ -1,3 +1,1057 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import Profile
+from core.cache import CacheStats
+from core.models import SiteSettings
+
+from .category_tree import CategoryTree, get_category_tree
+from .comparison import CharacteristicMatrix, load_compared_products
+from .facets import get_facet_index
+from .generator import CatalogGenerator, CatalogSize
+from .listing_cache import (
+    bump_category_versions,
+    get_or_build_listing,
+    make_listing_key,
+    stats,
+)
+from .models import (
+    Category,
+    Product,
+    ProductDailyViews,
+    ProductSummary,
+    Review,
+    Seller,
+    Stock,
+    Tag,
+    ViewEvent,
+)
+from .pagination import KeysetPaginator, encode_cursor, keyset_order_by
+from .product_page import get_product_page
+from .ranking import popularity_score, top_product_ids, top_products
+from .reviews import approve_reviews
+from .search import rebuild_search_index, search_products
+from .summary import (
+    SUMMARY_REFRESH_KEY,
+    rebuild_product_summaries,
+    refresh_changed_summaries,
+)
+from .view_events import flush_view_events, seller_daily_views
+from .views import CatalogListView, SearchView
+
+
+class ProductSummaryTest(TestCase):
+    def setUp(self) -> None:
+        self.category = Category.objects.create(title="Электроника")
+        self.seller = Seller.objects.create(
+            name="Продавец", phone="123", address="Адрес", email="s@s.ru"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(
+                category=self.category, name="Телефон", active=True
+            )
+
+    def test_summary_follows_stocks(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            Stock.objects.create(
+                seller=self.seller, product=self.product, quantity=3, price=200
+            )
+            cheap = Stock.objects.create(
+                seller=self.seller,
+                product=self.product,
+                quantity=5,
+                price=100,
+                free_shipping=True,
+            )
+        summary = ProductSummary.objects.get(product=self.product)
+        self.assertEqual(summary.min_price, Decimal("100"))
+        self.assertEqual(summary.best_stock_id, cheap.pk)
+        self.assertEqual(summary.max_quantity, 5)
+        self.assertEqual(summary.total_quantity, 8)
+        self.assertTrue(summary.free_shipping)
+
+    def test_rebuild(self) -> None:
+        ProductSummary.objects.all().delete()
+        self.assertEqual(rebuild_product_summaries(), 1)
+        summary = ProductSummary.objects.get(product=self.product)
+        self.assertEqual(summary.category_id, self.category.pk)
+        self.assertIsNone(summary.min_price)
+
+
+class KeysetPaginatorTest(TestCase):
+    def setUp(self) -> None:
+        category = Category.objects.create(title="Электроника")
+        seller = Seller.objects.create(
+            name="Продавец", phone="123", address="Адрес", email="s@s.ru"
+        )
+        for index, price in enumerate([300, 100, None, 200, 100, None, 300]):
+            product = Product.objects.create(category=category, name=f"Товар {index}")
+            if price is not None:
+                Stock.objects.create(seller=seller, product=product, price=price)
+        rebuild_product_summaries()
+        self.queryset = Product.objects.annotate(price=F("summary__min_price"))
+
+    def walk(self, ordering: str) -> list:
+        paginator = KeysetPaginator(self.queryset, 2, ordering)
+        page = paginator.page()
+        pages = [[product.pk for product in page]]
+        while page.has_next:
+            page = paginator.page(page.next_cursor)
+            pages.append([product.pk for product in page])
+        while page.has_previous:
+            page = paginator.page(page.previous_cursor)
+            pages.append([product.pk for product in page])
+        return pages
+
+    def test_walk_forward_and_back(self) -> None:
+        for ordering in ("price", "-price", "pk"):
+            with self.subTest(ordering=ordering):
+                pages = self.walk(ordering)
+                forward = pages[:4]
+                expected = [
+                    product.pk
+                    for product in self.queryset.order_by(
+                        *keyset_order_by(ordering.lstrip("-"), ordering.startswith("-"))
+                    )
+                ]
+                self.assertEqual(sum(forward, []), expected)
+                self.assertEqual(pages[4:], forward[-2::-1])
+
+    def test_broken_cursor_starts_over(self) -> None:
+        paginator = KeysetPaginator(self.queryset, 2, "price")
+        self.assertEqual(
+            [product.pk for product in paginator.page("broken")],
+            [product.pk for product in paginator.page()],
+        )
+
+    def test_forged_cursor_value_starts_over(self) -> None:
+        for ordering, value in (("price", {"a": 1}), ("price", "abc"), ("pk", "abc")):
+            with self.subTest(ordering=ordering, value=value):
+                paginator = KeysetPaginator(self.queryset, 2, ordering)
+                cursor = encode_cursor(ordering, value, 1, "next")
+                self.assertEqual(
+                    [product.pk for product in paginator.page(cursor)],
+                    [product.pk for product in paginator.page()],
+                )
+        response = self.client.get(
+            reverse("catalog:sales"),
+            {"cursor": encode_cursor("pk", "abc", 1, "next")},
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class ListingCacheTest(TestCase):
+    def setUp(self) -> None:
+        SiteSettings.objects.create(cache_active=True)
+        stats.reset()
+
+    def test_version_bump_is_per_category(self) -> None:
+        first = make_listing_key(1, "price", {}, "page:1")
+        other = make_listing_key(2, "price", {}, "page:1")
+        bump_category_versions([1])
+        self.assertNotEqual(make_listing_key(1, "price", {}, "page:1"), first)
+        self.assertEqual(make_listing_key(2, "price", {}, "page:1"), other)
+
+    def test_key_depends_on_sort_filters_and_page(self) -> None:
+        keys = {
+            make_listing_key(1, "price", {}, "page:1"),
+            make_listing_key(1, "-price", {}, "page:1"),
+            make_listing_key(1, "price", {"freecheck": "on"}, "page:1"),
+            make_listing_key(1, "price", {}, "page:2"),
+        }
+        self.assertEqual(len(keys), 4)
+
+    def test_hits_and_misses(self) -> None:
+        calls = []
+
+        def build():
+            calls.append(1)
+            return ["payload"]
+
+        for _ in range(3):
+            self.assertEqual(
+                get_or_build_listing(3, "", {}, "page:1", build), ["payload"]
+            )
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((stats.hits, stats.misses), (2, 1))
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self) -> None:
+        self.phones = Category.objects.create(title="Телефоны")
+        self.laptops = Category.objects.create(title="Ноутбуки")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phone = Product.objects.create(
+                category=self.phones,
+                name="Смартфон Galaxy",
+                manufacturer="Samsung",
+                active=True,
+                characteristics={"Цвет": "графитовый"},
+            )
+            self.laptop = Product.objects.create(
+                category=self.laptops,
+                name="Ноутбук Galaxy Book",
+                manufacturer="Samsung",
+                active=True,
+            )
+            Product.objects.create(
+                category=self.phones, name="Смартфон скрытый", manufacturer="X"
+            )
+            self.phone.tag.add(Tag.objects.create(name="флагман"))
+
+    def test_prefix(self) -> None:
+        self.assertEqual(search_products("смарт"), [self.phone.pk])
+        self.assertEqual(search_products("galaxy book"), [self.laptop.pk])
+        self.assertEqual(len(search_products("samsung")), 2)
+
+    def test_tags_characteristics_and_category(self) -> None:
+        self.assertEqual(search_products("флагман"), [self.phone.pk])
+        self.assertEqual(search_products("графит"), [self.phone.pk])
+        self.assertEqual(
+            search_products("galaxy", category_id=self.laptops.pk), [self.laptop.pk]
+        )
+
+    def test_category_includes_subcategories(self) -> None:
+        electronics = Category.objects.create(title="Электроника")
+        self.phones.parent = electronics
+        self.phones.save()
+        self.assertEqual(
+            search_products("galaxy", category_id=electronics.pk), [self.phone.pk]
+        )
+        self.assertEqual(search_products("galaxy", category_id=0), [])
+
+    def test_view_ignores_malformed_params(self) -> None:
+        url = reverse("catalog:search")
+        for params in ({"page": "²"}, {"page": "00"}, {"category": "²"}):
+            response = self.client.get(url, {"query": "galaxy", **params})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["page"], 1)
+            self.assertEqual(len(response.context["products"]), 2)
+        response = self.client.get(url, {"query": "galaxy", "page": "100000"})
+        self.assertEqual(response.context["page"], SearchView.max_page)
+
+    def test_typo(self) -> None:
+        self.assertEqual(search_products("смартфно"), [self.phone.pk])
+        self.assertEqual(search_products("samsnug смартфон"), [self.phone.pk])
+
+    def test_rebuild_and_deactivate(self) -> None:
+        self.assertEqual(rebuild_search_index(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.laptop.active = False
+            self.laptop.save()
+        self.assertEqual(search_products("ноутбук"), [])
+
+
+class FacetIndexTest(TestCase):
+    def setUp(self) -> None:
+        self.category = Category.objects.create(title="Телефоны")
+        first = Seller.objects.create(
+            name="Первый", phone="1", address="Адрес", email="a@s.ru"
+        )
+        second = Seller.objects.create(
+            name="Второй", phone="2", address="Адрес", email="b@s.ru"
+        )
+        self.tag = Tag.objects.create(name="флагман")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cheap = Product.objects.create(
+                category=self.category,
+                name="Дешевый",
+                active=True,
+                characteristics={"Цвет": "черный"},
+            )
+            self.expensive = Product.objects.create(
+                category=self.category,
+                name="Дорогой",
+                active=True,
+                characteristics={"Цвет": "белый"},
+            )
+            Stock.objects.create(
+                seller=first, product=self.cheap, price=500, quantity=1
+            )
+            Stock.objects.create(
+                seller=second,
+                product=self.expensive,
+                price=20000,
+                free_shipping=True,
+            )
+            self.expensive.tag.add(self.tag)
+        self.first, self.second = first, second
+
+    def counts(self, selection: dict) -> dict:
+        facets = get_facet_index(self.category.pk).counts(selection)
+        return {
+            name: {item["value"]: item["count"] for item in items}
+            for name, items in facets.items()
+        }
+
+    def test_match(self) -> None:
+        index = get_facet_index(self.category.pk)
+        self.assertIsNone(index.match({}))
+        self.assertEqual(
+            index.match({"seller": [str(self.first.pk), str(self.second.pk)]}),
+            {self.cheap.pk, self.expensive.pk},
+        )
+        self.assertEqual(
+            index.match({"seller": [str(self.first.pk)], "freecheck": "on"}), set()
+        )
+        self.assertEqual(index.match({"char": ["Цвет=белый"]}), {self.expensive.pk})
+        self.assertEqual(index.match({"price": "100;1000"}), {self.cheap.pk})
+        self.assertEqual(
+            index.match({"price_bucket": ["10000-50000"]}), {self.expensive.pk}
+        )
+
+    def test_disjunctive_counts(self) -> None:
+        counts = self.counts({"seller": [str(self.first.pk)]})
+        self.assertEqual(
+            counts["seller"], {str(self.first.pk): 1, str(self.second.pk): 1}
+        )
+        self.assertEqual(counts["tag"], {str(self.tag.pk): 0})
+        self.assertEqual(counts["havecheck"], {"on": 1})
+
+    def test_sql_filter_accepts_only_indexed_characteristics(self) -> None:
+        url = reverse("catalog:catalog", args=[self.category.pk])
+        with mock.patch.object(CatalogListView, "facet_in_limit", 0):
+            response = self.client.get(url, {"char": ["Цвет=белый"]})
+            names = [card.name for card in response.context["products"]]
+            self.assertEqual(names, ["Дорогой"])
+            response = self.client.get(url, {"char": ["a__regex=("]})
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.context["products"])
+            response = self.client.get(url, {"price_bucket": ["²-5", "10000-50000"]})
+            self.assertEqual(response.status_code, 200)
+            names = [card.name for card in response.context["products"]]
+            self.assertEqual(names, ["Дорогой"])
+
+    def test_tag_change_rebuilds_index(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cheap.tag.add(self.tag)
+        self.assertEqual(self.counts({})["tag"], {str(self.tag.pk): 2})
+
+
+class RankingTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.phones = Category.objects.create(title="Телефоны")
+        laptops = Category.objects.create(title="Ноутбуки")
+        seller = Seller.objects.create(
+            name="Продавец", phone="123", address="Адрес", email="s@s.ru"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products = []
+            for index, (category, sold) in enumerate(
+                [(self.phones, 5), (self.phones, 50), (laptops, 500)]
+            ):
+                product = Product.objects.create(
+                    category=category, name=f"Товар {index}", active=True
+                )
+                Stock.objects.create(
+                    seller=seller, product=product, price=100, quantity_sold=sold
+                )
+                self.products.append(product)
+
+    def test_score_order(self) -> None:
+        self.assertLess(
+            popularity_score(5, 0, None, None), popularity_score(5, 2, 5, None)
+        )
+        today = date(2024, 3, 1)
+        self.assertLess(
+            popularity_score(5, 0, None, date(2024, 2, 1), today=today),
+            popularity_score(5, 0, None, today, today=today),
+        )
+
+    def test_old_best_seller_beats_fresh_product(self) -> None:
+        today = date(2024, 3, 1)
+        self.assertGreater(
+            popularity_score(500, 10, 5, date(2022, 3, 1), today=today),
+            popularity_score(0, 0, None, today, today=today),
+        )
+        self.assertGreater(
+            popularity_score(5, 0, None, date(2023, 3, 1), today=today),
+            popularity_score(0, 0, None, today, today=today),
+        )
+
+    def test_global_and_category_top(self) -> None:
+        first, second, third = self.products
+        self.assertEqual(top_product_ids(2), [third.pk, second.pk])
+        self.assertEqual(
+            [product.pk for product in top_products(5, self.phones.pk)],
+            [second.pk, first.pk],
+        )
+        with self.assertNumQueries(0):
+            top_products(2, self.phones.pk)
+
+    def test_sales_update_ranking(self) -> None:
+        first, second, _ = self.products
+        top_products(5, self.phones.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Stock.objects.filter(product=first).update(quantity_sold=500)
+            stock = first.stocks.get()
+            stock.save()
+        self.assertEqual(
+            [product.pk for product in top_products(5, self.phones.pk)],
+            [first.pk, second.pk],
+        )
+
+
+@override_settings(SETTINGS_SNAPSHOT_CHECK_INTERVAL=0)
+class CategoryTreeTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.root = Category.objects.create(title="Электроника", sorted_index=1)
+            self.phones = Category.objects.create(title="Телефоны", parent=self.root)
+            self.android = Category.objects.create(title="Android", parent=self.phones)
+            self.other = Category.objects.create(title="Книги")
+
+    def test_tree(self) -> None:
+        with self.assertNumQueries(1):
+            tree = CategoryTree.load()
+        self.assertEqual(
+            [node.id for node in tree.roots], [self.root.pk, self.other.pk]
+        )
+        self.assertEqual(tree.children(self.root.pk)[0].id, self.phones.pk)
+        self.assertEqual(
+            [node.id for node in tree.ancestors(self.android.pk)],
+            [self.root.pk, self.phones.pk],
+        )
+        self.assertEqual(
+            tree.descendant_ids(self.root.pk),
+            {self.root.pk, self.phones.pk, self.android.pk},
+        )
+
+    def test_invalidated_on_save(self) -> None:
+        get_category_tree()
+        stats = CacheStats.get("category_tree")
+        misses = stats.misses
+        with self.captureOnCommitCallbacks(execute=True):
+            self.android.parent = self.other
+            self.android.save()
+        tree = get_category_tree()
+        self.assertEqual(stats.misses, misses + 1)
+        self.assertEqual(tree.parent(self.android.pk).id, self.other.pk)
+        self.assertEqual(tree.descendant_ids(self.phones.pk), {self.phones.pk})
+
+    def test_parent_catalog_lists_subcategory_products(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                category=self.android, name="Смартфон", active=True
+            )
+        response = self.client.get(f"/catalog/{self.root.pk}/")
+        self.assertEqual(
+            [card.id for card in response.context["page_obj"]], [product.pk]
+        )
+        # меню в шапке берется из кэша фрагмента без запросов к категориям
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f"/catalog/{self.other.pk}/")
+        self.assertFalse(
+            [query for query in queries if 'FROM "catalog_category"' in query["sql"]]
+        )
+
+    def test_leaf_listing_sort_reads_summary_index(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(3):
+                product = Product.objects.create(
+                    category=self.android, name=f"Смартфон {index}", active=True
+                )
+                seller = Seller.objects.create(name="Продавец", phone="1", address="А")
+                Stock.objects.create(seller=seller, product=product, price=index + 1)
+        url = reverse("catalog:catalog", args=[self.android.pk])
+        for sort in ("price", "-price", "rating"):
+            with self.subTest(sort=sort):
+                response = self.client.get(url, {"sort": sort})
+                plan = response.context["view"].get_queryset().explain()
+                self.assertIn("summary_cat_", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+
+class CategoryPathTest(TestCase):
+    def setUp(self) -> None:
+        self.root = Category.objects.create(title="Электроника")
+        self.phones = Category.objects.create(title="Телефоны", parent=self.root)
+        self.android = Category.objects.create(title="Android", parent=self.phones)
+        self.other = Category.objects.create(title="Книги")
+
+    def subtree(self, category: Category) -> set:
+        return set(
+            Category.objects.filter(Category.subtree_q(category.path)).values_list(
+                "pk", flat=True
+            )
+        )
+
+    def test_paths_and_subtree(self) -> None:
+        self.assertEqual(
+            self.android.path, f"/{self.root.pk}/{self.phones.pk}/{self.android.pk}/"
+        )
+        self.assertEqual(
+            self.subtree(self.root), {self.root.pk, self.phones.pk, self.android.pk}
+        )
+        Product.objects.create(category=self.android, name="Смартфон")
+        Product.objects.create(category=self.other, name="Книга")
+        tree = CategoryTree.load()
+        self.assertEqual(
+            list(
+                Product.objects.filter(tree.subtree_q(self.root.pk)).values_list(
+                    "name", flat=True
+                )
+            ),
+            ["Смартфон"],
+        )
+
+    def test_move_subtree(self) -> None:
+        self.phones.parent = self.other
+        self.phones.save()
+        self.android.refresh_from_db()
+        self.assertEqual(
+            self.android.path, f"/{self.other.pk}/{self.phones.pk}/{self.android.pk}/"
+        )
+        self.assertEqual(self.subtree(self.root), {self.root.pk})
+
+    def test_rebuild_command(self) -> None:
+        Category.objects.update(path="")
+        call_command("rebuild_category_tree", stdout=StringIO())
+        self.android.refresh_from_db()
+        self.assertEqual(
+            self.android.path, f"/{self.root.pk}/{self.phones.pk}/{self.android.pk}/"
+        )
+
+
+class CatalogGeneratorTest(TestCase):
+    size = CatalogSize(
+        categories=7,
+        depth=2,
+        products=30,
+        sellers=4,
+        stocks_per_product=2,
+        images_per_product=2,
+        reviews=40,
+        users=5,
+        sales=2,
+        orders=10,
+    )
+
+    def test_generates_requested_volume(self) -> None:
+        generator = CatalogGenerator(self.size, seed=1, batch_size=8)
+        generator.generate()
+        self.assertEqual(Category.objects.count(), 7)
+        self.assertFalse(Category.objects.filter(path="").exists())
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertEqual(Stock.objects.count(), 60)
+        self.assertEqual(ProductSummary.objects.count(), 30)
+        self.assertFalse(
+            Product.objects.filter(category__subcategories__isnull=False).exists()
+        )
+
+    def test_same_seed_same_data(self) -> None:
+        names = []
+        for size in (self.size, CatalogSize(**{**self.size.__dict__, "users": 0})):
+            generator = CatalogGenerator(size, seed=3)
+            generator.generate()
+            names.append(
+                list(
+                    Product.objects.filter(pk__in=generator.product_ids)
+                    .order_by("pk")
+                    .values_list("name", "manufacturer")
+                )
+            )
+        self.assertEqual(names[0], names[1])
+
+
+class ProductPageTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        category = Category.objects.create(title="Электроника")
+        self.product = Product.objects.create(category=category, name="Смартфон")
+        sellers = [
+            Seller.objects.create(name=f"Продавец {index}", phone="1", address="А")
+            for index in range(3)
+        ]
+        self.stocks = [
+            Stock.objects.create(seller=seller, product=self.product, price=price)
+            for seller, price in zip(sellers, (300, 100, 200))
+        ]
+        user = get_user_model().objects.create_user(
+            username="buyer", email="b@b.ru", password="secret"
+        )
+        profile = Profile.objects.create(user=user)
+        for rating, is_valid in ((5, True), (4, True), (1, False)):
+            Review.objects.create(
+                product=self.product, profile=profile, rating=rating, is_valid=is_valid
+            )
+
+    def test_page_payload(self) -> None:
+        page = get_product_page(self.product.pk)
+        self.assertEqual(page.best_offer, self.stocks[1])
+        self.assertEqual([stock.price for stock in page.stocks], [100, 200, 300])
+        self.assertEqual(page.review_count, 2)
+        self.assertEqual(page.rating_avg, Decimal("4.50"))
+
+    def test_cached_page_skips_product_queries(self) -> None:
+        url = reverse("catalog:product_detail", args=[self.product.pk])
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(url)
+        self.assertContains(response, f"value='{self.stocks[1].pk}'")
+        with CaptureQueriesContext(connection) as second:
+            self.client.get(url)
+        self.assertLessEqual(len(second), len(first) - 5)
+        self.assertFalse(
+            any("catalog_stock" in query["sql"] for query in second.captured_queries)
+        )
+
+    def test_stock_change_invalidates_page(self) -> None:
+        get_product_page(self.product.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Stock.objects.filter(pk=self.stocks[0].pk).update(price=50)
+            self.stocks[0].refresh_from_db()
+            self.stocks[0].save()
+        self.assertEqual(get_product_page(self.product.pk).best_offer, self.stocks[0])
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.category = Category.objects.create(title="Электроника")
+        self.product = Product.objects.create(category=self.category, name="Смартфон")
+        seller = Seller.objects.create(name="Продавец", phone="1", address="А")
+        self.stock = Stock.objects.create(seller=seller, product=self.product, price=10)
+
+    def test_product_not_modified(self) -> None:
+        url = reverse("catalog:product_detail", args=[self.product.pk])
+        response = self.client.get(url)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+        self.assertTrue(response.has_header("Last-Modified"))
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock.price = 5
+            self.stock.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_login_invalidates_anonymous_etag(self) -> None:
+        url = reverse("catalog:product_detail", args=[self.product.pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        get_user_model().objects.create_user(
+            username="buyer", email="b@b.ru", password="secret"
+        )
+        self.client.login(email="b@b.ru", password="secret")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_category_etag_follows_version(self) -> None:
+        url = reverse("catalog:catalog", args=[self.category.pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        bump_category_versions([self.category.pk])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_sorted_listing_does_not_touch_session(self) -> None:
+        url = reverse("catalog:catalog", args=[self.category.pk])
+        response = self.client.get(url, {"sort": "-price"})
+        self.assertEqual(response.context["sort"]["price"]["param"], "price")
+        self.assertNotIn("sessionid", response.cookies)
+        response = self.client.get(url)
+        self.assertEqual(response.context["sort"]["price"]["param"], "price")
+        self.assertFalse(response.context["sort"]["price"]["style"])
+
+    def test_header_state_is_separate(self) -> None:
+        self.client.post(
+            reverse("cart:add_to_cart"), {"stock_id": self.stock.pk}, HTTP_REFERER="/"
+        )
+        state = self.client.get(reverse("core:header_state")).json()
+        self.assertEqual(state["cart_count"], 1)
+        self.assertFalse(state["authenticated"])
+
+
+class ComparisonTest(TestCase):
+    def setUp(self) -> None:
+        category = Category.objects.create(title="Электроника")
+        seller = Seller.objects.create(name="Продавец", phone="1", address="А")
+        characteristics = [
+            {"color": "черный", "weight": 100, "wifi": True},
+            {"color": "черный", "weight": 200},
+            {"color": "черный", "weight": 100, "nfc": True},
+        ]
+        self.products = [
+            Product.objects.create(
+                category=category, name=f"Товар {index}", characteristics=value
+            )
+            for index, value in enumerate(characteristics)
+        ]
+        for product, price in zip(self.products, (300, 200)):
+            Stock.objects.create(seller=seller, product=product, price=price)
+            Stock.objects.create(seller=seller, product=product, price=price + 50)
+
+    def test_matrix(self) -> None:
+        matrix = CharacteristicMatrix.build(
+            [product.characteristics for product in self.products]
+        )
+        self.assertEqual(matrix.shared, {"color"})
+        self.assertEqual(matrix.differing, {"weight", "wifi", "nfc"})
+        self.assertEqual(matrix.unique, {"wifi", "nfc"})
+        self.assertEqual(matrix.values["wifi"], [True, None, None])
+        self.assertFalse(matrix.not_comparable)
+        self.assertTrue(CharacteristicMatrix.build([{"a": 1}, {"b": 2}]).not_comparable)
+
+    @override_settings(COMPARISON_LIMIT=20)
+    def test_comparison_page_queries(self) -> None:
+        for product in reversed(self.products):
+            self.client.post(
+                reverse("catalog:add_product_to_comparison"),
+                {"product_id": product.pk},
+                HTTP_REFERER="/",
+            )
+        compared = load_compared_products(
+            product.pk for product in reversed(self.products)
+        )
+        self.assertEqual(
+            [(product, price) for product, price in compared],
+            [(self.products[2], 100), (self.products[1], 200), (self.products[0], 300)],
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("catalog:comparison"))
+        self.assertContains(response, "Товар 0")
+        product_queries = [
+            query
+            for query in queries.captured_queries
+            if 'FROM "catalog_product"' in query["sql"]
+        ]
+        self.assertEqual(len(product_queries), 1)
+
+    @override_settings(COMPARISON_LIMIT=2)
+    def test_limit(self) -> None:
+        for product in self.products:
+            self.client.post(
+                reverse("catalog:add_product_to_comparison"),
+                {"product_id": product.pk},
+                HTTP_REFERER="/",
+            )
+        self.assertEqual(len(self.client.session["comparison"]), 2)
+
+    @override_settings(COMPARISON_LIMIT=2)
+    def test_profile_limit(self) -> None:
+        user = get_user_model().objects.create_user(
+            username="wholesale", email="w@w.ru", password="secret"
+        )
+        Profile.objects.create(user=user, comparison_limit=20)
+        self.client.force_login(user)
+        for product in self.products:
+            self.client.post(
+                reverse("catalog:add_product_to_comparison"),
+                {"product_id": product.pk},
+                HTTP_REFERER="/",
+            )
+        self.assertEqual(len(self.client.session["comparison"]), 3)
+
+
+@override_settings(BROWSING_HISTORY_LIMIT=3)
+class BrowsingHistoryTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        category = Category.objects.create(title="Электроника")
+        self.products = [
+            Product.objects.create(category=category, name=f"Товар {index}")
+            for index in range(5)
+        ]
+        user = get_user_model().objects.create_user(
+            username="buyer", email="b@b.ru", password="secret"
+        )
+        self.profile = Profile.objects.create(user=user)
+
+    def view(self, product) -> None:
+        self.client.get(reverse("catalog:product_detail", args=[product.pk]))
+
+    def history(self) -> list:
+        return list(
+            ViewEvent.objects.filter(profile=self.profile)
+            .order_by("-viewed_at")
+            .values_list("product_id", flat=True)
+        )
+
+    def test_session_history_merges_on_login(self) -> None:
+        for product in self.products[:2]:
+            self.view(product)
+        self.assertEqual(
+            self.client.session["history"],
+            [str(product.pk) for product in self.products[:2]],
+        )
+        self.client.login(email="b@b.ru", password="secret")
+        self.assertEqual(self.history(), [self.products[1].pk, self.products[0].pk])
+
+    def test_ring_keeps_latest_views(self) -> None:
+        self.client.login(email="b@b.ru", password="secret")
+        for product in self.products:
+            self.view(product)
+        self.view(self.products[2])
+        flush_view_events()
+        self.assertEqual(
+            self.history(),
+            [self.products[2].pk, self.products[4].pk, self.products[3].pk],
+        )
+
+        self.client.logout()
+        self.client.login(email="b@b.ru", password="secret")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("account:browsing_history"))
+        names = [product.name for product in response.context["browsing_history"]]
+        self.assertEqual(names, ["Товар 2", "Товар 4", "Товар 3"])
+        product_queries = [
+            query
+            for query in queries.captured_queries
+            if 'FROM "catalog_product"' in query["sql"]
+        ]
+        self.assertEqual(len(product_queries), 1)
+
+    def test_signed_in_view_does_not_touch_session(self) -> None:
+        self.client.login(email="b@b.ru", password="secret")
+        self.view(self.products[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.view(self.products[3])
+        self.assertFalse(
+            any(
+                query["sql"].startswith(("INSERT", "UPDATE"))
+                for query in queries.captured_queries
+            )
+        )
+        self.assertNotIn("history", self.client.session)
+        flush_view_events()
+        response = self.client.get(reverse("account:browsing_history"))
+        names = [product.name for product in response.context["browsing_history"]]
+        self.assertEqual(names, ["Товар 3", "Товар 0"])
+
+    def test_buffer_failure_does_not_break_product_page(self) -> None:
+        with mock.patch(
+            "catalog.view_events.CacheViewEventBuffer.push",
+            side_effect=ConnectionError,
+        ):
+            with self.assertLogs("catalog.view_events", "ERROR"):
+                response = self.client.get(
+                    reverse("catalog:product_detail", args=[self.products[0].pk])
+                )
+        self.assertEqual(response.status_code, 200)
+
+    def test_repeated_view_is_not_written(self) -> None:
+        self.client.login(email="b@b.ru", password="secret")
+        self.view(self.products[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.view(self.products[0])
+        self.assertFalse(any("catalog_viewevent" in query["sql"] for query in queries))
+
+
+class ViewEventPipelineTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        category = Category.objects.create(title="Электроника")
+        self.seller = Seller.objects.create(name="Продавец", phone="1", address="А")
+        self.products = [
+            Product.objects.create(
+                category=category, name=f"Товар {index}", active=True
+            )
+            for index in range(2)
+        ]
+        for product in self.products:
+            Stock.objects.create(seller=self.seller, product=product, price=100)
+        user = get_user_model().objects.create_user(
+            username="buyer", email="b@b.ru", password="secret"
+        )
+        self.profile = Profile.objects.create(user=user)
+
+    def view(self, product) -> None:
+        self.client.get(reverse("catalog:product_detail", args=[product.pk]))
+
+    def test_views_are_buffered_and_flushed(self) -> None:
+        self.view(self.products[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.view(self.products[0])
+        self.assertFalse(
+            any(
+                query["sql"].startswith(("INSERT", "UPDATE"))
+                for query in queries.captured_queries
+            )
+        )
+        self.client.login(email="b@b.ru", password="secret")
+        self.view(self.products[1])
+        self.assertFalse(ProductDailyViews.objects.exists())
+
+        self.assertEqual(flush_view_events(), 3)
+        self.assertEqual(flush_view_events(), 0)
+        self.assertEqual(
+            dict(ProductDailyViews.objects.values_list("product_id", "views")),
+            {self.products[0].pk: 2, self.products[1].pk: 1},
+        )
+        self.assertTrue(
+            ViewEvent.objects.filter(
+                profile=self.profile, product=self.products[1]
+            ).exists()
+        )
+        self.assertEqual(seller_daily_views(self.seller.pk)[0][1], 3)
+
+    def test_views_feed_ranking(self) -> None:
+        rebuild_product_summaries()
+        self.assertEqual(top_product_ids(2)[0], self.products[0].pk)
+        for _ in range(3):
+            self.view(self.products[1])
+        flush_view_events()
+        rebuild_product_summaries()
+        self.assertEqual(ProductSummary.objects.get(product=self.products[1]).views, 3)
+        self.assertEqual(top_product_ids(2)[0], self.products[1].pk)
+
+    def test_refresh_only_changed_summaries(self) -> None:
+        self.assertEqual(refresh_changed_summaries(), 2)
+        self.assertEqual(refresh_changed_summaries(), 0)
+        for _ in range(3):
+            self.view(self.products[1])
+        flush_view_events()
+        self.assertEqual(refresh_changed_summaries(), 1)
+        self.assertEqual(ProductSummary.objects.get(product=self.products[1]).views, 3)
+        # после смены дня пересчитываются товары со свежей поставкой
+        cache.set(SUMMARY_REFRESH_KEY, timezone.now() - timedelta(days=1))
+        self.assertEqual(refresh_changed_summaries(), 2)
+
+
+class ReviewStatsTest(TestCase):
+    def setUp(self) -> None:
+        category = Category.objects.create(title="Электроника")
+        self.product, self.other = [
+            Product.objects.create(category=category, name=name, active=True)
+            for name in ("Смартфон", "Планшет")
+        ]
+        user = get_user_model().objects.create_user(
+            username="buyer", email="b@b.ru", password="secret"
+        )
+        self.profile = Profile.objects.create(user=user)
+
+    def review(self, rating, is_valid=True, product=None) -> Review:
+        return Review.objects.create(
+            product=product or self.product,
+            profile=self.profile,
+            rating=rating,
+            is_valid=is_valid,
+        )
+
+    def stats(self, product=None) -> tuple:
+        product = Product.objects.get(pk=(product or self.product).pk)
+        return product.review_count, product.rating_count, product.rating_avg
+
+    def test_incremental_updates(self) -> None:
+        self.review(5)
+        self.review(None)
+        pending = self.review(1, is_valid=False)
+        self.assertEqual(self.stats(), (2, 1, Decimal("5.00")))
+
+        pending.is_valid = True
+        pending.save()
+        self.assertEqual(self.stats(), (3, 2, Decimal("3.00")))
+
+        pending.rating = 2
+        pending.product = self.other
+        pending.save()
+        self.assertEqual(self.stats(), (2, 1, Decimal("5.00")))
+        self.assertEqual(self.stats(self.other), (1, 1, Decimal("2.00")))
+
+        pending.delete()
+        self.assertEqual(self.stats(self.other), (0, 0, None))
+
+    def test_recompute_and_rating_sort(self) -> None:
+        Review.objects.bulk_create(
+            [
+                Review(product=self.product, profile=self.profile, rating=3),
+                Review(
+                    product=self.product, profile=self.profile, rating=4, is_valid=True
+                ),
+                Review(
+                    product=self.other, profile=self.profile, rating=5, is_valid=True
+                ),
+            ]
+        )
+        self.assertEqual(self.stats(), (0, 0, None))
+        call_command("rebuild_review_stats", stdout=StringIO())
+        self.assertEqual(self.stats(), (1, 1, Decimal("4.00")))
+        self.assertEqual(
+            ProductSummary.objects.get(product=self.other).rating, Decimal("5.00")
+        )
+
+        # непроверенная оценка 5 не поднимает товар в сортировке
+        self.review(5, is_valid=False)
+        response = self.client.get(
+            reverse("catalog:catalog", args=[self.product.category_id]),
+            {"sort": "-rating"},
+        )
+        names = [product.name for product in response.context["products"]]
+        self.assertEqual(names, ["Планшет", "Смартфон"])
+
+
+@override_settings(REVIEWS_PAGE_SIZE=10)
+class ReviewFeedTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        category = Category.objects.create(title="Электроника")
+        self.product = Product.objects.create(category=category, name="Смартфон")
+        user = get_user_model().objects.create_user(
+            username="buyer", email="b@b.ru", password="secret"
+        )
+        self.profile = Profile.objects.create(user=user)
+        Review.objects.bulk_create(
+            [
+                Review(
+                    product=self.product,
+                    profile=self.profile,
+                    text=f"Отзыв {index}",
+                    is_valid=index % 5 != 0,
+                )
+                for index in range(30)
+            ]
+        )
+        self.url = reverse("catalog:reviews", args=[self.product.pk])
+
+    def test_feed_walks_all_valid_reviews(self) -> None:
+        ids, url = [], self.url
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 10)
+            ids.extend(review["id"] for review in page["results"])
+            url = page["next"]
+        valid = Review.objects.filter(product=self.product, is_valid=True)
+        self.assertEqual(len(ids), valid.count())
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(self.client.get(self.url + "?cursor=broken").status_code, 200)
+
+    def test_product_page_has_first_page_only(self) -> None:
+        response = self.client.get(
+            reverse("catalog:product_detail", args=[self.product.pk])
+        )
+        self.assertEqual(len(response.context["reviews"]), 10)
+        self.assertTrue(response.context["reviews_next_cursor"])
+        self.assertContains(response, 'id="reviews-more"')
+
+    def test_approve_and_throttle(self) -> None:
+        pending = Review.objects.filter(is_valid=False)
+        self.assertEqual(approve_reviews(pending), 6)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 30)
+        self.assertFalse(Review.objects.filter(is_valid=False).exists())
+
+        self.client.login(email="b@b.ru", password="secret")
+        statuses = [
+            self.client.post(self.url, {"text": text}).status_code
+            for text in ("Первый", "Второй")
+        ]
+        self.assertEqual(statuses, [302, 429])
+        self.assertTrue(Review.objects.filter(text="Первый").exists())
+        self.assertFalse(Review.objects.filter(text="Второй").exists())
@@ -4,22 +4,24 @@ from catalog.views import (
     CatalogListView,
     ComparisonView,
     ProductDetail,
+    ProductReviewsView,
     SalesDetailView,
     SalesListView,
+    SearchView,
     SellerDetailView,
     add_product_to_comparison,
     add_sale_product,
     clear_comparison,
-    review_add,
 )
 
 app_name = "catalog"
 
 urlpatterns = [
     path("products/<int:pk>/", ProductDetail.as_view(), name="product_detail"),
-    path("products/<int:pk>/reviews", review_add, name="review_add"),
+    path("products/<int:pk>/reviews", ProductReviewsView.as_view(), name="reviews"),
     path("<int:pk>/", CatalogListView.as_view(), name="catalog"),
     path("sales/", SalesListView.as_view(), name="sales"),
+    path("search/", SearchView.as_view(), name="search"),
     path("comparison/", ComparisonView.as_view(), name="comparison"),
     path("comparison/clear", clear_comparison, name="clear_comparison"),
     path(
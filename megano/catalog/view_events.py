@@ -0,0 +1,301 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from account.models import Profile
+from catalog.browsing_history import record_views
+from catalog.models import Product, ProductDailyViews, Stock
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+VIEW_EVENT_BATCH_SIZE = 1000
+FLUSH_LOCK_KEY = "view_events:flush_lock"
+FLUSH_LOCK_TIMEOUT = 60 * 5
+
+
+@dataclass(frozen=True)
+class ViewEventRecord:
+    """
+    Просмотр товара: товар, пользователь (None для гостя) и время в секундах
+    """
+
+    product_id: int
+    user_id: Optional[int]
+    timestamp: float
+
+    def encode(self) -> str:
+        return f"{self.product_id}:{self.user_id or 0}:{self.timestamp:.6f}"
+
+    @classmethod
+    def decode(cls, raw: str) -> "ViewEventRecord":
+        product_id, user_id, timestamp = raw.split(":")
+        return cls(int(product_id), int(user_id) or None, float(timestamp))
+
+    @property
+    def viewed_at(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp, tz=dt_timezone.utc)
+
+
+class ViewEventBuffer(ABC):
+    """
+    Буфер событий просмотра. push вызывается в запросе и стоит O(1),
+    read отдает пачку событий и маркер, ack по маркеру удаляет прочитанное
+    после успешной записи в базу
+    """
+
+    @abstractmethod
+    def push(self, event: ViewEventRecord) -> None:
+        ...
+
+    @abstractmethod
+    def read(self, limit: int) -> tuple[list[ViewEventRecord], Optional[object]]:
+        ...
+
+    @abstractmethod
+    def ack(self, token) -> None:
+        ...
+
+
+class CacheViewEventBuffer(ViewEventBuffer):
+    """
+    Буфер в кэше Django: события лежат в пронумерованных ячейках,
+    номер выдает атомарный cache.incr, курсор хранит последний
+    обработанный номер. Общим для процессов буфер становится при кэше
+    в Redis или memcached; с LocMemCache события видит только свой процесс
+    """
+
+    SEQ_KEY = "view_events:seq"
+    CURSOR_KEY = "view_events:cursor"
+
+    @staticmethod
+    def slot(number: int) -> str:
+        return f"view_events:{number}"
+
+    def push(self, event: ViewEventRecord) -> None:
+        try:
+            number = cache.incr(self.SEQ_KEY)
+        except ValueError:
+            cache.add(self.SEQ_KEY, 0, None)
+            number = cache.incr(self.SEQ_KEY)
+        cache.set(self.slot(number), event.encode(), settings.VIEW_EVENT_TTL)
+
+    def read(self, limit: int) -> tuple[list[ViewEventRecord], Optional[int]]:
+        cursor = cache.get(self.CURSOR_KEY, 0)
+        last = min(cache.get(self.SEQ_KEY, 0), cursor + limit)
+        if last <= cursor:
+            return [], None
+        slots = [self.slot(number) for number in range(cursor + 1, last + 1)]
+        found = cache.get_many(slots)
+        # ячейка могла истечь или быть вытеснена, такие события теряются
+        events = [
+            ViewEventRecord.decode(found[slot]) for slot in slots if slot in found
+        ]
+        return events, last
+
+    def ack(self, token: int) -> None:
+        cursor = cache.get(self.CURSOR_KEY, 0)
+        cache.set(self.CURSOR_KEY, token, None)
+        cache.delete_many(
+            [self.slot(number) for number in range(cursor + 1, token + 1)]
+        )
+
+
+class RedisViewEventBuffer(ViewEventBuffer):
+    """
+    Буфер в потоке Redis: XADD с ограничением длины в запросе,
+    XRANGE и XDEL при сбросе. Поток общий для всех процессов
+    """
+
+    STREAM_KEY = "view_events"
+    _client = None
+
+    @classmethod
+    def client(cls):
+        if cls._client is None:
+            import redis
+
+            cls._client = redis.Redis.from_url(
+                settings.VIEW_EVENT_REDIS_URL, decode_responses=True
+            )
+        return cls._client
+
+    def push(self, event: ViewEventRecord) -> None:
+        self.client().xadd(
+            self.STREAM_KEY,
+            {"e": event.encode()},
+            maxlen=settings.VIEW_EVENT_STREAM_MAXLEN,
+            approximate=True,
+        )
+
+    def read(self, limit: int) -> tuple[list[ViewEventRecord], Optional[list]]:
+        entries = self.client().xrange(self.STREAM_KEY, count=limit)
+        if not entries:
+            return [], None
+        events = [ViewEventRecord.decode(fields["e"]) for _, fields in entries]
+        return events, [entry_id for entry_id, _ in entries]
+
+    def ack(self, token: list) -> None:
+        self.client().xdel(self.STREAM_KEY, *token)
+
+
+def get_view_event_buffer() -> ViewEventBuffer:
+    """
+    Буфер событий, выбранный в настройке VIEW_EVENT_BUFFER
+    """
+    return import_string(settings.VIEW_EVENT_BUFFER)()
+
+
+def record_product_view(request, product_id: int) -> None:
+    """
+    Учет просмотра страницы товара: только запись в буфер, без запросов к базе.
+    Недоступный буфер не ломает страницу товара: событие теряется
+    """
+    user = request.user
+    try:
+        get_view_event_buffer().push(
+            ViewEventRecord(
+                product_id=product_id,
+                user_id=user.pk if user.is_authenticated else None,
+                timestamp=time.time(),
+            )
+        )
+    except Exception:
+        logger.exception("View event for product %s was dropped", product_id)
+        metrics.view_events.labels(stage="dropped").inc()
+        return
+    metrics.view_events.labels(stage="buffered").inc()
+
+
+def _add_daily_views(counts: Counter) -> None:
+    """
+    Прибавление просмотров к счетчикам (товар, день): существующие строки
+    читаются одним запросом и обновляются bulk_update, новые создаются
+    """
+    existing = {
+        (row.product_id, row.day): row
+        for row in ProductDailyViews.objects.select_for_update().filter(
+            product_id__in={product_id for product_id, _ in counts},
+            day__in={day for _, day in counts},
+        )
+    }
+    created, updated = [], []
+    for key, views in counts.items():
+        row = existing.get(key)
+        if row is None:
+            created.append(
+                ProductDailyViews(product_id=key[0], day=key[1], views=views)
+            )
+        else:
+            row.views += views
+            updated.append(row)
+    ProductDailyViews.objects.bulk_update(updated, ["views"])
+    ProductDailyViews.objects.bulk_create(created)
+
+
+def apply_view_events(events: list[ViewEventRecord]) -> None:
+    """
+    Запись пачки событий: счетчики просмотров по дням и история
+    просмотров авторизованных пользователей
+    """
+    product_ids = set(
+        Product.objects.filter(
+            pk__in={event.product_id for event in events}
+        ).values_list("pk", flat=True)
+    )
+    events = sorted(
+        (event for event in events if event.product_id in product_ids),
+        key=lambda event: event.timestamp,
+    )
+    if not events:
+        return
+
+    counts = Counter(
+        (event.product_id, timezone.localdate(event.viewed_at)) for event in events
+    )
+    profiles = dict(
+        Profile.objects.filter(
+            user_id__in={event.user_id for event in events if event.user_id}
+        ).values_list("user_id", "pk")
+    )
+    history = defaultdict(list)
+    for event in events:
+        if event.user_id in profiles:
+            history[profiles[event.user_id]].append(event)
+
+    with transaction.atomic():
+        _add_daily_views(counts)
+        for profile_id, profile_events in history.items():
+            record_views(
+                profile_id,
+                [event.product_id for event in profile_events],
+                viewed_at=profile_events[-1].viewed_at,
+            )
+
+
+def flush_view_events(batch_size: int = VIEW_EVENT_BATCH_SIZE) -> int:
+    """
+    Перенос событий из буфера в базу пачками по batch_size.
+    Одновременно работает только один сброс.
+    Возвращает количество записанных событий
+    """
+    if not cache.add(FLUSH_LOCK_KEY, 1, FLUSH_LOCK_TIMEOUT):
+        return 0
+    buffer = get_view_event_buffer()
+    flushed = 0
+    try:
+        while True:
+            events, token = buffer.read(batch_size)
+            if token is None:
+                break
+            apply_view_events(events)
+            buffer.ack(token)
+            flushed += len(events)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+    metrics.view_events.labels(stage="flushed").inc(flushed)
+    return flushed
+
+
+def recent_views(product_ids: Iterable[int], days: int) -> dict[int, int]:
+    """
+    Просмотры товаров за последние days дней
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return dict(
+        ProductDailyViews.objects.filter(product_id__in=product_ids, day__gte=since)
+        .values("product_id")
+        .annotate(total=Sum("views"))
+        .values_list("product_id", "total")
+    )
+
+
+def seller_daily_views(seller_id: int, days: int = 30) -> list[tuple[date, int]]:
+    """
+    Просмотры товаров продавца по дням за последние days дней
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return list(
+        ProductDailyViews.objects.filter(
+            product_id__in=Stock.objects.filter(seller_id=seller_id).values(
+                "product_id"
+            ),
+            day__gte=since,
+        )
+        .values("day")
+        .annotate(total=Sum("views"))
+        .order_by("day")
+        .values_list("day", "total")
+    )
@@ -1,159 +1,427 @@
-from django.core.cache import cache
-from django.db.models import Max, Min, Sum
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum, TextField
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.translation import gettext as _
 from django.views.decorators.http import require_POST
 from django.views.generic import DetailView, ListView, View
 
 from cart.cart import Cart
 from catalog.forms import ComparisonForm, ReviewForm
-from catalog.models import Product, Review, Seller, Stock
-from core.models import SiteSettings
-from megano import settings
+from catalog.models import Product, ProductSummary, Review, Seller, Stock
+from core.conditional import ConditionalGetMixin
 
 from .browsing_history import BrowsingHistory
+from .category_tree import get_category_tree
+from .facets import MULTI_FACETS, get_facet_index
+from .listing_cache import (
+    OffsetPageSnapshot,
+    ProductCard,
+    get_category_version,
+    get_or_build_listing,
+    get_sales_version,
+    get_seller_version,
+)
 from .models import SaleProduct
+from .pagination import CURSOR_PARAM, KeysetPaginationMixin, keyset_order_by
+from .product_page import get_product_page
+from .ranking import top_products
+from .reviews import review_feed, review_throttled, serialize_review
+from .search import search_products
 from .services import ComparedProducts
 from .utils import generate_sort_param, matched_items_for_comparison_view, sort_convert
+from .view_events import record_product_view
 
 
-class ProductDetail(DetailView):
+class ProductDetail(ConditionalGetMixin, DetailView):
+    """
+    Страница товара: общая для всех часть берется из кэшированной
+    ProductPage, поверх нее добавляются данные пользователя
+    """
+
     model = Product
     context_object_name = "product"
     template_name = "product_detail.html"
 
+    def get_object(self, queryset=None):
+        if getattr(self, "page", None) is None:
+            self.page = get_product_page(self.kwargs["pk"])
+            if self.page is None:
+                raise Http404
+        return self.page.product
+
+    def in_comparison_list(self) -> bool:
+        return ComparedProducts(self.request).is_product_in_list(self.kwargs["pk"])
+
+    def get_etag_parts(self) -> list:
+        self.get_object()
+        return [self.page.product.pk, self.page.built_at, self.in_comparison_list()]
+
+    def get_last_modified(self):
+        self.get_object()
+        return self.page.built_at
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product_id = str(self.get_object().id)
-        images = context["product"].image.all()
+        page = self.page
+        context.update(
+            {
+                "images": page.images,
+                "tags": page.tags,
+                "stocks": page.stocks,
+                "best_offer": page.best_offer,
+                "price": page.price,
+                "reviews": page.reviews,
+                "reviews_next_cursor": page.reviews_next_cursor,
+                "review_count": page.review_count,
+                "rating_avg": page.rating_avg,
+            }
+        )
         context["viewed"] = True
-        context["in_comparison_list"] = ComparedProducts(
-            self.request
-        ).is_product_in_list(product_id)
-        context["stocks"] = context["product"].stocks.all()
-        if context["stocks"]:
-            context["price"] = context["product"].stocks.aggregate(Min("price"))[
-                "price__min"
-            ]
-            context["price_id"] = (
-                context["product"].stocks.filter(price=context["price"]).first().pk
-            )
-        else:
-            context["price_id"] = 1
-        context["images"] = images
-        context["reviews"] = context["product"].reviews.filter(is_valid=True)
+        context["in_comparison_list"] = self.in_comparison_list()
         context["review_form"] = ReviewForm()
         return context
 
     def get(self, request, *args, **kwargs):
-        history = BrowsingHistory(request)
-        self.object = self.get_object()
-        history.add(product_id=self.object.id)
-        context = self.get_context_data(object=self.object)
-        return self.render_to_response(context)
-
+        # история и счетчики просмотров пополняются и при ответе 304
+        product_id = self.get_object().pk
+        BrowsingHistory(request).add(product_id=product_id)
+        record_product_view(request, product_id)
+        return super().get(request, *args, **kwargs)
+
+
+class ProductReviewsView(View):
+    """
+    Лента проверенных отзывов товара в JSON с курсором ?cursor=
+    и добавление отзыва
+    """
+
+    def get(self, request, pk, *args, **kwargs):
+        if not Product.objects.filter(pk=pk).exists():
+            raise Http404
+        page = review_feed(pk, request.GET.get(CURSOR_PARAM))
+        next_url = None
+        if page.next_cursor:
+            next_url = f"{request.path}?{urlencode({CURSOR_PARAM: page.next_cursor})}"
+        return JsonResponse(
+            {
+                "results": [serialize_review(review) for review in page],
+                "next_cursor": page.next_cursor or None,
+                "next": next_url,
+            }
+        )
 
-@require_POST
-def review_add(request, pk):
-    form = ReviewForm(request.POST)
-    if form.is_valid():
-        text = form.cleaned_data["text"]
-        product = get_object_or_404(Product, id=pk)
-        profile = request.user.profile
-        Review.objects.create(text=text, product=product, profile=profile)
-    return redirect("catalog:product_detail", pk=pk)
+    def post(self, request, pk, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect("account:login")
+        form = ReviewForm(request.POST)
+        if form.is_valid():
+            product = get_object_or_404(Product, id=pk)
+            profile = request.user.profile
+            if review_throttled(profile.pk):
+                return HttpResponse(
+                    _("Отзыв можно оставлять не чаще раза в %(seconds)s сек.")
+                    % {"seconds": settings.REVIEW_THROTTLE_SECONDS},
+                    status=429,
+                    headers={"Retry-After": str(settings.REVIEW_THROTTLE_SECONDS)},
+                )
+            # отзыв и агрегаты товара сохраняются вместе
+            with transaction.atomic():
+                Review.objects.create(
+                    text=form.cleaned_data["text"], product=product, profile=profile
+                )
+        return redirect("catalog:product_detail", pk=pk)
 
 
-class CatalogListView(ListView):
+class CatalogListView(ConditionalGetMixin, KeysetPaginationMixin, ListView):
     template_name = "catalog.html"
     paginate_by = 6
     model = Product
     context_object_name = "products"
+    filter_params = (
+        "seller",
+        "price",
+        "title",
+        "havecheck",
+        "freecheck",
+        "tag",
+        "price_bucket",
+        "char",
+    )
+    facet_in_limit = 20000
+    sort_fields = {
+        "price": "summary__min_price",
+        "rating": "summary__rating",
+        "date": "summary__last_stock_date",
+        "quantity": "summary__max_quantity",
+    }
+    keyset_tiebreaker = "summary__product_id"
+
+    def get_etag_parts(self) -> list:
+        category_id = self.kwargs.get("pk")
+        return [category_id, get_category_version(category_id)]
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data()
         return {**context, **self.get_param()}
 
-    def sort_queryset(self, queryset, sort):
-        sort_convert(self.request.session, sort)
-        return queryset.order_by(sort)
-
-    def get_last_sort(self, session):
-        for k, v in session["sort_catalog"].items():
-            if v["style"]:
-                return v["param"]
+    def get_sort(self):
+        """
+        Сортировка только из адреса: форма фильтров отправляется на тот же
+        адрес, поэтому сортировка сохраняется и без сессии, а страница
+        не зависит от состояния посетителя
+        """
+        sort = self.request.GET.get("sort", "")
+        if sort.lstrip("-") in generate_sort_param():
+            return sort
+        return ""
+
+    def get_sort_field(self) -> str:
+        """
+        Столбец сводки для текущей сортировки со знаком направления.
+        Сортировка идет прямо по столбцам сводки с summary__product_id
+        в конце, чтобы ORDER BY читался из индекса сводки
+        """
+        sort = self.get_sort()
+        if not sort:
+            return "summary__product_id"
+        field = self.sort_fields[sort.lstrip("-")]
+        return f"-{field}" if sort.startswith("-") else field
+
+    def get_keyset_ordering(self):
+        return self.get_sort_field()
+
+    def get_filters(self) -> dict:
+        """
+        Нормализованный набор фильтров из формы (только заполненные поля,
+        значения фасетов с множественным выбором отсортированы)
+        """
+        if hasattr(self, "_filters"):
+            return self._filters
+        data = self.request.POST if self.request.method == "POST" else self.request.GET
+        filters = {}
+        for param in self.filter_params:
+            values = sorted({value.strip() for value in data.getlist(param)} - {""})
+            if values:
+                filters[param] = values if param in MULTI_FACETS else values[0]
+        self._filters = filters
+        return filters
+
+    def filter_queryset(self, queryset, filters: dict):
+        if "title" in filters:
+            queryset = queryset.filter(name=filters["title"])
+        matched = get_facet_index(self.kwargs.get("pk")).match(filters)
+        if matched is None:
+            return queryset
+        if len(matched) <= self.facet_in_limit:
+            return queryset.filter(pk__in=sorted(matched))
+        return self.sql_filter_queryset(queryset, filters)
+
+    def sql_filter_queryset(self, queryset, filters: dict):
+        """
+        Фильтрация средствами БД для неселективных фильтров,
+        когда список идентификаторов из индекса фасетов слишком велик
+        """
+        if "seller" in filters:
+            queryset = queryset.filter(stocks__seller_id__in=filters["seller"])
+        if "tag" in filters:
+            queryset = queryset.filter(tag__id__in=filters["tag"])
+        if "char" in filters:
+            queryset = self.filter_characteristics(queryset, filters["char"])
+        if "price_bucket" in filters:
+            condition = Q()
+            for bucket in filters["price_bucket"]:
+                lower, _, upper = bucket.partition("-")
+                try:
+                    bounds = {"summary__min_price__gte": int(lower)}
+                    if upper:
+                        bounds["summary__min_price__lt"] = int(upper)
+                except ValueError:
+                    continue
+                condition |= Q(**bounds)
+            queryset = queryset.filter(condition)
+        if "price" in filters:
+            try:
+                price_min, price_max = filters["price"].split(";")
+                queryset = queryset.filter(
+                    summary__min_price__range=[Decimal(price_min), Decimal(price_max)]
+                )
+            except (ValueError, ArithmeticError):
+                pass
+        if "havecheck" in filters:
+            queryset = queryset.filter(summary__total_quantity__gt=0)
+        if "freecheck" in filters:
+            queryset = queryset.filter(summary__free_shipping=True)
+        return queryset.distinct()
+
+    def filter_characteristics(self, queryset, selected: list):
+        """
+        Фильтр по характеристикам: принимаются только пары ключ=значение
+        из индекса фасетов категории, ключ сравнивается целиком, без разбора
+        на пути и lookup'ы JSON. Выбранные значения объединяются через ИЛИ,
+        как и в индексе фасетов
+        """
+        known = get_facet_index(self.kwargs.get("pk")).facets.get("char", {})
+        condition = Q()
+        for number, selected_value in enumerate(v for v in selected if v in known):
+            key, _, value = selected_value.partition("=")
+            alias = f"char_{number}"
+            queryset = queryset.alias(
+                **{alias: Cast(KeyTextTransform(key, "characteristics"), TextField())}
+            )
+            condition |= Q(**{alias: value})
+        if not condition:
+            return queryset.none()
+        return queryset.filter(condition)
 
     def get_param(self):
         context = {}
-        context["sellers"] = Seller.objects.all()
-        if "sort_catalog" not in self.request.session:
-            self.request.session["sort_catalog"] = generate_sort_param()
-        context["sort"] = self.request.session["sort_catalog"]
+        sort = self.get_sort()
+        context["sort"] = sort_convert(sort) if sort else generate_sort_param()
         context["category_id"] = self.kwargs.get("pk")
+        context["breadcrumbs"] = get_category_tree().breadcrumbs(context["category_id"])
+        context["filters"] = self.get_filters()
+        context["facets"] = get_facet_index(self.kwargs.get("pk")).counts(
+            context["filters"]
+        )
+        context["top_products"] = top_products(4, context["category_id"])
+        context["sort_query"] = f"sort={sort}&" if sort else ""
         return context
 
     def get_queryset(self):
         category_id = self.kwargs.get("pk")
-        cache_key = settings.PRODUCT_CACHE_KEY.format(category_id=category_id)
-        queryset = cache.get(cache_key)
-        if not queryset:
-            queryset = (
-                super(CatalogListView, self)
-                .get_queryset()
-                .filter(category__id=category_id, active=True)
-                .annotate(
-                    price=Min("stocks__price"),
-                    quantity=Max("stocks__quantity"),
-                    rating=Max("reviews__rating"),
-                    date=Max("stocks__create_date"),
-                )
+        queryset = (
+            super(CatalogListView, self)
+            .get_queryset()
+            .filter(
+                get_category_tree().subtree_q(category_id, "summary__"),
+                summary__active=True,
+            )
+            .select_related("avatar", "category", "summary")
+            .annotate(
+                price=F("summary__min_price"),
+                quantity=F("summary__max_quantity"),
+                rating=F("summary__rating"),
+                date=F("summary__last_stock_date"),
             )
-        settings_cache = SiteSettings.objects.get()
-        cache.set(cache_key, queryset, settings_cache.cache_time)
+        )
+        queryset = self.filter_queryset(queryset, self.get_filters())
+
+        ordering = self.get_sort_field()
+        name = ordering.lstrip("-")
+        nullable = ProductSummary._meta.get_field(name.split("__")[1]).null
+        return queryset.order_by(
+            *keyset_order_by(
+                name, ordering.startswith("-"), nullable, self.keyset_tiebreaker
+            )
+        )
 
-        sort = self.request.GET.get("sort")
-        if sort:
-            sort_convert(self.request.session, sort)
-            queryset = self.sort_queryset(queryset, sort)
-        return queryset
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Страница списка с материализованными карточками товаров,
+        кэшируемая по категории, сортировке, фильтрам и странице
+        """
+
+        def build():
+            paginator, page, object_list, is_paginated = super(
+                CatalogListView, self
+            ).paginate_queryset(queryset, page_size)
+            cards = [ProductCard.from_product(product) for product in object_list]
+            if paginator is None:
+                page.object_list = cards
+                return None, page, cards, is_paginated
+            snapshot = OffsetPageSnapshot.from_page(paginator, page, cards)
+            return snapshot, snapshot, cards, is_paginated
+
+        if self.use_keyset_pagination():
+            position = "cursor:" + self.request.GET.get(CURSOR_PARAM, "")
+        else:
+            position = "page:" + str(
+                self.kwargs.get(self.page_kwarg)
+                or self.request.GET.get(self.page_kwarg)
+                or 1
+            )
+        return get_or_build_listing(
+            self.kwargs.get("pk"),
+            self.get_sort(),
+            self.get_filters(),
+            position,
+            build,
+        )
 
     def post(self, request, *args, **kwargs):
-        last_sort = self.get_last_sort(self.request.session)
-        seller = request.POST.get("seller")
-        have_check = request.POST.get("havecheck")
-        free_shipping = request.POST.get("freecheck")
-        price = request.POST.get("price")
-        title = request.POST.get("title")
-
-        products = self.get_queryset()
-        # Далее фильтр по полученным параметрам
-        if seller:
-            products = products.filter(product__seller__name=seller)
-        if price:
-            price_min, price_max = price.split(";")
-            products = products.filter(price__range=[price_min, price_max])
-        if title:
-            products = products.filter(name=title)
-        if have_check:
-            products = products.filter(active=True)
-        if free_shipping:
-            products = products.filter(product__free_shipping=True)
-        if last_sort:
-            products.order_by(last_sort)
-        context = self.get_param()
-        context["products"] = products
+        return self.get(request, *args, **kwargs)
+
+
+class SearchView(View):
+    """
+    Полнотекстовый поиск товаров с ранжированием по релевантности
+    """
+
+    template_name = "search.html"
+    paginate_by = 12
+    max_page = 100
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get("query", "").strip()[:200]
+        try:
+            category_id = int(request.GET["category"])
+        except (KeyError, ValueError):
+            category_id = None
+        try:
+            page = max(1, min(int(request.GET.get("page", 1)), self.max_page))
+        except ValueError:
+            page = 1
+
+        product_ids = search_products(
+            query,
+            category_id,
+            limit=self.paginate_by + 1,
+            offset=(page - 1) * self.paginate_by,
+        )
+        has_next = len(product_ids) > self.paginate_by
+        product_ids = product_ids[: self.paginate_by]
+        products = (
+            Product.objects.select_related("avatar", "category", "summary")
+            .annotate(price=F("summary__min_price"))
+            .in_bulk(product_ids)
+        )
+        params = {"query": query}
+        if category_id:
+            params["category"] = category_id
         return render(
             request,
             self.template_name,
-            context,
+            {
+                "query": query,
+                "products": [
+                    ProductCard.from_product(products[pk])
+                    for pk in product_ids
+                    if pk in products
+                ],
+                "page": page,
+                "has_next": has_next and page < self.max_page,
+                "search_query": urlencode(params) + "&",
+            },
         )
 
 
-class SalesListView(ListView):
+class SalesListView(ConditionalGetMixin, KeysetPaginationMixin, ListView):
     template_name = "sales.html"
     paginate_by = 12
     model = SaleProduct
+    ordering = "pk"
     context_object_name = "sales"
 
+    def get_etag_parts(self) -> list:
+        return [get_sales_version()]
+
 
 @require_POST
 def add_product_to_comparison(request):
@@ -172,58 +440,40 @@ def clear_comparison(request):
 
 
 class ComparisonView(View):
-    def get(self, request, *args, **kwargs):
+    def render_comparison(self, request, flag: bool):
         comparison_list = ComparedProducts(request)
         matched_items, flag_not_matching = matched_items_for_comparison_view(
             comparison_list
         )
-
         return render(
             request,
             "comparison.html",
             {
-                "comparison_list": comparison_list,
+                # товары уже загружены при поиске совпадений, повторного
+                # запроса при выводе не будет
+                "comparison_list": list(comparison_list),
                 "matched_items": matched_items,
                 "flag_not_matching": flag_not_matching,
-                "flag": True,
+                "flag": flag,
             },
         )
 
+    def get(self, request, *args, **kwargs):
+        return self.render_comparison(request, flag=True)
+
     def post(self, request, *args, **kwargs):
-        comparison_list = ComparedProducts(request)
-        matched_items, flag_not_matching = matched_items_for_comparison_view(
-            comparison_list
-        )
         form = ComparisonForm(request.POST)
-        if form.is_valid():
-            return render(
-                request,
-                "comparison.html",
-                {
-                    "comparison_list": comparison_list,
-                    "matched_items": matched_items,
-                    "flag_not_matching": flag_not_matching,
-                    "flag": True,
-                },
-            )
-
-        return render(
-            request,
-            "comparison.html",
-            {
-                "comparison_list": comparison_list,
-                "matched_items": matched_items,
-                "flag_not_matching": flag_not_matching,
-                "flag": False,
-            },
-        )
+        return self.render_comparison(request, flag=form.is_valid())
 
 
-class SellerDetailView(DetailView):
+class SellerDetailView(ConditionalGetMixin, DetailView):
     model = Seller
     context_object_name = "seller"
     template_name = "seller_detail.html"
 
+    def get_etag_parts(self) -> list:
+        return [self.kwargs["pk"], get_seller_version(self.kwargs["pk"])]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         seller = context["seller"]
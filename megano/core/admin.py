@@ -2,7 +2,12 @@ from django.contrib.admin import ModelAdmin, action, register
 from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 
-from .models import DeliverySettings, SiteSettings
+from .models import (
+    DeliverySettings,
+    SiteSettings,
+    delivery_settings_snapshot,
+    site_settings_snapshot,
+)
 
 
 @register(SiteSettings)
@@ -12,6 +17,8 @@ class SiteSettingsAdmin(ModelAdmin):
     @action(description="Очистить кэш")
     def clear_cache(self, *args, **kwargs):
         cache.clear()
+        site_settings_snapshot.invalidate()
+        delivery_settings_snapshot.invalidate()
 
     @action(description="Загрузить настройки")
     def load_config(self, *args, **kwargs):
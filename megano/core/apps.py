@@ -6,3 +6,8 @@ class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
     verbose_name = _("Основные настройки")
+
+    def ready(self):
+        from core.metrics import connect_celery_signals
+
+        connect_celery_signals()
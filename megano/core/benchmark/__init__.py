@@ -0,0 +1,5 @@
+from core.benchmark import scenarios  # noqa: F401 регистрация сценариев
+from core.benchmark.compare import compare_results
+from core.benchmark.harness import Case, Runner, scenario
+
+__all__ = ["Case", "Runner", "compare_results", "scenario"]
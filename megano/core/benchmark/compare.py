@@ -0,0 +1,30 @@
+def compare_results(
+    baseline: dict, current: dict, threshold: float = 0.2
+) -> list[dict]:
+    """
+    Сравнение прогона с базовым: изменение p50, p95, числа запросов
+    и пика памяти по каждому общему сценарию. Регрессия - рост p50
+    больше чем на threshold или любое увеличение числа запросов
+    """
+    rows = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        p50 = result["latency_ms"]["p50"]
+        base_p50 = base["latency_ms"]["p50"]
+        queries = result["queries"]["median"]
+        base_queries = base["queries"]["median"]
+        change = (p50 - base_p50) / base_p50 if base_p50 else 0.0
+        rows.append(
+            {
+                "name": name,
+                "p50_ms": (base_p50, p50),
+                "p95_ms": (base["latency_ms"]["p95"], result["latency_ms"]["p95"]),
+                "queries": (base_queries, queries),
+                "alloc_peak_kib": (base["alloc_peak_kib"], result["alloc_peak_kib"]),
+                "p50_change": round(change, 3),
+                "regression": change > threshold or queries > base_queries,
+            }
+        )
+    return rows
@@ -0,0 +1,134 @@
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+
+from core.query_budget import QueryCollector
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+@dataclass
+class Case:
+    """
+    Один измеряемый запрос сценария
+    """
+
+    name: str
+    url: str
+    method: str = "get"
+    data: dict = field(default_factory=dict)
+    extra: dict = field(default_factory=dict)
+
+
+Scenario = Callable[[Client], Iterator[Case]]
+scenarios: dict[str, Scenario] = {}
+
+
+def scenario(name: str) -> Callable[[Scenario], Scenario]:
+    """
+    Регистрация сценария: генератор, который готовит данные через клиент
+    и отдает запросы для замера. Подготовка между yield не замеряется
+    """
+
+    def decorator(func: Scenario) -> Scenario:
+        scenarios[name] = func
+        return func
+
+    return decorator
+
+
+def percentile(values: list[float], q: int) -> float:
+    """
+    Перцентиль по методу ближайшего ранга
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-q * len(ordered) // 100))
+    return ordered[rank - 1]
+
+
+def benchmark_host() -> str:
+    hosts = [host.lstrip(".") for host in settings.ALLOWED_HOSTS if host]
+    return next((host for host in hosts if "*" not in host), "localhost")
+
+
+class Runner(object):
+    """
+    Прогон сценариев через тестовый клиент Django со всеми middleware.
+    Каждый сценарий выполняется в транзакции, которая откатывается,
+    а каждый замер - в точке сохранения, поэтому набор данных не меняется
+    """
+
+    def __init__(self, repeat: int = 20, warmup: int = 2, cold: bool = False):
+        self.repeat = repeat
+        self.warmup = warmup
+        self.cold = cold
+
+    def _request(self, client: Client, case: Case) -> tuple[float, QueryCollector]:
+        collector = QueryCollector()
+        if self.cold:
+            cache.clear()
+        with transaction.atomic():
+            with connection.execute_wrapper(collector):
+                start = time.perf_counter()
+                response = getattr(client, case.method)(
+                    case.url, case.data, **case.extra
+                )
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{case.name}: {case.url} -> {response.status_code}")
+        return elapsed, collector
+
+    def measure(self, client: Client, case: Case) -> dict:
+        for _ in range(self.warmup):
+            self._request(client, case)
+        timings, queries, db_times = [], [], []
+        for _ in range(self.repeat):
+            elapsed, collector = self._request(client, case)
+            timings.append(elapsed * 1000)
+            queries.append(collector.count)
+            db_times.append(collector.duration * 1000)
+
+        tracemalloc.start()
+        try:
+            self._request(client, case)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        latency = {f"p{q}": round(percentile(timings, q), 3) for q in PERCENTILES}
+        latency["mean"] = round(statistics.fmean(timings), 3)
+        latency["max"] = round(max(timings), 3)
+        return {
+            "url": case.url,
+            "method": case.method.upper(),
+            "latency_ms": latency,
+            "db_ms": round(statistics.median(db_times), 3),
+            "queries": {
+                "min": min(queries),
+                "median": statistics.median(queries),
+                "max": max(queries),
+            },
+            "alloc_peak_kib": round(peak / 1024, 1),
+        }
+
+    def run(self, only: Optional[list[str]] = None, report=None) -> dict:
+        results = {}
+        for name, func in scenarios.items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            with transaction.atomic():
+                client = Client(HTTP_HOST=benchmark_host())
+                for case in func(client):
+                    results[case.name] = self.measure(client, case)
+                    if report:
+                        report(case.name, results[case.name])
+                transaction.set_rollback(True)
+        return results
@@ -0,0 +1,165 @@
+from dataclasses import dataclass
+from typing import Iterator
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.test import Client
+from django.urls import resolve, reverse
+
+from account.models import Profile
+from catalog.category_tree import get_category_tree
+from catalog.models import Product, ProductSummary, Stock
+from catalog.utils import generate_sort_param
+from core.benchmark.harness import Case, scenario
+
+CART_SIZES = (1, 10, 50)
+REFERER = {"HTTP_REFERER": "/"}
+ORDER_FORM = {
+    "delivery_method": "DELIVERY",
+    "city": "Москва",
+    "address": "Тверская, 1",
+    "payment_method": "CARD",
+    "comment": "",
+}
+
+
+class DatasetError(Exception):
+    """
+    В базе недостаточно данных для сценариев
+    """
+
+
+@dataclass
+class Dataset:
+    """
+    Объекты сгенерированного набора данных, на которых идут замеры
+    """
+
+    category_id: int
+    product_ids: list[int]
+    stock_ids: list[int]
+    seller_id: int
+    tag_id: int
+
+    @classmethod
+    def load(cls) -> "Dataset":
+        tree = get_category_tree()
+        summaries = ProductSummary.objects.filter(active=True, best_stock__isnull=False)
+        by_category = (
+            summaries.values("category_id")
+            .annotate(products=Count("pk"))
+            .order_by("-products")
+            .first()
+        )
+        if by_category is None:
+            raise DatasetError("No active products with stocks, run generate_catalog")
+        ancestors = tree.ancestors(by_category["category_id"])
+        category_id = ancestors[0].id if ancestors else by_category["category_id"]
+        rows = list(
+            summaries.order_by("-score", "pk").values_list(
+                "product_id", "best_stock_id"
+            )[: max(CART_SIZES)]
+        )
+        stock = Stock.objects.filter(pk=rows[0][1]).values("seller_id").first()
+        tag = Product.tag.through.objects.values_list("tag_id", flat=True).first()
+        return cls(
+            category_id=category_id,
+            product_ids=[product_id for product_id, _ in rows],
+            stock_ids=[stock_id for _, stock_id in rows],
+            seller_id=stock["seller_id"],
+            tag_id=tag or 0,
+        )
+
+
+def fill_cart(client: Client, stock_ids: list[int]) -> None:
+    for stock_id in stock_ids:
+        client.post(reverse("cart:add_to_cart"), {"stock_id": stock_id}, **REFERER)
+
+
+def login_buyer(client: Client) -> None:
+    user = get_user_model().objects.create_user(
+        username="benchmark", email="benchmark@example.com", password="benchmark"
+    )
+    Profile.objects.create(user=user)
+    client.force_login(user)
+
+
+@scenario("home")
+def home(client: Client) -> Iterator[Case]:
+    yield Case("home", reverse("core:index"))
+
+
+@scenario("catalog")
+def catalog(client: Client) -> Iterator[Case]:
+    data = Dataset.load()
+    url = reverse("catalog:catalog", args=[data.category_id])
+    yield Case("catalog", url)
+    for sort in generate_sort_param():
+        yield Case(f"catalog:sort={sort}", url, data={"sort": sort})
+        yield Case(f"catalog:sort=-{sort}", url, data={"sort": f"-{sort}"})
+    filters = {
+        "price": {"price": "1000;50000"},
+        "havecheck": {"havecheck": "on"},
+        "freecheck": {"freecheck": "on"},
+        "seller": {"seller": data.seller_id},
+        "tag": {"tag": data.tag_id},
+        "price_bucket": {"price_bucket": "1000-5000"},
+    }
+    for name, params in filters.items():
+        yield Case(f"catalog:filter={name}", url, data=params)
+    yield Case(
+        "catalog:filter=combined",
+        url,
+        data={"havecheck": "on", "seller": data.seller_id, "sort": "price"},
+    )
+
+
+@scenario("product_detail")
+def product_detail(client: Client) -> Iterator[Case]:
+    product_id = Dataset.load().product_ids[0]
+    yield Case("product_detail", reverse("catalog:product_detail", args=[product_id]))
+
+
+@scenario("comparison")
+def comparison(client: Client) -> Iterator[Case]:
+    for product_id in Dataset.load().product_ids[:4]:
+        client.post(
+            reverse("catalog:add_product_to_comparison"),
+            {"product_id": product_id},
+            **REFERER,
+        )
+    yield Case("comparison:4", reverse("catalog:comparison"))
+
+
+@scenario("cart")
+def cart(client: Client) -> Iterator[Case]:
+    stock_ids = Dataset.load().stock_ids
+    filled = 0
+    for size in CART_SIZES:
+        fill_cart(client, stock_ids[filled:size])
+        filled = size
+        yield Case(f"cart:{size}", reverse("cart:cart_details"))
+    yield Case(
+        "cart:add",
+        reverse("cart:add_to_cart"),
+        method="post",
+        data={"stock_id": stock_ids[0]},
+        extra=REFERER,
+    )
+
+
+@scenario("ordering")
+def ordering(client: Client) -> Iterator[Case]:
+    login_buyer(client)
+    fill_cart(client, Dataset.load().stock_ids[:10])
+    url = reverse("order:ordering")
+    yield Case("ordering", url)
+    yield Case("ordering:submit", url, method="post", data=ORDER_FORM)
+
+    order_url = client.post(url, ORDER_FORM).url
+    yield Case(
+        "payment:submit",
+        reverse("order:payment", args=[resolve(order_url).kwargs["pk"]]),
+        method="post",
+        data={"card_number": "1234 5678"},
+    )
@@ -0,0 +1,50 @@
+from threading import Lock
+
+from core import metrics
+
+
+class CacheStats(object):
+    """
+    Счетчики попаданий и промахов логического кэша (в пределах процесса)
+    """
+
+    _registry: dict[str, "CacheStats"] = {}
+    _lock = Lock()
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._hit_counter = metrics.cache_requests.labels(name, "hit")
+        self._miss_counter = metrics.cache_requests.labels(name, "miss")
+
+    @classmethod
+    def get(cls, name: str) -> "CacheStats":
+        with cls._lock:
+            if name not in cls._registry:
+                cls._registry[name] = cls(name)
+            return cls._registry[name]
+
+    @classmethod
+    def all(cls) -> dict[str, dict]:
+        return {name: stats.as_dict() for name, stats in cls._registry.items()}
+
+    def hit(self):
+        self.hits += 1
+        self._hit_counter.inc()
+
+    def miss(self):
+        self.misses += 1
+        self._miss_counter.inc()
+
+    @property
+    def ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "ratio": self.ratio}
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,64 @@
+from datetime import datetime
+from hashlib import md5
+from typing import Optional
+
+from django.middleware.csrf import get_token
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+from catalog.category_tree import category_tree_snapshot, get_category_tree
+
+
+class ConditionalGetMixin(object):
+    """
+    Условный GET для страниц каталога: ETag и Last-Modified считаются
+    из дешевых версий данных, при совпадении отдается 304 без рендеринга.
+    Страницы содержат шапку пользователя и формы с CSRF-токеном, поэтому
+    в ETag входят пользователь и секрет CSRF (он меняется при входе),
+    а ответ можно хранить только в кэше браузера
+    """
+
+    def get_etag_parts(self) -> list:
+        return []
+
+    def get_last_modified(self) -> Optional[datetime]:
+        return None
+
+    def get_etag(self) -> str:
+        get_category_tree()
+        # get_token выставляет cookie и для нового посетителя, поэтому
+        # следующий запрос придет с тем же секретом
+        get_token(self.request)
+        parts = [
+            self.request.resolver_match.view_name,
+            get_language(),
+            category_tree_snapshot.version,
+            self.request.user.pk,
+            self.request.META.get("CSRF_COOKIE"),
+            *self.get_etag_parts(),
+        ]
+        return quote_etag(md5(repr(parts).encode()).hexdigest())
+
+    def patch_response(self, response, etag: str, last_modified) -> None:
+        response.headers.setdefault("ETag", etag)
+        if last_modified:
+            response.headers.setdefault(
+                "Last-Modified", http_date(int(last_modified.timestamp()))
+            )
+        patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+        patch_vary_headers(response, ("Cookie", "Accept-Language"))
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        last_modified = self.get_last_modified()
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        self.patch_response(response, etag, last_modified)
+        return response
@@ -0,0 +1,149 @@
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from catalog.models import Banner, ProductSummary, Stock
+from catalog.ranking import top_products
+from core.cache import CacheStats
+from core.models import SiteSettings
+
+HOME_BLOCK_KEY = "home_block:{name}"
+LIMITED_EDITIONS_LIMIT = 16
+
+stats = CacheStats.get("home_blocks")
+
+
+def today():
+    return timezone.localdate()
+
+
+@dataclass
+class HomeBlock:
+    """
+    Блок главной страницы: собственный ключ кэша, время жизни и построитель.
+    Ежедневные блоки хранятся под ключом с датой
+    """
+
+    name: str
+    builder: Callable[[], Any]
+    daily: bool = False
+    timeout: Optional[int] = None
+
+    @property
+    def key(self) -> str:
+        key = HOME_BLOCK_KEY.format(name=self.name)
+        if self.daily:
+            key = f"{key}:{today().isoformat()}"
+        return key
+
+    def get_timeout(self, site_settings: SiteSettings) -> int:
+        return self.timeout or site_settings.cache_time
+
+
+home_blocks: dict[str, HomeBlock] = {}
+
+
+def register_block(name: str, daily: bool = False, timeout: Optional[int] = None):
+    def decorator(builder: Callable) -> Callable:
+        home_blocks[name] = HomeBlock(name, builder, daily, timeout)
+        return builder
+
+    return decorator
+
+
+def _stocks():
+    return Stock.objects.select_related(
+        "product", "product__avatar", "product__category"
+    )
+
+
+@register_block("banners")
+def build_banners() -> list:
+    """
+    3 случайных активных баннера
+    """
+    banner_ids = list(Banner.objects.filter(active=True).values_list("pk", flat=True))
+    banner_ids = random.sample(banner_ids, min(3, len(banner_ids)))
+    return list(Banner.objects.filter(pk__in=banner_ids))
+
+
+@register_block("product_day", daily=True)
+def build_product_day() -> Optional[dict]:
+    """
+    Товар дня: меняется раз в сутки по кругу среди активных товаров в наличии
+    """
+    product_ids = list(
+        ProductSummary.objects.filter(active=True, best_stock__isnull=False)
+        .order_by("product_id")
+        .values_list("product_id", flat=True)
+    )
+    if not product_ids:
+        return None
+    product_id = product_ids[today().toordinal() % len(product_ids)]
+    stocks = list(_stocks().filter(product_id=product_id).order_by("price", "pk"))
+    return {"stock": stocks[-1], "new_price": stocks[0].price}
+
+
+@register_block("hot_offers")
+def build_hot_offers() -> list:
+    """
+    Товары из публикации "Горячие предложения"
+    """
+    return list(_stocks().order_by("quantity", "pk")[:3])
+
+
+@register_block("limited_editions")
+def build_limited_editions() -> list:
+    """
+    Товары из публикации "Ограниченный тираж"
+    """
+    stocks = _stocks().filter(product__limited_edition=True).order_by("pk")
+    return list(stocks[:LIMITED_EDITIONS_LIMIT])
+
+
+@register_block("top_products")
+def build_top_products() -> list:
+    """
+    Популярные товары из рейтинга catalog.ranking
+    """
+    return top_products(8)
+
+
+def get_block(name: str):
+    """
+    Чтение блока из кэша. Построение на месте только при холодном кэше
+    или выключенном кэшировании; обычно блоки обновляет refresh_home_blocks
+    """
+    block = home_blocks[name]
+    site_settings = SiteSettings.get_cached()
+    if not site_settings.cache_active or not block.get_timeout(site_settings):
+        return block.builder()
+    key = block.key
+    payload = cache.get(key)
+    if payload is not None:
+        stats.hit()
+        return payload["value"]
+    stats.miss()
+    value = block.builder()
+    cache.set(key, {"value": value}, block.get_timeout(site_settings))
+    return value
+
+
+def refresh_blocks(names: Optional[Iterable[str]] = None) -> list[str]:
+    """
+    Перестроение блоков и запись в кэш. Возвращает имена обновленных блоков
+    """
+    site_settings = SiteSettings.get_cached()
+    if not site_settings.cache_active:
+        return []
+    refreshed = []
+    for name in names or home_blocks:
+        block = home_blocks[name]
+        timeout = block.get_timeout(site_settings)
+        if timeout:
+            cache.set(block.key, {"value": block.builder()}, timeout)
+            refreshed.append(name)
+    return refreshed
@@ -0,0 +1,76 @@
+import json
+from datetime import datetime
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from catalog.models import Product
+from core.benchmark import Runner, compare_results
+
+
+class Command(BaseCommand):
+    """
+    Команда для замера горячих путей витрины на текущей БД:
+    benchmark --output current.json --baseline baseline.json
+    """
+
+    help = "Measure storefront latency, queries and allocations"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument(
+            "--only", action="append", help="Run scenarios whose name contains it"
+        )
+        parser.add_argument(
+            "--cold", action="store_true", help="Clear the cache before each request"
+        )
+        parser.add_argument("--output", help="Write JSON results to this file")
+        parser.add_argument("--baseline", help="JSON results to compare against")
+        parser.add_argument("--threshold", type=float, default=0.2)
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def report(self, name: str, result: dict) -> None:
+        latency = result["latency_ms"]
+        self.stdout.write(
+            f"{name:<32} p50={latency['p50']:>8.2f}ms p95={latency['p95']:>8.2f}ms "
+            f"queries={result['queries']['median']:>5} "
+            f"alloc={result['alloc_peak_kib']:>9.1f}KiB"
+        )
+
+    def handle(self, *args, **options):
+        runner = Runner(
+            repeat=options["repeat"], warmup=options["warmup"], cold=options["cold"]
+        )
+        results = runner.run(only=options["only"], report=self.report)
+        payload = {
+            "meta": {
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "database": connection.vendor,
+                "products": Product.objects.count(),
+                "repeat": options["repeat"],
+                "cold": options["cold"],
+            },
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(payload, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Saved to {options['output']}"))
+
+        if not options["baseline"]:
+            return
+        with open(options["baseline"]) as file:
+            baseline = json.load(file)["results"]
+        rows = compare_results(baseline, results, options["threshold"])
+        for row in rows:
+            line = (
+                f"{row['name']:<32} p50 {row['p50_ms'][0]:.2f} -> {row['p50_ms'][1]:.2f}ms "
+                f"({row['p50_change']:+.0%}) queries {row['queries'][0]} -> "
+                f"{row['queries'][1]}"
+            )
+            style = self.style.ERROR if row["regression"] else self.style.SUCCESS
+            self.stdout.write(style(line))
+        regressions = [row["name"] for row in rows if row["regression"]]
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"Regressions: {', '.join(regressions)}")
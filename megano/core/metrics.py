@@ -0,0 +1,142 @@
+import os
+import time
+
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Переменная окружения каталога для multiprocess-режима (gunicorn с воркерами)
+MULTIPROC_DIR_ENV = "prometheus_multiproc_dir"
+
+request_latency = Histogram(
+    "megano_request_latency_seconds",
+    "Время обработки запроса представлением",
+    ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+db_queries = Histogram(
+    "megano_db_queries_per_request",
+    "Количество SQL-запросов за запрос",
+    ["view"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+db_time = Histogram(
+    "megano_db_time_seconds",
+    "Суммарное время SQL-запросов за запрос",
+    ["view"],
+    buckets=DB_TIME_BUCKETS,
+)
+db_duplicate_queries = Counter(
+    "megano_db_duplicate_queries_total",
+    "Повторы одного и того же SQL в пределах запроса (признак N+1)",
+    ["view"],
+)
+query_budget_exceeded = Counter(
+    "megano_query_budget_exceeded_total",
+    "Запросы, превысившие бюджет SQL-запросов представления",
+    ["view"],
+)
+cache_requests = Counter(
+    "megano_cache_requests_total",
+    "Обращения к логическим кэшам: result=hit|miss",
+    ["cache", "result"],
+)
+task_latency = Histogram(
+    "megano_celery_task_seconds",
+    "Время выполнения задачи Celery",
+    ["task"],
+    buckets=LATENCY_BUCKETS,
+)
+task_failures = Counter(
+    "megano_celery_task_failures_total",
+    "Задачи Celery, завершившиеся исключением",
+    ["task"],
+)
+orders_created = Counter("megano_orders_created_total", "Оформленные заказы")
+payments = Counter(
+    "megano_payments_total",
+    "Результаты оплаты заказов: result=paid|declined|out_of_stock",
+    ["result"],
+)
+cart_adds = Counter("megano_cart_adds_total", "Добавления товаров в корзину")
+view_events = Counter(
+    "megano_view_events_total",
+    "События просмотра товаров: stage=buffered|flushed|dropped",
+    ["stage"],
+)
+
+
+def view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "<unresolved>"
+
+
+class RequestMetricsMiddleware(object):
+    """
+    Гистограмма времени ответа по имени URL представления
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        request_latency.labels(view_name(request), request.method).observe(
+            time.perf_counter() - start
+        )
+        return response
+
+
+_task_started: dict[str, float] = {}
+
+
+def task_prerun_handler(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+def task_postrun_handler(task_id=None, task=None, **kwargs):
+    start = _task_started.pop(task_id, None)
+    if start is not None:
+        task_latency.labels(task.name).observe(time.perf_counter() - start)
+
+
+def task_failure_handler(sender=None, **kwargs):
+    task_failures.labels(sender.name).inc()
+
+
+def connect_celery_signals() -> None:
+    from celery import signals
+
+    signals.task_prerun.connect(task_prerun_handler, weak=False)
+    signals.task_postrun.connect(task_postrun_handler, weak=False)
+    signals.task_failure.connect(task_failure_handler, weak=False)
+
+
+def get_registry():
+    """
+    Реестр текущего процесса или, в multiprocess-режиме, сборщик,
+    объединяющий файлы метрик всех воркеров
+    """
+    if not os.environ.get(MULTIPROC_DIR_ENV):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    return HttpResponse(
+        generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST
+    )
@@ -6,6 +6,7 @@ from django.db.models import BooleanField, Model, PositiveIntegerField
 from django.utils.translation import gettext_lazy as _
 
 from catalog.models import Product
+from core.snapshot import SettingsSnapshot
 
 
 class SiteSettings(Model):
@@ -22,6 +23,7 @@ class SiteSettings(Model):
         if not self.cache_active:
             self.cache_time = 0
         super().save(*args, **kwargs)
+        site_settings_snapshot.invalidate()
 
     @classmethod
     def load(cls):
@@ -30,6 +32,13 @@ class SiteSettings(Model):
         except cls.DoesNotExist:
             return cls()
 
+    @classmethod
+    def get_cached(cls):
+        """
+        Настройки сайта из снимка процесса без запроса к БД
+        """
+        return site_settings_snapshot.get()
+
     @staticmethod
     def load_config():
         with open("core/config/config.json", "r") as cfg:
@@ -61,6 +70,7 @@ class DeliverySettings(Model):
     def save(self, *args, **kwargs):
         self.__class__.objects.exclude(id=self.id).delete()
         super().save(*args, **kwargs)
+        delivery_settings_snapshot.invalidate()
 
     @classmethod
     def load(cls):
@@ -69,6 +79,13 @@ class DeliverySettings(Model):
         except cls.DoesNotExist:
             return cls()
 
+    @classmethod
+    def get_cached(cls):
+        """
+        Настройки доставки из снимка процесса без запроса к БД
+        """
+        return delivery_settings_snapshot.get()
+
     @staticmethod
     def load_config():
         with open("core/config/config.json", "r") as cfg:
@@ -85,3 +102,7 @@ class DeliverySettings(Model):
     class Meta:
         verbose_name = _("Настройки доставки")
         verbose_name_plural = _("Настройки доставки")
+
+
+site_settings_snapshot = SettingsSnapshot(SiteSettings, "site")
+delivery_settings_snapshot = SettingsSnapshot(DeliverySettings, "delivery")
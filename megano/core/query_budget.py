@@ -0,0 +1,112 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Литералы и списки параметров не различают запросы одной формы
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Представление выполнило больше SQL-запросов, чем разрешено бюджетом
+    """
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Нормализованная форма SQL без значений параметров
+    """
+    sql = _LITERAL_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+class QueryCollector(object):
+    """
+    Обертка execute_wrapper, считающая запросы, их время и повторы
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold: int = 1) -> dict[str, int]:
+        """
+        Формы SQL, выполненные больше threshold раз
+        """
+        return {sql: n for sql, n in self.fingerprints.items() if n > threshold}
+
+
+def get_query_budget(view_name: str) -> Optional[int]:
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    return budgets.get(view_name, getattr(settings, "QUERY_BUDGET_DEFAULT", None))
+
+
+class QueryBudgetMiddleware(object):
+    """
+    Учет SQL-запросов каждого запроса: заголовок Server-Timing,
+    гистограммы Prometheus по имени URL и проверка бюджета представления
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+
+        view_name = metrics.view_name(request)
+        metrics.db_queries.labels(view_name).observe(collector.count)
+        metrics.db_time.labels(view_name).observe(collector.duration)
+
+        duplicates = collector.duplicates(settings.QUERY_DUPLICATE_THRESHOLD)
+        if duplicates:
+            metrics.db_duplicate_queries.labels(view_name).inc(sum(duplicates.values()))
+            logger.warning(
+                "Possible N+1 in %s: %s",
+                view_name,
+                "; ".join(f"{n}x {sql[:200]}" for sql, n in duplicates.items()),
+            )
+
+        response["Server-Timing"] = (
+            f'db;dur={collector.duration * 1000:.1f};desc="{collector.count} queries", '
+            f'dup;desc="{sum(duplicates.values())} duplicates"'
+        )
+        self.check_budget(view_name, collector)
+        return response
+
+    @staticmethod
+    def check_budget(view_name: str, collector: QueryCollector) -> None:
+        budget = get_query_budget(view_name)
+        if budget is None or collector.count <= budget:
+            return
+        metrics.query_budget_exceeded.labels(view_name).inc()
+        message = f"{view_name} executed {collector.count} queries (budget {budget})"
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,80 @@
+import time
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import CacheStats
+
+
+class SettingsSnapshot(object):
+    """
+    Снимок настроек-синглтона (или другого объекта с методом load())
+    в памяти процесса.
+
+    Актуальность проверяется по ключу версии в общем кэше не чаще,
+    чем раз в SETTINGS_SNAPSHOT_CHECK_INTERVAL секунд; версия поднимается
+    при сохранении модели, после чего все процессы перечитывают настройки.
+    Попадания и промахи учитываются в CacheStats с именем stats_name
+    """
+
+    def __init__(self, model, name: str, stats_name: str = "settings"):
+        self.model = model
+        self.version_key = f"settings_version:{name}"
+        self.stats = CacheStats.get(stats_name)
+        self._lock = Lock()
+        self._instance = None
+        self._version = None
+        self._checked_at = 0.0
+
+    @property
+    def check_interval(self) -> float:
+        return getattr(settings, "SETTINGS_SNAPSHOT_CHECK_INTERVAL", 5)
+
+    def _shared_version(self) -> int:
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, int(time.time() * 1000), None)
+            version = cache.get(self.version_key)
+        return version
+
+    @property
+    def version(self):
+        """
+        Версия, с которой загружен текущий снимок
+        """
+        return self._version
+
+    def get(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._instance is not None and now - self._checked_at < (
+                self.check_interval
+            ):
+                self.stats.hit()
+                return self._instance
+            version = self._shared_version()
+            self._checked_at = now
+            if self._instance is not None and version == self._version:
+                self.stats.hit()
+                return self._instance
+            self.stats.miss()
+            self._instance = self.model.load()
+            self._version = version
+            return self._instance
+
+    def invalidate(self):
+        """
+        Сброс снимка в текущем процессе и поднятие общей версии
+        после фиксации транзакции
+        """
+        with self._lock:
+            self._instance = None
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, int(time.time() * 1000), None)
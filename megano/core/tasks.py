@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from core.home_blocks import refresh_blocks
+
+
+@shared_task
+def refresh_home_blocks() -> list[str]:
+    return refresh_blocks()
@@ -1,27 +1,19 @@
 from django import template
 
-from cart.cart import Cart
-from catalog.models import Category
-from catalog.services import ComparedProducts
+from catalog.category_tree import category_tree_snapshot, get_category_tree
 
 register = template.Library()
 
 
 @register.simple_tag()
 def get_categories():
-    return Category.objects.filter(parent__isnull=True).order_by("-sorted_index").all()
+    """
+    Корневые категории из дерева в памяти процесса
+    """
+    return get_category_tree().roots
 
 
-@register.simple_tag(takes_context=True, name="cart")
-def get_cart(context):
-    request = context["request"]
-    cart = Cart(request)
-    return cart
-
-
-@register.simple_tag(takes_context=True, name="comparison_len")
-def get_comparison_len(context):
-    request = context["request"]
-    comparison = ComparedProducts(request)
-    comparison_len = comparison.__len__()
-    return comparison_len
+@register.simple_tag()
+def category_tree_version():
+    get_category_tree()
+    return category_tree_snapshot.version
@@ -1,8 +1,20 @@
+import datetime
 from json import loads
+from unittest import mock
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
-from .models import SiteSettings
+from catalog.generator import CatalogGenerator, CatalogSize
+from catalog.models import Category, Product, Seller, Stock
+from order.models import Order
+
+from .benchmark import Runner, compare_results
+from .cache import CacheStats
+from .home_blocks import get_block, home_blocks, refresh_blocks
+from .metrics import REGISTRY, task_failure_handler
+from .models import DeliverySettings, SiteSettings, site_settings_snapshot
+from .query_budget import QueryBudgetExceeded, QueryCollector, fingerprint
 
 
 class SiteSettingsTest(TestCase):
@@ -21,3 +33,166 @@ class SiteSettingsTest(TestCase):
             self.generic_settings.load_config()
             self.assertEqual(data["cache_time"], self.generic_settings.cache_time)
             self.assertEqual(data["cache_active"], self.generic_settings.active)
+
+
+@override_settings(SETTINGS_SNAPSHOT_CHECK_INTERVAL=0)
+class SettingsSnapshotTest(TestCase):
+    def setUp(self) -> None:
+        SiteSettings.objects.create(cache_active=True, cache_products_time=10)
+        DeliverySettings.objects.create()
+
+    def test_no_queries_after_first_read(self) -> None:
+        SiteSettings.get_cached()
+        DeliverySettings.get_cached()
+        with self.assertNumQueries(0):
+            self.assertEqual(SiteSettings.get_cached().cache_products_time, 10)
+            self.assertEqual(DeliverySettings.get_cached().order_cost_limit, 2000)
+
+    def test_save_refreshes_snapshot(self) -> None:
+        site_settings = SiteSettings.get_cached()
+        with self.captureOnCommitCallbacks(execute=True):
+            site_settings.cache_products_time = 20
+            site_settings.save()
+        self.assertEqual(SiteSettings.get_cached().cache_products_time, 20)
+
+    def test_version_bump_from_other_worker(self) -> None:
+        SiteSettings.get_cached()
+        SiteSettings.objects.update(cache_products_time=30)
+        cache.incr(site_settings_snapshot.version_key)
+        self.assertEqual(SiteSettings.get_cached().cache_products_time, 30)
+
+
+class HomeBlocksTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        SiteSettings.objects.create(cache_active=True)
+        category = Category.objects.create(title="Электроника")
+        seller = Seller.objects.create(
+            name="Продавец", phone="123", address="Адрес", email="s@s.ru"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(3):
+                product = Product.objects.create(
+                    category=category,
+                    name=f"Товар {index}",
+                    active=True,
+                    limited_edition=index == 0,
+                )
+                Stock.objects.create(seller=seller, product=product, price=100)
+                Stock.objects.create(seller=seller, product=product, price=150)
+
+    def test_blocks_have_separate_keys(self) -> None:
+        keys = {block.key for block in home_blocks.values()}
+        self.assertEqual(len(keys), len(home_blocks))
+        refresh_blocks()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_block("hot_offers")), 3)
+            self.assertEqual(len(get_block("limited_editions")), 2)
+            self.assertEqual(get_block("product_day")["new_price"], 100)
+
+    def test_product_day_rotates_daily(self) -> None:
+        day = datetime.date(2024, 1, 1)
+        products = []
+        for offset in (0, 0, 1):
+            with mock.patch("core.home_blocks.today") as today:
+                today.return_value = day + datetime.timedelta(days=offset)
+                products.append(get_block("product_day")["stock"].product_id)
+        self.assertEqual(products[0], products[1])
+        self.assertNotEqual(products[1], products[2])
+
+    def test_index_renders(self) -> None:
+        refresh_blocks()
+        self.assertEqual(self.client.get("/").status_code, 200)
+
+
+class QueryBudgetTest(TestCase):
+    def test_fingerprint_ignores_parameters(self) -> None:
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND x = 5"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s) AND x = 7"),
+        )
+
+    def test_collector_counts_duplicates(self) -> None:
+        collector = QueryCollector()
+        for _ in range(3):
+            collector(
+                lambda *args: None, "SELECT 1 FROM t WHERE id = %s", [1], False, {}
+            )
+        collector(lambda *args: None, "SELECT 2", [], False, {})
+        self.assertEqual(collector.count, 4)
+        self.assertEqual(len(collector.duplicates()), 1)
+
+    def test_server_timing_header(self) -> None:
+        response = self.client.get("/")
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+    @override_settings(QUERY_BUDGETS={"core:index": 0}, QUERY_BUDGET_RAISE=True)
+    def test_budget_exceeded_fails(self) -> None:
+        cache.clear()
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get("/")
+
+
+class MetricsTest(TestCase):
+    @staticmethod
+    def sample(name, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_metrics_endpoint(self) -> None:
+        self.client.get("/")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            b'megano_request_latency_seconds_count{method="GET",view="core:index"}',
+            response.content,
+        )
+        self.assertIn(b"megano_db_queries_per_request", response.content)
+
+    def test_cache_stats_exported(self) -> None:
+        before = self.sample(
+            "megano_cache_requests_total", cache="test_cache", result="hit"
+        )
+        CacheStats.get("test_cache").hit()
+        self.assertEqual(
+            self.sample(
+                "megano_cache_requests_total", cache="test_cache", result="hit"
+            ),
+            before + 1,
+        )
+
+    def test_task_failure_counted(self) -> None:
+        task = mock.Mock()
+        task.name = "order.tasks.payment"
+        before = self.sample("megano_celery_task_failures_total", task=task.name)
+        task_failure_handler(sender=task)
+        self.assertEqual(
+            self.sample("megano_celery_task_failures_total", task=task.name), before + 1
+        )
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self) -> None:
+        size = CatalogSize(
+            categories=3, products=60, sellers=3, reviews=10, users=3, orders=0
+        )
+        CatalogGenerator(size, seed=1).generate()
+
+    def test_runner_measures_and_rolls_back(self) -> None:
+        products = Product.objects.count()
+        results = Runner(repeat=3, warmup=0).run(only=["home", "cart", "ordering"])
+        self.assertEqual(
+            set(results),
+            {"home", "cart:1", "cart:10", "cart:50", "cart:add"}
+            | {"ordering", "ordering:submit", "payment:submit"},
+        )
+        self.assertGreater(results["cart:50"]["queries"]["median"], 0)
+        self.assertIn("p95", results["home"]["latency_ms"])
+        self.assertEqual(Product.objects.count(), products)
+        self.assertFalse(Order.objects.exists())
+
+        slower = {
+            name: {**result, "latency_ms": {**result["latency_ms"], "p50": 0.001}}
+            for name, result in results.items()
+        }
+        rows = compare_results(slower, results)
+        self.assertTrue(all(row["regression"] for row in rows))
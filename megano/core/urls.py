@@ -1,9 +1,12 @@
 from django.urls import path
 
-from core.views import Index
+from core.metrics import metrics_view
+from core.views import Index, header_state
 
 app_name = "core"
 
 urlpatterns = [
     path("", Index.as_view(), name="index"),
+    path("metrics", metrics_view, name="metrics"),
+    path("header-state", header_state, name="header_state"),
 ]
@@ -0,0 +1,15 @@
+"""
+Настройки gunicorn. Для сбора метрик со всех воркеров перед запуском
+нужно задать prometheus_multiproc_dir - пустой каталог для файлов метрик
+"""
+import os
+
+from prometheus_client import multiprocess
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 4))
+
+
+def child_exit(server, worker):
+    if os.environ.get("prometheus_multiproc_dir"):
+        multiprocess.mark_process_dead(worker.pid)
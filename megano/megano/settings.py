@@ -29,14 +29,37 @@ INTERNAL_IPS = os.getenv("INTERNAL_IPS")
 
 CART_SESSION_ID = "cart"
 
-BANNER_SESSION_ID = "banners"
-
 BROWSING_HISTORY_SESSION_ID = "history"
 
+# сколько последних просмотров хранится в истории
+BROWSING_HISTORY_LIMIT = 20
+
+# Буфер событий просмотра: catalog.view_events.RedisViewEventBuffer
+# или CacheViewEventBuffer. Буфер должен быть общим для веб-процессов
+# и воркера Celery, иначе сброс не увидит событий
+VIEW_EVENT_BUFFER = os.environ.get(
+    "VIEW_EVENT_BUFFER", "catalog.view_events.RedisViewEventBuffer"
+)
+VIEW_EVENT_REDIS_URL = os.environ.get(
+    "VIEW_EVENT_REDIS_URL", "redis://127.0.0.1:6379/2"
+)
+# Время жизни несброшенного события в кэше (сек) и предельная длина потока Redis
+VIEW_EVENT_TTL = int(os.environ.get("VIEW_EVENT_TTL", 60 * 60))
+VIEW_EVENT_STREAM_MAXLEN = int(os.environ.get("VIEW_EVENT_STREAM_MAXLEN", 1000000))
+
 VIEWED_PRODUCTS_SESSION_ID = "viewed_products"
 
 COMPARISON_SESSION_ID = "comparison"
 
+# Отзывов на странице товара и в одной странице ленты отзывов
+REVIEWS_PAGE_SIZE = 10
+# Минимальный интервал между отзывами одного пользователя (сек)
+REVIEW_THROTTLE_SECONDS = int(os.getenv("REVIEW_THROTTLE_SECONDS", 60))
+
+# сколько товаров можно добавить в сравнение, если в профиле
+# пользователя (например, у оптовых покупателей) не задан свой лимит
+COMPARISON_LIMIT = int(os.getenv("COMPARISON_LIMIT", 4))
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -55,6 +78,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.metrics.RequestMetricsMiddleware",
+    "core.query_budget.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
@@ -158,4 +183,82 @@ CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://127.0.0.1:6379/
 CELERY_RESULT_BACKEND = os.environ.get(
     "CELERY_RESULT_BACKEND", "redis://127.0.0.1:6379/0"
 )
+
+# Кэш общий для всех веб-процессов и воркеров Celery: на нем держатся
+# страницы товаров, версии категорий и их сброс сигналами.
+# Локальный LocMemCache задается только в megano.settings_test
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://127.0.0.1:6379/3")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": CACHE_REDIS_URL,
+    }
+}
+
 PRODUCT_CACHE_KEY = os.environ.get("PRODUCT_CACHE_KEY", "product_list_{category_id}")
+
+KEYSET_PAGINATION = int(os.environ.get("KEYSET_PAGINATION", 0))
+
+# Как часто (сек) процесс сверяет снимок SiteSettings/DeliverySettings с версией в кэше
+SETTINGS_SNAPSHOT_CHECK_INTERVAL = int(
+    os.environ.get("SETTINGS_SNAPSHOT_CHECK_INTERVAL", 5)
+)
+
+# Время жизни (сек) собранной страницы товара; изменения сбрасывают ее сигналами
+PRODUCT_PAGE_CACHE_TIMEOUT = int(os.environ.get("PRODUCT_PAGE_CACHE_TIMEOUT", 60 * 60))
+
+# Хранилище корзины: cart.stores.SessionCartStore, RedisCartStore или DBCartStore
+CART_STORE = os.environ.get("CART_STORE", "cart.stores.SessionCartStore")
+CART_REDIS_URL = os.environ.get("CART_REDIS_URL", "redis://127.0.0.1:6379/1")
+# Время жизни корзины пользователя (сек) в Redis
+CART_USER_TTL = int(os.environ.get("CART_USER_TTL", 60 * 60 * 24 * 30))
+
+# Интервал опроса статуса оплаты со страницы ожидания (сек)
+PAYMENT_POLL_INTERVAL = float(os.environ.get("PAYMENT_POLL_INTERVAL", 2))
+# Через сколько секунд незавершенная задача оплаты считается потерянной
+PAYMENT_TASK_TIMEOUT = int(os.environ.get("PAYMENT_TASK_TIMEOUT", 60 * 10))
+
+# Бюджет SQL-запросов по имени URL; превышение пишется в лог,
+# а при QUERY_BUDGET_RAISE=1 (задан в megano.settings_test) вызывает исключение
+QUERY_BUDGETS = {
+    "core:index": 20,
+    "catalog:catalog": 25,
+    "catalog:product_detail": 25,
+    "catalog:reviews": 8,
+    "cart:cart_details": 15,
+    "order:ordering": 25,
+}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_RAISE = int(os.environ.get("QUERY_BUDGET_RAISE", 0))
+# Сколько раз одна форма SQL может повториться за запрос до предупреждения о N+1
+QUERY_DUPLICATE_THRESHOLD = int(os.environ.get("QUERY_DUPLICATE_THRESHOLD", 3))
+
+# Сводки товаров пересчитываются раз в час только для товаров с новыми
+# просмотрами, заказами и отзывами; полный пересчет раз в сутки сверяет
+# изменения, прошедшие мимо сигналов (update() и правки в обход моделей)
+CELERY_BEAT_SCHEDULE = {
+    "refresh-changed-summaries": {
+        "task": "catalog.tasks.refresh_changed_summaries_task",
+        "schedule": 60 * 60,
+    },
+    "rebuild-product-summaries": {
+        "task": "catalog.tasks.rebuild_product_summaries_task",
+        "schedule": 60 * 60 * 24,
+    },
+    "refresh-home-blocks": {
+        "task": "core.tasks.refresh_home_blocks",
+        "schedule": 60 * 5,
+    },
+    "flush-view-events": {
+        "task": "catalog.tasks.flush_view_events_task",
+        "schedule": 60,
+    },
+    "reset-stale-payments": {
+        "task": "order.tasks.reset_stale_payments_task",
+        "schedule": 60,
+    },
+    "clear-stale-carts": {
+        "task": "cart.tasks.clear_stale_carts",
+        "schedule": 60 * 60 * 24,
+    },
+}
@@ -0,0 +1,16 @@
+"""
+Настройки для запуска тестов:
+
+   python manage.py test --settings=megano.settings_test
+
+Общие хранилища в Redis заменяются локальными, превышение бюджета
+SQL-запросов вызывает исключение
+"""
+
+from .settings import *  # noqa: F401,F403
+
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+VIEW_EVENT_BUFFER = "catalog.view_events.CacheViewEventBuffer"
+
+QUERY_BUDGET_RAISE = 1
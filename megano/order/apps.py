@@ -6,3 +6,6 @@ class OrderConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "order"
     verbose_name = _("Заказы")
+
+    def ready(self):
+        from order import signals  # noqa: F401
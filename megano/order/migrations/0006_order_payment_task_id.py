@@ -0,0 +1,23 @@
+# Generated by Django 4.2.2 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0005_merge_20231109_1244"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="payment_task_id",
+            field=models.CharField(
+                blank=True,
+                default=None,
+                max_length=64,
+                null=True,
+                verbose_name="Задача оплаты",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0006_order_payment_task_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="payment_started_at",
+            field=models.DateTimeField(
+                blank=True, default=None, null=True, verbose_name="Начало оплаты"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.2 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("order", "0007_order_payment_started_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="order_status",
+            field=models.TextField(
+                choices=[
+                    ("NOT_PAID", "Не оплачен"),
+                    ("PAID", "Оплачен"),
+                    ("NEEDS_REFUND", "Требуется возврат"),
+                    ("IN_DELIVERY", "В доставке"),
+                    ("DELIVERED", "Доставлен"),
+                ],
+                default="NOT_PAID",
+                verbose_name="Статус заказа",
+            ),
+        ),
+    ]
@@ -8,6 +8,8 @@ from catalog.models import Stock
 class OrderStatus(models.TextChoices):
     NOT_PAID = "NOT_PAID", "Не оплачен"
     PAID = "PAID", "Оплачен"
+    # деньги списаны, но товара не хватило: оплата закрыта до возврата
+    NEEDS_REFUND = "NEEDS_REFUND", "Требуется возврат"
     IN_DELIVERY = "IN_DELIVERY", "В доставке"
     DELIVERED = "DELIVERED", "Доставлен"
 
@@ -63,6 +65,23 @@ class Order(models.Model):
         default=None,
         verbose_name=_("payment error"),
     )
+    payment_task_id = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        default=None,
+        verbose_name=_("Задача оплаты"),
+    )
+    payment_started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        default=None,
+        verbose_name=_("Начало оплаты"),
+    )
+
+    @property
+    def payment_pending(self) -> bool:
+        return bool(self.payment_task_id)
 
     class Meta:
         verbose_name = _("Заказ")
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from catalog.models import Stock
+from catalog.signals import refresh_product_summary
+from order.models import OrderItemModel
+
+
+@receiver([post_save, post_delete], sender=OrderItemModel)
+def order_item_changed(sender, instance: OrderItemModel, **kwargs):
+    product_id = (
+        Stock.objects.filter(pk=instance.stock_id)
+        .values_list("product_id", flat=True)
+        .first()
+    )
+    refresh_product_summary(product_id)
@@ -3,6 +3,8 @@ import time
 
 from celery import shared_task
 
+from order.utils.ordering import reset_stale_payments, result_from_payment_system
+
 
 @shared_task
 def payment(card_number: int) -> tuple:
@@ -18,3 +20,28 @@ def payment(card_number: int) -> tuple:
         ]
         payment_error = random.choice(payment_errors)
         return False, payment_error
+
+
+@shared_task
+def apply_payment_result(payment_result: tuple, order_id: int, task_id: str) -> None:
+    """
+    Обработчик завершения задачи payment task_id: сохраняет результат в заказе
+    """
+    result_from_payment_system(order_id, task_id, payment_result)
+
+
+@shared_task
+def payment_failed(order_id: int, task_id: str) -> None:
+    """
+    Обработчик ошибки задачи payment task_id: снимает признак ожидания оплаты
+    """
+    result_from_payment_system(
+        order_id,
+        task_id,
+        (False, "Техническая ошибка. Невозможно выполнить операцию по карте"),
+    )
+
+
+@shared_task
+def reset_stale_payments_task() -> int:
+    return reset_stale_payments()
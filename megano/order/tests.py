@@ -1,3 +1,165 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import Profile
+from catalog.models import Category, Product, Seller, Stock
+from core.metrics import REGISTRY
+
+from .models import Order, OrderItemModel
+from .tasks import apply_payment_result, payment_failed
+from .utils.ordering import reset_stale_payments, start_payment
+
+
+class PaymentFlowTest(TestCase):
+    def setUp(self) -> None:
+        user = get_user_model().objects.create_user(
+            username="buyer", email="b@b.ru", password="secret"
+        )
+        profile = Profile.objects.create(user=user)
+        self.order = Order.objects.create(profile=profile, delivery_address="Адрес")
+
+    def pay(self):
+        with mock.patch("order.tasks.payment.apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("order:payment", args=[self.order.pk]),
+                    {"card_number": "1234 5678"},
+                )
+        return response, apply_async
+
+    def task_id(self) -> str:
+        self.order.refresh_from_db()
+        return self.order.payment_task_id
+
+    def test_post_enqueues_and_redirects(self) -> None:
+        response, apply_async = self.pay()
+        self.assertRedirects(
+            response,
+            reverse("order:payment_status", args=[self.order.pk]),
+            fetch_redirect_response=False,
+        )
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.payment_pending)
+        self.assertEqual(apply_async.call_args.kwargs["args"], (12345678,))
+        self.assertEqual(
+            apply_async.call_args.kwargs["task_id"], self.order.payment_task_id
+        )
+
+        # повторная отправка формы не ставит вторую оплату
+        _, apply_async = self.pay()
+        apply_async.assert_not_called()
+
+    def test_result_is_applied_by_callback(self) -> None:
+        self.pay()
+        poll_url = reverse("order:payment_status_poll", args=[self.order.pk])
+        self.assertTrue(self.client.get(poll_url).json()["pending"])
+
+        paid = REGISTRY.get_sample_value("megano_payments_total", {"result": "paid"})
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_payment_result((True, None), self.order.pk, self.task_id())
+        self.assertEqual(
+            REGISTRY.get_sample_value("megano_payments_total", {"result": "paid"}),
+            (paid or 0) + 1,
+        )
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.order_status, "PAID")
+        self.assertFalse(self.order.payment_pending)
+        self.assertEqual(self.client.get(poll_url).json()["status"], "PAID")
+
+    def test_failed_payment_can_be_retried(self) -> None:
+        self.pay()
+        apply_payment_result((False, "Ошибка"), self.order.pk, self.task_id())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_error, "Ошибка")
+        _, apply_async = self.pay()
+        apply_async.assert_called_once()
+
+    def test_enqueue_failure_releases_order(self) -> None:
+        with mock.patch("order.tasks.payment.apply_async", side_effect=ConnectionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(
+                    reverse("order:payment", args=[self.order.pk]),
+                    {"card_number": "1234 5678"},
+                )
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.payment_pending)
+        self.assertTrue(self.order.payment_error)
+
+    def test_stale_payment_is_reset(self) -> None:
+        self.pay()
+        self.assertEqual(reset_stale_payments(), 0)
+        Order.objects.filter(pk=self.order.pk).update(
+            payment_started_at=timezone.now() - timedelta(hours=1)
+        )
+        stale_task_id = self.task_id()
+        self.assertEqual(reset_stale_payments(), 1)
+        _, apply_async = self.pay()
+        apply_async.assert_called_once()
+
+        # поздние ответы снятой задачи не трогают новую оплату
+        apply_payment_result((True, None), self.order.pk, stale_task_id)
+        payment_failed(self.order.pk, stale_task_id)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.order_status, "NOT_PAID")
+        self.assertEqual(
+            self.order.payment_task_id, apply_async.call_args.kwargs["task_id"]
+        )
+
+
+class OrderStockTest(TestCase):
+    def setUp(self) -> None:
+        user = get_user_model().objects.create_user(
+            username="buyer", email="b@b.ru", password="secret"
+        )
+        profile = Profile.objects.create(user=user)
+        category = Category.objects.create(title="Электроника")
+        seller = Seller.objects.create(
+            name="Продавец", phone="123", address="Адрес", email="s@s.ru"
+        )
+        product = Product.objects.create(category=category, name="Товар")
+        self.first = Stock.objects.create(
+            seller=seller, product=product, price=100, quantity=5
+        )
+        self.second = Stock.objects.create(
+            seller=seller, product=product, price=200, quantity=1
+        )
+        self.order = Order.objects.create(
+            profile=profile, delivery_address="Адрес", payment_task_id="task"
+        )
+
+    def add_items(self, first_count: int, second_count: int) -> None:
+        OrderItemModel.objects.bulk_create(
+            [
+                OrderItemModel(order=self.order, stock=self.first, count=first_count),
+                OrderItemModel(order=self.order, stock=self.second, count=second_count),
+            ]
+        )
+
+    def test_paid_order_decrements_by_count(self) -> None:
+        self.add_items(3, 1)
+        with self.assertNumQueries(9):
+            apply_payment_result((True, None), self.order.pk, "task")
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.quantity, self.first.quantity_sold), (2, 3))
+        self.assertEqual((self.second.quantity, self.second.quantity_sold), (0, 1))
+
+        # повторный вызов обработчика не списывает товар второй раз
+        apply_payment_result((True, None), self.order.pk, "task")
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.quantity, 2)
 
-# Create your tests here.
+    def test_oversell_is_rolled_back(self) -> None:
+        self.add_items(3, 2)
+        apply_payment_result((True, None), self.order.pk, "task")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.order_status, "NEEDS_REFUND")
+        self.assertTrue(self.order.payment_error)
+        self.assertFalse(start_payment(self.order, 12345678))
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.quantity, self.first.quantity_sold), (5, 0))
@@ -3,8 +3,10 @@ from django.urls import path
 from order.views import (
     OrderDetailView,
     OrderingView,
+    PaymentStatusView,
     PaymentView,
     PaymentWithPaymentMethodView,
+    payment_status_poll,
 )
 
 app_name = "order"
@@ -17,5 +19,15 @@ urlpatterns = [
         PaymentWithPaymentMethodView.as_view(),
         name="payment_with_payment_method",
     ),
+    path(
+        "ordering/payment/<int:pk>/status/",
+        PaymentStatusView.as_view(),
+        name="payment_status",
+    ),
+    path(
+        "ordering/payment/<int:pk>/status/poll/",
+        payment_status_poll,
+        name="payment_status_poll",
+    ),
     path("<int:pk>/", OrderDetailView.as_view(), name="order_detail"),
 ]
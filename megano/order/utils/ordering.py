@@ -1,86 +1,222 @@
-from cart.cart import Cart
-from catalog.models import Product, Stock
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from django.utils import timezone
+
+from cart.cart import Cart, CartLine
+from catalog.models import Stock
+from catalog.signals import refresh_product_summaries
+from core import metrics
 from core.models import DeliverySettings
 from order.models import Order, OrderItemModel
 
+logger = logging.getLogger(__name__)
+
 
-def refactor_cart_to_product_items(cart: Cart) -> list[dict]:
+def refactor_cart_to_product_items(cart: Cart) -> list[CartLine]:
     """
-    Функция для преобразования корзины в список
-    return:list: product_items = [{'product': Product, 'quanty': int, 'price': int}, ...]
+    Функция для преобразования корзины в список позиций
+    return:list: [CartLine, ...]
+    """
+    return cart.lines()
+
+
+class InsufficientStockError(Exception):
+    """
+    На складе меньше товара, чем в заказе
     """
-    product_items = []
-    for item in cart:
-        product_item = dict()
-        product_item["product"] = Product.objects.get(id=item["product_id"])
-        product_item["quantity"] = item["quantity"]
-        product_item["price"] = int(item["price"][: len(item["price"]) - 3]) * int(
-            product_item["quantity"]
-        )
-        product_items.append(product_item)
-    return product_items
 
 
 def current_order_from_cart(
     cart: Cart, profile, delivery_address, comment, delivery_method, payment_method
 ):
     """
-    Функция для создания заказа из корзины
+    Функция для создания заказа из корзины в одной транзакции:
+    заказ и все его позиции создаются двумя запросами
     return: Order: current_order
     """
+    lines = cart.lines()
     price = cart.get_total_price()
-    stocks = []
-    current_order = Order.objects.create(
-        profile=profile,
-        delivery_address=delivery_address,
-        comment=comment,
-        price=price,
-        delivery_method=delivery_method,
-        payment_method=payment_method,
-    )
-    current_order.save()
-
-    for item in cart:
-        full_price = item["total_price"]
-        quantity = item["quantity"]
-        stock = Stock.objects.get(id=item["id"])
-        stocks.append(stock)
-
-        current_order_item = OrderItemModel.objects.create(
-            stock=stock,
-            order=current_order,
-            count=quantity,
-            full_price=full_price,
-        )
-        current_order_item.save()
-
-    stocks_count = len(set(stocks))
-    delivery_settings: DeliverySettings = DeliverySettings.objects.get()
+    stocks_count = len({line.id for line in lines})
+    delivery_settings: DeliverySettings = DeliverySettings.get_cached()
+    order_price = price
     if delivery_method == "EXPRESS_DELIVERY":
-        current_order.price += delivery_settings.express_delivery_cost
+        order_price += delivery_settings.express_delivery_cost
     if delivery_method == "DELIVERY":
         if price < delivery_settings.order_cost_limit or stocks_count > 1:
-            current_order.price += delivery_settings.delivery_markup
-    current_order.save()
+            order_price += delivery_settings.delivery_markup
+
+    with transaction.atomic():
+        current_order = Order.objects.create(
+            profile=profile,
+            delivery_address=delivery_address,
+            comment=comment,
+            price=order_price,
+            delivery_method=delivery_method,
+            payment_method=payment_method,
+        )
+        OrderItemModel.objects.bulk_create(
+            [
+                OrderItemModel(
+                    stock=line.stock,
+                    order=current_order,
+                    count=line.quantity,
+                    full_price=line.total_price,
+                )
+                for line in lines
+            ]
+        )
+        transaction.on_commit(metrics.orders_created.inc)
     return current_order
 
 
-def result_from_payment_system(cart: Cart, order: Order, payment_result: list) -> Order:
+def commit_order_stock(order: Order) -> None:
+    """
+    Списание товаров заказа со складов одним UPDATE:
+    quantity -= count, quantity_sold += count.
+    Строки складов блокируются в порядке id, а условие quantity >= count
+    в самом UPDATE не дает продать больше, чем есть. Если хотя бы одна
+    позиция не списалась, транзакция откатывается целиком
+    """
+    counts = defaultdict(int)
+    for stock_id, count in order.order_items.values_list("stock_id", "count"):
+        counts[stock_id] += count
+    if not counts:
+        return
+
+    amount = Case(
+        *[When(pk=stock_id, then=Value(count)) for stock_id, count in counts.items()],
+        default=Value(0),
+        output_field=PositiveIntegerField(),
+    )
+    with transaction.atomic():
+        stocks = Stock.objects.filter(pk__in=counts.keys())
+        product_ids = set(
+            stocks.select_for_update()
+            .order_by("pk")
+            .values_list("product_id", flat=True)
+        )
+        updated = stocks.filter(quantity__gte=amount).update(
+            quantity=F("quantity") - amount,
+            quantity_sold=F("quantity_sold") + amount,
+        )
+        if updated != len(counts):
+            raise InsufficientStockError
+        refresh_product_summaries(product_ids)
+
+
+PAYMENT_ENQUEUE_ERROR = "Техническая ошибка. Невозможно выполнить операцию по карте"
+
+
+def release_payment(order_id: int, task_id: str, error: str) -> bool:
+    """
+    Снятие признака ожидания оплаты, если задача task_id так и не отработала.
+    Заказ снова можно оплатить
+    return: bool: True, если признак был снят
+    """
+    return bool(
+        Order.objects.filter(
+            pk=order_id, order_status="NOT_PAID", payment_task_id=task_id
+        ).update(payment_task_id=None, payment_started_at=None, payment_error=error)
+    )
+
+
+def _enqueue_payment(order_id: int, task_id: str, card_number: int) -> None:
+    from order.tasks import apply_payment_result, payment, payment_failed
+
+    try:
+        payment.apply_async(
+            args=(card_number,),
+            task_id=task_id,
+            link=apply_payment_result.s(order_id, task_id),
+            link_error=payment_failed.si(order_id, task_id),
+        )
+    except Exception:
+        logger.exception("Payment for order %s was not enqueued", order_id)
+        release_payment(order_id, task_id, PAYMENT_ENQUEUE_ERROR)
+
+
+def start_payment(order: Order, card_number: int) -> bool:
     """
-    Функция вывода результата системы оплаты
+    Постановка оплаты заказа в очередь без ожидания ответа платежной системы.
+    Результат применяется к заказу обработчиком завершения задачи.
+    Если задачу не удалось поставить, признак ожидания снимается сразу,
+    а зависшие задачи снимает reset_stale_payments
+    return: bool: False, если заказ уже оплачен или оплата уже идет
+    """
+    task_id = uuid4().hex
+    started = Order.objects.filter(
+        pk=order.pk, order_status="NOT_PAID", payment_task_id__isnull=True
+    ).update(
+        payment_task_id=task_id, payment_started_at=timezone.now(), payment_error=None
+    )
+    if not started:
+        return False
+    transaction.on_commit(partial(_enqueue_payment, order.pk, task_id, card_number))
+    return True
+
+
+def reset_stale_payments() -> int:
+    """
+    Снятие ожидания оплаты с заказов, задача которых не завершилась
+    за PAYMENT_TASK_TIMEOUT секунд (потерянная задача или обработчик)
+    return: int: количество заказов
+    """
+    expired = timezone.now() - timedelta(seconds=settings.PAYMENT_TASK_TIMEOUT)
+    return Order.objects.filter(
+        Q(payment_started_at__lt=expired) | Q(payment_started_at__isnull=True),
+        order_status="NOT_PAID",
+        payment_task_id__isnull=False,
+    ).update(
+        payment_task_id=None,
+        payment_started_at=None,
+        payment_error=PAYMENT_ENQUEUE_ERROR,
+    )
+
+
+def result_from_payment_system(
+    order_id: int, task_id: str, payment_result: list
+) -> Order:
+    """
+    Применение результата задачи оплаты task_id к заказу.
+    Результат применяется, только если заказ все еще ждет именно эту задачу:
+    повторный вызов, а также поздний ответ задачи, снятой
+    reset_stale_payments, ничего не меняют.
+    Списание без товара на складе переводит заказ в NEEDS_REFUND
     return: Order
     """
-    if payment_result[0]:
-        order.payment_error = None
-        order.order_status = "PAID"
-        order.pay_result = True
-        for item in order.order_items.all():
-            item.stock.quantity -= 1
-            item.stock.quantity_sold += 1
-            item.stock.save()
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(pk=order_id)
+        if order.order_status != "NOT_PAID" or order.payment_task_id != task_id:
+            logger.warning(
+                "Result of payment task %s for order %s is dropped", task_id, order_id
+            )
+            return order
+        order.payment_task_id = None
+        order.payment_started_at = None
+        if payment_result[0]:
+            try:
+                commit_order_stock(order)
+            except InsufficientStockError:
+                # платеж уже прошел, поэтому заказ не возвращается в NOT_PAID:
+                # иначе покупатель смог бы оплатить его повторно
+                order.payment_error = "Недостаточно товара на складе"
+                order.order_status = "NEEDS_REFUND"
+                result = "out_of_stock"
+            else:
+                order.payment_error = None
+                order.order_status = "PAID"
+                order.pay_result = True
+                result = "paid"
+        else:
+            order.payment_error = payment_result[1]
+            result = "declined"
         order.save()
-        cart.clear()
-    else:
-        order.payment_error = payment_result[1]
-
+        transaction.on_commit(metrics.payments.labels(result).inc)
     return order
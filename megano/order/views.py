@@ -1,7 +1,7 @@
-import time
-
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
-from django.shortcuts import redirect, render
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.views import View
 from django.views.generic import DetailView
 
@@ -17,13 +17,13 @@ from order.models import Order
 from order.utils.ordering import (
     current_order_from_cart,
     refactor_cart_to_product_items,
-    result_from_payment_system,
+    start_payment,
 )
 
-from .tasks import payment
-
 User = get_user_model()
 
+PAYMENT_ORDER_SESSION_ID = "payment_order"
+
 
 class OrderDetailView(DetailView):
     """
@@ -135,124 +135,96 @@ class OrderingView(View):
 
 
 class PaymentView(View):
+    template_name = "payment.html"
+    form_class = PaymentByCardForm
+
+    def get_context(self, current_order: Order) -> dict:
+        return {
+            "pk": current_order.pk,
+            "current_order_payment": current_order.payment_method,
+            "message": "Ждём подтверждения оплаты платёжной системы",
+        }
+
     def get(self, request, pk, *args, **kwargs):
-        current_order: Order = Order.objects.get(pk=pk)
-        if current_order.order_status == "NOT_PAID":
-            return render(
-                request,
-                "payment.html",
-                {
-                    "pk": pk,
-                    "current_order_payment": current_order.payment_method,
-                    "message": "Ждём подтверждения оплаты платёжной системы",
-                },
-            )
-        return render(
-            request,
-            "payment_result.html",
-            {"current_order": current_order},
-        )
+        current_order: Order = get_object_or_404(Order, pk=pk)
+        if current_order.order_status != "NOT_PAID" or current_order.payment_pending:
+            return redirect("order:payment_status", pk)
+        return render(request, self.template_name, self.get_context(current_order))
+
+    def form_valid(self, current_order: Order, form) -> None:
+        pass
 
     def post(self, request, pk, **kwargs):
-        cart = Cart(request)
-        form_payment_by_card = PaymentByCardForm(request.POST)
-        current_order: Order = Order.objects.get(pk=pk)
-        if current_order.order_status != "NOT_PAID":
-            return render(
-                request,
-                "payment_result.html",
-                {"current_order": current_order},
-            )
-        if form_payment_by_card.is_valid():
-            card_number = form_payment_by_card.cleaned_data["card_number"]
-            card_number = int(f"{card_number[0:4]}{card_number[5:9]}")
-            if current_order.order_status != "NOT_PAID":
-                return render(
-                    request,
-                    "payment_result.html",
-                    {"current_order": current_order},
-                )
-
-            payment_result = payment.apply_async(
-                args=(card_number,),
-            )
-            time.sleep(4)
-            current_order = result_from_payment_system(
-                cart, current_order, payment_result.result
-            )
-            current_order.save()
-            if current_order.pay_result:
-                return render(
-                    request,
-                    "payment_result.html",
-                    {"current_order": current_order},
-                )
-            return render(
-                request,
-                "payment_result.html",
-                {"current_order": current_order},
-            )
+        current_order: Order = get_object_or_404(Order, pk=pk)
+        if current_order.order_status != "NOT_PAID" or current_order.payment_pending:
+            return redirect("order:payment_status", pk)
+        form = self.form_class(request.POST)
+        if not form.is_valid():
+            return render(request, self.template_name, self.get_context(current_order))
+
+        card_number = form.cleaned_data["card_number"]
+        card_number = int(f"{card_number[0:4]}{card_number[5:9]}")
+        self.form_valid(current_order, form)
+        start_payment(current_order, card_number)
+        request.session[PAYMENT_ORDER_SESSION_ID] = current_order.pk
+        return redirect("order:payment_status", pk)
+
+
+class PaymentWithPaymentMethodView(PaymentView):
+    """
+    Представление для процесса оплаты
+    """
+
+    template_name = "payment_with_payment_method.html"
+    form_class = PaymentByCardWithPaymentMethodForm
+
+    def form_valid(self, current_order: Order, form) -> None:
+        current_order.payment_method = form.cleaned_data["payment_method"]
+        current_order.save(update_fields=["payment_method"])
 
 
-class PaymentWithPaymentMethodView(View):
+class PaymentStatusView(View):
     """
-    Представление для процесса оплаты
+    Страница ожидания оплаты. Пока задача оплаты не завершена, страница
+    периодически опрашивает payment_status_poll, затем показывает итог
     """
 
     def get(self, request, pk, *args, **kwargs):
-        current_order: Order = Order.objects.get(pk=pk)
-        if current_order.order_status == "NOT_PAID":
+        current_order: Order = get_object_or_404(Order, pk=pk)
+        if current_order.payment_pending:
             return render(
                 request,
-                "payment_with_payment_method.html",
-                {
-                    "pk": pk,
-                    "message": "Ждём подтверждения оплаты платёжной системы",
-                },
+                "payment_progress.html",
+                {"pk": pk, "poll_interval": int(settings.PAYMENT_POLL_INTERVAL * 1000)},
             )
+        if current_order.pay_result and (
+            request.session.get(PAYMENT_ORDER_SESSION_ID) == current_order.pk
+        ):
+            Cart(request).clear()
+            del request.session[PAYMENT_ORDER_SESSION_ID]
         return render(
             request,
             "payment_result.html",
             {"current_order": current_order},
         )
 
-    def post(self, request, pk, **kwargs):
-        cart = Cart(request)
-        form_payment_by_card_with_method = PaymentByCardWithPaymentMethodForm(
-            request.POST
-        )
-        current_order: Order = Order.objects.get(pk=pk)
-        if current_order.order_status != "NOT_PAID":
-            return render(
-                request,
-                "payment_result.html",
-                {"current_order": current_order},
-            )
-        if form_payment_by_card_with_method.is_valid():
-            card_number = form_payment_by_card_with_method.cleaned_data["card_number"]
-            card_number = int(f"{card_number[0:4]}{card_number[5:9]}")
-            payment_method = form_payment_by_card_with_method.cleaned_data[
-                "payment_method"
-            ]
-            current_order.payment_method = payment_method
-            current_order.save()
-            if current_order.order_status != "NOT_PAID":
-                return render(
-                    request,
-                    "payment_result.html",
-                    {"current_order": current_order},
-                )
-
-            payment_result = payment.apply_async(
-                args=(card_number,),
-            )
-            time.sleep(4)
-            current_order = result_from_payment_system(
-                cart, current_order, payment_result.result
-            )
-            current_order.save()
-            return render(
-                request,
-                "payment_result.html",
-                {"current_order": current_order},
-            )
+
+def payment_status_poll(request, pk):
+    """
+    Текущий статус оплаты одним запросом, без ожидания: страница
+    опрашивает его раз в PAYMENT_POLL_INTERVAL секунд и не держит воркер
+    """
+    status = (
+        Order.objects.filter(pk=pk)
+        .values("order_status", "payment_task_id", "payment_error")
+        .first()
+    )
+    if status is None:
+        raise Http404
+    return JsonResponse(
+        {
+            "pending": bool(status["payment_task_id"]),
+            "status": status["order_status"],
+            "error": status["payment_error"],
+        }
+    )